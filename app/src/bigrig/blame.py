@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import struct
+
+from models import DomainDictionary
+
+# Only the domains with the most JavaScript time are stored individually,
+# everything else is folded into a single "other" entry.
+TOP_N = 20
+OTHER_DOMAIN = 'Other'
+OTHER_DOMAIN_ID = 0xFFFFFFFF
+
+# The most domains a Project's DomainDictionary holds. Once it's full, the ids
+# of domains no stored blob references any more are handed to new domains,
+# and if there are none, new domains are folded into the "other" entry.
+MAX_DOMAINS = 2048
+
+# Packed layout, little-endian: an entry count, then the domain ids, then
+# the durations (in ms) in the same order, sorted by duration descending.
+HEADER_FORMAT = '<I'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+class DomainIds():
+
+  """Maps domains to the ids of a Project's DomainDictionary and back.
+
+  The dictionary also counts, for each id, the stored blobs referencing it,
+  so that ids can be reused once those blobs are deleted.
+  """
+
+  def __init__ (self, dictionary, max_domains=MAX_DOMAINS):
+    self.dictionary = dictionary
+    self.max_domains = max_domains
+    self.ids = dict((d, i) for i, d in enumerate(dictionary.domains))
+    self.changed = False
+
+  @staticmethod
+  def for_project (project_key):
+    dictionary = DomainDictionary.get_by_id('javascript', parent=project_key)
+
+    if dictionary == None:
+      dictionary = DomainDictionary(id='javascript', parent=project_key,
+          domains=[], references=[])
+
+    return DomainIds(dictionary)
+
+  def get_id (self, domain):
+    if domain in self.ids:
+      return self.ids[domain]
+
+    domains = self.dictionary.domains
+    references = self.dictionary.references
+
+    if len(domains) < self.max_domains:
+      domain_id = len(domains)
+      domains.append(domain)
+      references.append(0)
+    else:
+      domain_id = self.get_unreferenced_id()
+      if domain_id == None:
+        return OTHER_DOMAIN_ID
+
+      del self.ids[domains[domain_id]]
+      domains[domain_id] = domain
+
+    self.ids[domain] = domain_id
+    self.changed = True
+    return domain_id
+
+  def get_unreferenced_id (self):
+    for domain_id, count in enumerate(self.dictionary.references):
+      if count == 0:
+        return domain_id
+
+    return None
+
+  def retain (self, domain_id):
+    if domain_id == OTHER_DOMAIN_ID:
+      return
+
+    self.dictionary.references[domain_id] += 1
+    self.changed = True
+
+  def release (self, domain_id):
+    if (domain_id == OTHER_DOMAIN_ID or
+        domain_id >= len(self.dictionary.references) or
+        self.dictionary.references[domain_id] == 0):
+      return
+
+    self.dictionary.references[domain_id] -= 1
+    self.changed = True
+
+  def get_domain (self, domain_id):
+    # Ids outside of the dictionary (or the id of the folded entry) can't
+    # be named, so they're reported as other domains.
+    if (domain_id == OTHER_DOMAIN_ID or
+        domain_id >= len(self.dictionary.domains)):
+      return OTHER_DOMAIN
+
+    return self.dictionary.domains[domain_id]
+
+class BlamePacker():
+
+  """Packs per-domain JavaScript durations into a compact, pre-sorted blob."""
+
+  @staticmethod
+  def pack (durations_by_domain, domain_ids, top_n=TOP_N):
+
+    ranked = sorted(durations_by_domain.iteritems(),
+        key=lambda entry: entry[1], reverse=True)
+
+    ids = []
+    values = []
+    other_duration = sum(duration for _, duration in ranked[top_n:])
+
+    # Each id is retained as it's taken, so that an id freed up for one
+    # domain isn't handed to another domain of the same blob.
+    for domain, duration in ranked[:top_n]:
+      domain_id = domain_ids.get_id(domain)
+      if domain_id == OTHER_DOMAIN_ID:
+        other_duration += duration
+        continue
+
+      domain_ids.retain(domain_id)
+      ids.append(domain_id)
+      values.append(duration)
+
+    if len(ids) < len(ranked):
+      ids.append(OTHER_DOMAIN_ID)
+      values.append(other_duration)
+
+    count = len(ids)
+    return struct.pack('%s%dI%df' % (HEADER_FORMAT, count, count),
+        count, *(ids + values))
+
+  @staticmethod
+  def unpack_ids (blob):
+
+    if not blob:
+      return []
+
+    count = struct.unpack_from(HEADER_FORMAT, blob)[0]
+    return list(struct.unpack_from('<%dI' % count, blob, HEADER_SIZE))
+
+  @staticmethod
+  def release (blob, domain_ids):
+    for domain_id in BlamePacker.unpack_ids(blob):
+      domain_ids.release(domain_id)
+
+  @staticmethod
+  def unpack (blob, domain_ids):
+
+    if not blob:
+      return []
+
+    count = struct.unpack_from(HEADER_FORMAT, blob)[0]
+    unpacked = struct.unpack_from('<%dI%df' % (count, count), blob,
+        HEADER_SIZE)
+
+    return [{
+      'type': 'JavaScript',
+      'name': domain_ids.get_domain(unpacked[i]),
+      'value': unpacked[count + i]
+    } for i in xrange(count)]
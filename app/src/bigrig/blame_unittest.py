@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from blame import BlamePacker
+from blame import DomainIds
+from blame import OTHER_DOMAIN
+from blame import OTHER_DOMAIN_ID
+from models import DomainDictionary
+from models import Project
+
+class BlamePackerTest(unittest.TestCase):
+
+  def setUp (self):
+    self.testbed = testbed.Testbed()
+    self.testbed.activate()
+    self.testbed.init_datastore_v3_stub()
+    self.testbed.init_memcache_stub()
+    ndb.get_context().clear_cache()
+
+    self.project_key = ndb.Key(Project, 1)
+
+  def tearDown (self):
+    self.testbed.deactivate()
+
+  def get_names_and_values (self, unpacked):
+    return [(entry['name'], entry['value']) for entry in unpacked]
+
+  def testPackUnpackSortsByDuration (self):
+    domain_ids = DomainIds.for_project(self.project_key)
+    blob = BlamePacker.pack({'a.com': 1.5, 'b.com': 4.0, 'c.com': 2.25},
+        domain_ids)
+
+    self.assertEqual([('b.com', 4.0), ('c.com', 2.25), ('a.com', 1.5)],
+        self.get_names_and_values(BlamePacker.unpack(blob, domain_ids)))
+    self.assertTrue(all(entry['type'] == 'JavaScript'
+        for entry in BlamePacker.unpack(blob, domain_ids)))
+    self.assertEqual([], BlamePacker.unpack(None, domain_ids))
+
+  def testUnpackWithStoredDictionary (self):
+    domain_ids = DomainIds.for_project(self.project_key)
+    blob = BlamePacker.pack({'a.com': 1.0, 'b.com': 2.0}, domain_ids)
+    domain_ids.dictionary.put()
+
+    stored_domain_ids = DomainIds.for_project(self.project_key)
+    self.assertEqual([('b.com', 2.0), ('a.com', 1.0)],
+        self.get_names_and_values(
+            BlamePacker.unpack(blob, stored_domain_ids)))
+    self.assertEqual([1, 1], stored_domain_ids.dictionary.references)
+
+  def testDomainsPastTopNAreFoldedIntoOther (self):
+    domain_ids = DomainIds.for_project(self.project_key)
+    blob = BlamePacker.pack(
+        {'a.com': 8.0, 'b.com': 4.0, 'c.com': 2.0, 'd.com': 1.0},
+        domain_ids, top_n=2)
+
+    self.assertEqual(
+        [('a.com', 8.0), ('b.com', 4.0), (OTHER_DOMAIN, 3.0)],
+        self.get_names_and_values(BlamePacker.unpack(blob, domain_ids)))
+    self.assertEqual([0, 1, OTHER_DOMAIN_ID], BlamePacker.unpack_ids(blob))
+
+    # Folded domains aren't added to the dictionary.
+    self.assertEqual(['a.com', 'b.com'], domain_ids.dictionary.domains)
+
+  def testIdsBeyondTheDictionaryAreReportedAsOther (self):
+    domain_ids = DomainIds.for_project(self.project_key)
+    blob = BlamePacker.pack({'a.com': 2.0, 'b.com': 1.0}, domain_ids)
+
+    shorter_domain_ids = DomainIds(DomainDictionary(domains=['a.com'],
+        references=[1]))
+    self.assertEqual([('a.com', 2.0), (OTHER_DOMAIN, 1.0)],
+        self.get_names_and_values(
+            BlamePacker.unpack(blob, shorter_domain_ids)))
+
+  def testFullDictionaryReusesUnreferencedIds (self):
+    domain_ids = DomainIds(DomainDictionary(domains=[], references=[]),
+        max_domains=2)
+    first_blob = BlamePacker.pack({'a.com': 2.0}, domain_ids)
+    BlamePacker.pack({'b.com': 1.0}, domain_ids)
+
+    # With every id referenced, new domains go into the "other" entry.
+    blob = BlamePacker.pack({'b.com': 4.0, 'c.com': 3.0}, domain_ids)
+    self.assertEqual([('b.com', 4.0), (OTHER_DOMAIN, 3.0)],
+        self.get_names_and_values(BlamePacker.unpack(blob, domain_ids)))
+
+    # Once the only blob referencing 'a.com' is released, its id is reused.
+    BlamePacker.release(first_blob, domain_ids)
+    blob = BlamePacker.pack({'c.com': 3.0}, domain_ids)
+    self.assertEqual([0], BlamePacker.unpack_ids(blob))
+    self.assertEqual(['c.com', 'b.com'], domain_ids.dictionary.domains)
+    self.assertEqual([1, 2], domain_ids.dictionary.references)
+    self.assertEqual([('c.com', 3.0)],
+        self.get_names_and_values(BlamePacker.unpack(blob, domain_ids)))
+
+if __name__ == '__main__':
+  unittest.main()
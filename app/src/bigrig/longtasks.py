@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# Main thread tasks running for longer than this (in ms) block input, and
+# count as long tasks. Only the time past it counts towards blocking time.
+LONG_TASK_THRESHOLD = 50
+
+# The number of longest tasks stored individually per ActionDetail.
+TOP_N = 5
+
+# The category of a long task with no categorized time under it.
+OTHER_CATEGORY = 'Other'
+
+class LongTask():
+
+  """A toplevel main thread slice, and the time under it by category."""
+
+  def __init__ (self, slice):
+    self.slice = slice
+    self.category_durations = {}
+
+  def add_time (self, category, duration):
+    if category == None:
+      return
+
+    if category not in self.category_durations:
+      self.category_durations[category] = 0
+
+    self.category_durations[category] += duration
+
+  def get_dominant_category (self):
+    if len(self.category_durations) == 0:
+      return OTHER_CATEGORY
+
+    return max(self.category_durations.iteritems(),
+        key=lambda entry: entry[1])[0]
+
+class LongTaskTracker():
+
+  """Finds the long tasks of the main thread as its slices are categorized.
+
+  Slices must be added parents first, which is how the thread yields them.
+  The time of each slice, less that of its children, goes to its category, or
+  to that of its closest categorized ancestor. Rather than walking the
+  children of every slice, each slice takes its own time away from its
+  parent's category as it's added, using the task and category stored for
+  the parent.
+  """
+
+  def __init__ (self):
+    self.tasks = []
+    self.__slices = {}
+
+  def add_slice (self, slice, category, duration):
+    if slice.parent_slice == None:
+      if slice.duration <= LONG_TASK_THRESHOLD:
+        return
+
+      task = LongTask(slice)
+      task.add_time(category, duration)
+      self.tasks.append(task)
+      self.__slices[slice] = (task, category)
+      return
+
+    # Slices outside of long tasks, or whose task started before the range,
+    # aren't tracked.
+    parent = self.__slices.get(slice.parent_slice)
+    if parent == None:
+      return
+
+    task, parent_category = parent
+    if category == None:
+      category = parent_category
+
+    task.add_time(parent_category, -duration)
+    task.add_time(category, duration)
+    self.__slices[slice] = (task, category)
+
+  def get_total_blocking_time (self):
+    return sum(t.slice.duration - LONG_TASK_THRESHOLD for t in self.tasks)
+
+  def get_longest_tasks (self, top_n=TOP_N):
+    return sorted(self.tasks, key=lambda t: t.slice.duration,
+        reverse=True)[:top_n]
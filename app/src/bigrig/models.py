@@ -37,7 +37,7 @@ class Project(ndb.Model):
   name = ndb.StringProperty(required=True)
   owner = ndb.StringProperty(required=True)
   secret = ndb.StringProperty(required=True)
-  visible_to_owner_only = ndb.BooleanProperty()
+  visible_to_owner_only = ndb.BooleanProperty(default=False)
 
 class Action(ndb.Model):
   name = ndb.StringProperty()
@@ -52,6 +52,16 @@ class ActionDetailExtended(ndb.Model):
   name = ndb.StringProperty()
   value = ndb.StringProperty()
 
+class ActionDetailMemory(ndb.Model):
+  allocator = ndb.StringProperty()
+  peak = ndb.IntegerProperty()
+  final = ndb.IntegerProperty()
+
+class ActionDetailLongTask(ndb.Model):
+  start = ndb.FloatProperty()
+  duration = ndb.FloatProperty()
+  category = ndb.StringProperty()
+
 class ActionDetail(ndb.Model):
   parse_html = ndb.FloatProperty()
   javascript = ndb.FloatProperty()
@@ -69,6 +79,75 @@ class ActionDetail(ndb.Model):
   load_time = ndb.FloatProperty()
   extended_info = ndb.StructuredProperty(ActionDetailExtended, repeated=True)
   speed_index = ndb.IntegerProperty()
+  javascript_blame = ndb.BlobProperty()
+
+  # Frame timing, only recorded for Animation actions.
+  frame_times = ndb.FloatProperty(repeated=True, indexed=False)
+  frame_time_p50 = ndb.FloatProperty()
+  frame_time_p95 = ndb.FloatProperty()
+  frame_time_p99 = ndb.FloatProperty()
+  percentage_janky_frames = ndb.FloatProperty()
+  frame_time_discrepancy = ndb.FloatProperty()
+
+  # GL time per frame on the GPU thread's CPU and on the GPU, only recorded
+  # for Animation actions when the import asks for the GPU timeline.
+  gl_cpu_frame_time_p50 = ndb.FloatProperty()
+  gl_cpu_frame_time_p95 = ndb.FloatProperty()
+  gl_gpu_frame_time_p50 = ndb.FloatProperty()
+  gl_gpu_frame_time_p95 = ndb.FloatProperty()
+
+  # Input latency, only recorded for Response actions. The breakdown by
+  # event type is kept in the extended info.
+  input_latency_p50 = ndb.FloatProperty()
+  input_latency_p95 = ndb.FloatProperty()
+  input_latency_max = ndb.FloatProperty()
+
+  # Main thread tasks over 50ms, the time they spent past 50ms, and the
+  # longest of them, with their start relative to the range.
+  long_task_count = ndb.IntegerProperty()
+  total_blocking_time = ndb.FloatProperty()
+  long_tasks = ndb.StructuredProperty(ActionDetailLongTask, repeated=True)
+
+  # Peak and final size of each allocator of the analyzed process, from the
+  # memory dumps inside the range.
+  memory = ndb.StructuredProperty(ActionDetailMemory, repeated=True)
+
+  # Main thread jank, in thread time: the total of the tasks long enough to
+  # be perceived, and the longest task.
+  big_jank_thread_time = ndb.FloatProperty()
+  biggest_jank_thread_time = ndb.FloatProperty()
+
+  # The run group the run was posted with, if any. Grouped runs are charted
+  # through their group's ActionDetailAggregate rather than one by one.
+  run_group = ndb.StringProperty()
+
+class ActionDetailStatistics(ndb.Model):
+  metric = ndb.StringProperty()
+  values = ndb.FloatProperty(repeated=True)
+  median = ndb.FloatProperty()
+  mean = ndb.FloatProperty()
+  stdev = ndb.FloatProperty()
+  min = ndb.FloatProperty()
+  max = ndb.FloatProperty()
+
+# Charts tell the points of run groups from those of single ActionDetails by
+# this prefix on their ids.
+RUN_GROUP_ID_PREFIX = 'run-group/'
+
+class ActionDetailAggregate(ndb.Model):
+  # Keyed by run group under the Action, so that every run of a group (say,
+  # every upload for a commit) is folded into the same entity.
+  run_group = ndb.StringProperty()
+  run_count = ndb.IntegerProperty()
+  date = ndb.DateTimeProperty()
+  statistics = ndb.LocalStructuredProperty(ActionDetailStatistics,
+      repeated=True)
+
+class DomainDictionary(ndb.Model):
+  domains = ndb.StringProperty(repeated=True, indexed=False)
+
+  # The number of stored blobs referencing each domain, by id.
+  references = ndb.IntegerProperty(repeated=True, indexed=False)
 
 class Trace(ndb.Model):
   processed = ndb.BooleanProperty()
@@ -78,6 +157,11 @@ class Trace(ndb.Model):
   error = ndb.StringProperty()
   process = ndb.StringProperty()
   delete_trace_after_import = ndb.BooleanProperty()
+  trim_trace_after_import = ndb.BooleanProperty()
+
+  # Further shards of the same trace, uploaded alongside the first file.
+  extra_file_keys = ndb.BlobKeyProperty(repeated=True)
+  extra_filenames = ndb.StringProperty(repeated=True)
 
 class Log(ndb.Model):
   filename = ndb.StringProperty()
@@ -15,11 +15,13 @@
 # limitations under the License.
 #
 
+import bisect
 import gzip
 import os
 import sys
 import re
-import json
+import tarfile
+import zipfile
 from StringIO import StringIO
 from datetime import datetime
 from datetime import timedelta
@@ -28,21 +30,107 @@ from dateutil.parser import parse as dateparse
 
 from google.appengine.ext import ndb
 
+from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import bounds as bounds_module
+from telemetry.timeline import cpu_profile
 from telemetry.timeline import model as model_module
 from telemetry.timeline import trace_data as trace_data_module
 from telemetry.timeline import event as trace_event
+from telemetry.timeline import event_query
+from telemetry.timeline import lazy_args
+from telemetry.util import statistics
+from telemetry.web_perf import timeline_interaction_record as tir_module
+from telemetry.web_perf.metrics import gpu_timeline as gpu_timeline_module
+from telemetry.web_perf.metrics import mainthread_jank_stats
+from telemetry.web_perf.metrics import rendering_stats
 
 from models import Project
 from models import Action
 from models import ActionDetail
 from models import ActionDetailExtended
+from models import ActionDetailLongTask
+from models import ActionDetailMemory
 from models import Log
+from blame import BlamePacker
+from blame import DomainIds
+from longtasks import LongTaskTracker
+from rungroups import RunGroup
+
+# The category of the slices BigRig breaks the time of each range into.
+SLICE_CATEGORIES = {
+  'ParseHTML': 'ParseHTML',
+  'FunctionCall': 'JavaScript',
+  'EvaluateScript': 'JavaScript',
+  'MajorGC': 'JavaScript',
+  'MinorGC': 'JavaScript',
+  'GCEvent': 'JavaScript',
+  'UpdateLayoutTree': 'Styles',
+  'RecalculateStyles': 'Styles',
+  'ParseAuthorStyleSheet': 'Styles',
+  'UpdateLayerTree': 'UpdateLayerTree',
+  'Layout': 'Layout',
+  'Paint': 'Paint',
+  'RasterTask': 'Raster',
+  'Rasterize': 'Raster',
+  'CompositeLayers': 'Composite'
+}
+
+# Navigation marks, of which only the first of each is kept.
+MARK_NAMES = ('MarkDOMContent', 'MarkFirstPaint', 'MarkLoad')
+
+# The number of functions and domains of sampled JavaScript time kept per
+# ActionDetail.
+PROFILE_TOP_N = 10
+
+# Frames taking at least this long (in ms) count as janky. Like the
+# smoothness metric, this is a little looser than 1000 / 60.
+JANKY_FRAME_TIME = 17.0
+
+# The categories kept when a retained trace is trimmed: everything BigRig
+# reads, plus the metadata needed to load the trace again.
+RETAINED_CATEGORY_PREFIXES = (
+  '__metadata',
+  'benchmark',
+  'blink',
+  'cc',
+  'devtools.timeline',
+  'disabled-by-default-devtools.timeline',
+  'disabled-by-default-gpu.device',
+  'disabled-by-default-gpu.service',
+  'disabled-by-default-memory-infra',
+  'disabled-by-default-toplevel.flow',
+  'disabled-by-default-v8.cpu_profile',
+  'gpu',
+  'input',
+  'latencyInfo',
+  'toplevel',
+  'v8'
+)
+
+# The allocators of the analyzed process whose memory is recorded per
+# ActionDetail, from the memory-infra dumps inside its range.
+MEMORY_ALLOCATORS = ('malloc', 'v8', 'partition_alloc', 'blink_gc')
+
+# The number of ActionDetails handed to the datastore in one async batch.
+# Batches are flushed while the following ranges are still being analyzed.
+PUT_BATCH_SIZE = 50
 
 class TraceProcessor():
 
-  __temp_actions = {}
   __js_blame = {}
 
+  def __init__ (self):
+    # Actions created by this import, by label, and the writes of those
+    # still in flight. Both are per import, so that no import sees the
+    # Actions of another project or of a rolled back attempt.
+    self.__temp_actions = {}
+    self.__pending_writes = []
+    self.__pending_actions = {}
+
+    # The trimmed TraceData, when the import asks for one. It's only kept
+    # here, for the caller to store once the import has committed.
+    self.trimmed_trace = None
+
   def log (self, project, trace_info, extended_info,
           status, records_imported=0):
 
@@ -56,34 +144,104 @@ class TraceProcessor():
       status=status,
       records_imported=records_imported
     )
-    log.put()
+    self.__pending_writes.append(log.put_async())
+
+  def wait_for_pending_writes (self):
+
+    # Block once on every outstanding datastore write for this run.
+    ndb.Future.wait_all(self.__pending_writes)
+    for future in self.__pending_writes:
+      future.check_success()
+
+    self.__pending_writes = []
 
   def process (self, project, trace_string, trace_info, extended_info):
 
+    return self.process_files(project,
+        [(trace_info.filename, StringIO(trace_string))], trace_info,
+        extended_info)
+
+  def process_files (self, project, trace_files, trace_info, extended_info):
+
     try:
-      if re.search('json$', trace_info.filename):
-
-        # Re-encode to ISO-8859-1
-        trace_string = trace_string.decode('UTF-8', 'ignore')
-        trace_string = trace_string.encode('ISO-8859-1', 'ignore')
-
-        trace_json = json.loads(trace_string)
-      elif re.search('json.gz$', trace_info.filename):
-        gzip_trace_string = gzip.GzipFile(
-          fileobj=StringIO(trace_string)
-        ).read()
-        trace_json = json.loads(gzip_trace_string)
-      else:
-        self.log(project, trace_info, extended_info,
-          'Error reading file: neither .json nor .json.gz')
-        return
+      return self.process_trace_files(project, trace_files, trace_info,
+          extended_info)
+    finally:
+      self.wait_for_pending_writes()
+
+  def iter_trace_files (self, filename, trace_file):
+
+    # Bundles hold one trace file per shard, which are read one at a time.
+    if re.search('\.zip$', filename):
+      bundle = zipfile.ZipFile(trace_file)
+      for name in bundle.namelist():
+        if re.search('\.json(\.gz)?$', name):
+          yield name, bundle.open(name)
+
+    elif re.search('\.(tar|tar\.gz|tgz)$', filename):
+      bundle = tarfile.open(fileobj=trace_file, mode='r:*')
+      for member in bundle:
+        if member.isfile() and re.search('\.json(\.gz)?$', member.name):
+          yield member.name, bundle.extractfile(member)
+
+    else:
+      yield filename, trace_file
+
+  def load_trace_json (self, filename, trace_file):
+
+    if re.search('json$', filename):
+
+      # Re-encode to ISO-8859-1
+      trace_string = trace_file.read()
+      trace_string = trace_string.decode('UTF-8', 'ignore')
+      trace_string = trace_string.encode('ISO-8859-1', 'ignore')
+
+      return lazy_args.LoadTraceJson(trace_string)
+
+    elif re.search('json.gz$', filename):
+      gzip_trace_string = gzip.GzipFile(
+        fileobj=StringIO(trace_file.read())
+      ).read()
+      return lazy_args.LoadTraceJson(gzip_trace_string)
+
+    return None
+
+  def process_trace_files (self, project, trace_files, trace_info,
+      extended_info):
+
+    # Each file, or each file of a bundle, is a shard of the trace, such
+    # as the trace of a single process. Only the parsed shards are kept.
+    shards = []
+
+    try:
+      for filename, trace_file in trace_files:
+        for shard_filename, shard_file in self.iter_trace_files(filename,
+            trace_file):
+
+          trace_json = self.load_trace_json(shard_filename, shard_file)
+          if trace_json != None:
+            shards.append(trace_json)
+
     except Exception, e:
       self.log(project, trace_info, extended_info,
         'JSON parse error')
       return
 
+    if len(shards) == 0:
+      self.log(project, trace_info, extended_info,
+        'Error reading file: neither .json nor .json.gz')
+      return
+
     try:
-      parsed_data = trace_data_module.TraceData(trace_json)
+      # Shards are merged by timestamp into one trace, aligned on their
+      # clock_sync markers.
+      if len(shards) == 1:
+        parsed_data = trace_data_module.TraceData(shards[0])
+      else:
+        builder = trace_data_module.TraceDataBuilder()
+        builder.AddShards(shards)
+        parsed_data = builder.AsData()
+
       model = model_module.TimelineModel(parsed_data)
       processes = model.GetAllProcesses()
     except Exception, e:
@@ -92,7 +250,7 @@ class TraceProcessor():
       return
 
     summarizable = []
-    trace_json = None
+    shards = None
 
     # If there is a process to filter by, use that. Otherwise
     # find all non-empty and non-tracing processes and append
@@ -115,17 +273,42 @@ class TraceProcessor():
       self.log(project, trace_info, extended_info,
           'Multiple tabs (trace process) found.')
     else:
-      return self.analyze_trace_and_append_actions(
+      process = summarizable.pop()
+      records_imported = self.analyze_trace_and_append_actions(
         project,
         trace_info,
-        summarizable.pop(),
+        process,
         model.bounds,
+        model.flow_graph,
         extended_info)
 
+      if (trace_info.trim_trace_after_import and
+          not trace_info.delete_trace_after_import):
+        try:
+          self.trimmed_trace = self.get_trimmed_trace(parsed_data, process)
+        except Exception, e:
+          self.log(project, trace_info, extended_info,
+            'Error trimming the trace. The full trace is kept.')
+
+      return records_imported
+
+  def get_trimmed_trace (self, trace_data, process):
+
+    # Just the categories BigRig reads, so that the trace is cheaper to store,
+    # reprocess and download. Besides the analyzed process, the browser and
+    # GPU processes are kept, for their input latency, GPU frames and the
+    # flows of the critical path.
+    model = process.parent
+    pids = [
+      p.pid for p in (process, model.browser_process, model.gpu_process)
+      if p != None
+    ]
+
+    return trace_data.GetTrimmed(pids, RETAINED_CATEGORY_PREFIXES)
+
   def analyze_trace_and_append_actions (self, project, trace_info, process,
-      bounds, extended_info):
+      bounds, flow_graph, extended_info):
 
-    threads = self.get_threads(process)
     renderer_thread = self.get_thread_by_name(process, 'CrRendererMain')
     time_ranges = self.get_time_ranges(renderer_thread)
     labels = extended_info['labels']
@@ -156,7 +339,7 @@ class TraceProcessor():
           duration=(bounds.max - bounds.min))]
 
         records_imported = self.create_action_details_from_trace(project,
-            labels, time_ranges, threads, trace_info, extended_info)
+            labels, time_ranges, process, flow_graph, trace_info, extended_info)
 
       # If the Action of that label is not a Load Action, then look for
       # time ranges of that label.
@@ -164,7 +347,7 @@ class TraceProcessor():
 
         status = 'Single label (%s), label is not for a Load Action' % labels[0]
         records_imported = self.create_action_details_from_trace(project,
-            labels, time_ranges, threads, trace_info, extended_info)
+            labels, time_ranges, process, flow_graph, trace_info, extended_info)
 
     # If multiple labels are provided and the trace contains ranges,
     # those ranges will be mapped to existing Actions in the Project
@@ -173,7 +356,7 @@ class TraceProcessor():
 
       status = 'Multiple labels, trace contains ranges'
       records_imported = self.create_action_details_from_trace(project,
-          labels, time_ranges, threads, trace_info, extended_info)
+          labels, time_ranges, process, flow_graph, trace_info, extended_info)
 
     # If multiple labels are provided and the trace does not contain ranges,
     # no Actions will be findable, so the import will be a no-op.
@@ -196,7 +379,8 @@ class TraceProcessor():
           duration=(bounds.max - bounds.min))]
 
         records_imported = self.create_action_details_from_trace(project,
-            [action.name], time_ranges, threads, trace_info, extended_info)
+            [action.name], time_ranges, process, flow_graph, trace_info,
+            extended_info)
 
     # If no labels are provided..
     elif (len(labels) == 0):
@@ -218,7 +402,8 @@ class TraceProcessor():
             duration=(bounds.max - bounds.min))]
 
           records_imported = self.create_action_details_from_trace(project,
-              [action.name], time_ranges, threads, trace_info, extended_info)
+              [action.name], time_ranges, process, flow_graph, trace_info,
+              extended_info)
 
         else:
           status = ('No labels, trace contains no ranges. '
@@ -232,7 +417,7 @@ class TraceProcessor():
                   'Actions will be created on demand.')
 
         records_imported = self.create_action_details_from_trace(project,
-            [], time_ranges, threads, trace_info, extended_info)
+            [], time_ranges, process, flow_graph, trace_info, extended_info)
 
     else:
       status = 'Unknown import error.'
@@ -262,9 +447,9 @@ class TraceProcessor():
 
   def get_time_ranges (self, thread):
     return [
-      y for y in thread.GetAllEvents()
-      if (y.category == 'blink.console' and
-          y.thread_start != None)
+      y for y in thread.IterEventsMatchingQuery(
+          event_query.EventQuery(categories=('blink.console',)))
+      if y.thread_start != None
     ]
 
   def get_label (self, labels):
@@ -365,7 +550,11 @@ class TraceProcessor():
             y_axis=0,
             y_axis_max='duration')
 
-        action.put()
+        # Don't block on the write; the key is only needed once the range
+        # has been analyzed and its ActionDetail is created.
+        future = action.put_async()
+        self.__pending_actions[label] = future
+        self.__pending_writes.append(future)
 
         self.__temp_actions[label] = action
       else:
@@ -373,38 +562,61 @@ class TraceProcessor():
 
     return action
 
+  def get_action_key (self, action):
+
+    # Actions created during this run may still be in flight, and only have
+    # an incomplete key until their write lands, so wait for that particular
+    # write and use the key it returns as the parent.
+    if action.label in self.__pending_actions:
+      return self.__pending_actions[action.label].get_result()
+
+    return action.key
+
+  def flush_action_details (self, action_details):
+
+    if (len(action_details) == 0):
+      return
+
+    self.__pending_writes.extend(ndb.put_multi_async(action_details))
+
   def get_javascript_url_from_stack_info (self, slice):
 
     url = None
 
-    if 'data' not in slice.args:
+    # The args are decoded on access, so only look the data up once.
+    data = slice.args.get('data')
+    if data == None:
       return url
 
-    if ('url' in slice.args['data'] and
-        slice.args['data']['url'] != '' and
-        re.search('^http', slice.args['data']['url'])):
-        url = slice.args['data']['url']
+    if ('url' in data and
+        data['url'] != '' and
+        re.search('^http', data['url'])):
+        url = data['url']
 
-    elif ('scriptName' in slice.args['data'] and
-        slice.args['data']['scriptName'] != '' and
-        re.search('^http', slice.args['data']['scriptName'])):
+    elif ('scriptName' in data and
+        data['scriptName'] != '' and
+        re.search('^http', data['scriptName'])):
 
-        url = slice.args['data']['scriptName']
+        url = data['scriptName']
 
     return url
 
   def create_action_details_from_trace (self, project, labels, time_ranges,
-      threads, trace_info, extended_info):
+      process, flow_graph, trace_info, extended_info):
 
     if (type(labels) is not list):
       return []
 
+    threads = self.get_threads(process)
+
     results = {}
     first_paint_time = None
     dom_content_loaded_time = None
     load_time = None
     create_action_if_needed = (len(labels) == 0)
     to_save = []
+    batch = []
+    domain_ids = DomainIds.for_project(project.key)
 
     def sum(l):
       total = 0
@@ -431,8 +643,54 @@ class TraceProcessor():
         # No need to worry. If we get a non-numeric speed index, ignore it.
         speed_index = -1
 
+    # Runs posted with the same run group (say, the commit) are charted
+    # together, through the group's aggregate.
+    run_group = None
+    if ('run-group' in extended_info):
+      run_group = str(extended_info['run-group'])
+
+    # Threads with sampled stacks, all sharing the model's stack table.
+    profiles = [t.cpu_profile for t in threads if t.cpu_profile != None]
+
+    # The navigation marks don't depend on the range, so look them up once.
+    for t in threads:
+      for q in t.IterEventsMatchingQuery(
+          event_query.EventQuery(names=MARK_NAMES)):
+
+        # In the events there should be DOMContentLoaded etc.
+        if q.name == "MarkDOMContent" and dom_content_loaded_time == None:
+          dom_content_loaded_time = q.start
+        elif q.name == "MarkFirstPaint" and first_paint_time == None:
+          first_paint_time = q.start
+        elif q.name == "MarkLoad" and load_time == None:
+          load_time = q.start
+
+    # DrawFrame starts from every thread, sorted once so that the frames of
+    # each range can be counted by bisecting.
+    draw_frame_starts = sorted(q.start for t in threads
+        for q in t.IterEventsMatchingQuery(
+            event_query.EventQuery(names=('DrawFrame',))))
+
+    # The LatencyInfo events of the browser and renderer, indexed the first
+    # time a Response action needs them.
+    latency_index = None
+
+    # Main thread jank for every range, in a single sweep over the main
+    # thread's tasks.
+    mainthread_jank = self.get_mainthread_jank(process, time_ranges)
+
+    # Frame timing for every range at once, computed the first time an
+    # Animation action needs it.
+    frame_stats = None
+
+    # GPU frame timing is an optional stage, as it takes a pass over the
+    # GPU events of the trace. Like the frame timing, it's built once for all
+    # ranges when first needed.
+    gpu_timeline = None
+    analyze_gpu_timeline = (extended_info.get('gpu-timeline') == 'true')
+
     # Step 1: go through all time ranges, and match to the correct Action.
-    for time_range in time_ranges:
+    for range_index, time_range in enumerate(time_ranges):
 
       name = time_range.name
 
@@ -457,9 +715,8 @@ class TraceProcessor():
         'Composite': []
       }
 
-      result_extended_info = {
-        'JavaScript': {}
-      }
+      result_extended_info = {}
+      javascript_blame = {}
 
       # If there's a commit ID in the post, add that as an extended item.
       if 'commit' in extended_info:
@@ -473,44 +730,72 @@ class TraceProcessor():
           "webpagetest-id": extended_info['webpagetest-id']
         }
 
-      # Step through each thread.
-      for t in threads:
+      # For Response actions, attribute the latency to the threads on the
+      # critical path leading to the end of the range.
+      if action.type == 'Response':
+        critical_path = self.get_critical_path_durations(flow_graph,
+            time_range)
+
+        if (len(critical_path)):
+          result_extended_info['Critical path'] = critical_path
+
+        if latency_index == None:
+          latency_index = rendering_stats.LatencyEventIndex(
+              process.parent.browser_process, process)
 
-        # Start with the events for the thread.
-        for q in t.GetAllEvents():
+        input_latency = self.get_input_latency(latency_index, time_range)
+        result_extended_info.update(input_latency['by_type'])
 
-          # In the events there should be DOMContentLoaded etc.
-          if q.name == "MarkDOMContent" and dom_content_loaded_time == None:
-            dom_content_loaded_time = q.start
-          elif q.name == "MarkFirstPaint" and first_paint_time == None:
-            first_paint_time = q.start
-          elif q.name == "MarkLoad" and load_time == None:
-            load_time = q.start
+      # Attribute the sampled JavaScript time to the functions and domains
+      # that were actually running, rather than to the top-level script.
+      result_extended_info.update(self.get_sampled_javascript(profiles,
+          time_range))
 
-          # The compositor thread may have the frame info, so we'll use that.
-          elif (q.name == 'DrawFrame' and
-                q.start > time_range.start and
-                q.start <= time_range.start + time_range.duration):
-            result['Frames'] += 1
+      # The compositor thread may have the frame info, so we'll use that.
+      result['Frames'] = (
+          bisect.bisect_right(draw_frame_starts,
+              time_range.start + time_range.duration) -
+          bisect.bisect_right(draw_frame_starts, time_range.start))
 
-        # Then jump to the slices.
+      # Animations also get the distribution of their frame times.
+      frame_timing = {}
+      if action.type == 'Animation':
+        if frame_stats == None:
+          frame_stats = self.get_rendering_stats(process, time_ranges)
+
+        frame_timing = self.get_frame_timing(frame_stats, range_index)
+
+        if analyze_gpu_timeline:
+          if gpu_timeline == None:
+            gpu_timeline = gpu_timeline_module.GetGPUTimeline(process.parent)
+
+          frame_timing.update(self.get_gpu_frame_timing(gpu_timeline,
+              time_range))
+
+      long_task_tracker = LongTaskTracker()
+
+      # Step through each thread.
+      for t in threads:
+
+        is_main_thread = (t.name == 'CrRendererMain')
+
+        # Jump to the slices.
         for s in t.IterAllSlicesInRange(time_range.start,
             time_range.start + time_range.duration):
 
           # Get the thread duration if possible, and the duration if not.
           duration = self.get_best_duration_for_slice(s)
 
-          # Same for the immediate children.
-          children_duration = self.get_immediate_child_slice_durations(s)
+          category = SLICE_CATEGORIES.get(s.name)
+          if category != None:
+            result[category].append(duration)
+
+          # Long tasks are found in the same pass, from the main thread's
+          # slices and their categories.
+          if is_main_thread:
+            long_task_tracker.add_slice(s, category, duration)
 
-          if s.name == 'ParseHTML':
-            result['ParseHTML'].append(duration)
-          elif (s.name == 'FunctionCall' or
-                s.name == 'EvaluateScript' or
-                s.name == 'MajorGC' or
-                s.name == 'MinorGC' or
-                s.name == 'GCEvent'):
-            result['JavaScript'].append(duration)
+          if category == 'JavaScript':
 
             # If we have JS Stacks find out who the culprits are for the
             # JavaScript that is running.
@@ -521,26 +806,10 @@ class TraceProcessor():
               parsed_owner_domain = urlparse(owner_domain)
               domain = parsed_owner_domain.netloc
 
-              if domain not in result_extended_info['JavaScript']:
-                result_extended_info['JavaScript'][domain] = 0
-
-              result_extended_info['JavaScript'][domain] += duration
-
-          elif (s.name == 'UpdateLayoutTree' or
-                s.name == 'RecalculateStyles' or
-                s.name == 'ParseAuthorStyleSheet'):
-            result['Styles'].append(duration)
-          elif s.name == 'UpdateLayerTree':
-            result['UpdateLayerTree'].append(duration)
-          elif s.name == 'Layout':
-            result['Layout'].append(duration)
-          elif (s.name == 'Paint'):
-            result['Paint'].append(duration)
-          elif (s.name == 'RasterTask' or
-                s.name == 'Rasterize'):
-            result['Raster'].append(duration)
-          elif (s.name == 'CompositeLayers'):
-            result['Composite'].append(duration)
+              if domain not in javascript_blame:
+                javascript_blame[domain] = 0
+
+              javascript_blame[domain] += duration
 
       # Step 2: Summarize
       timeInSeconds = result['Duration'] / float(1000)
@@ -564,7 +833,7 @@ class TraceProcessor():
           action_details_extended_info.append(action_detail_extended)
 
       action_detail = ActionDetail(
-        parent=action.key,
+        parent=self.get_action_key(action),
         duration=result['Duration'],
         parse_html=sum(result['ParseHTML']),
         javascript=sum(result['JavaScript']),
@@ -579,22 +848,296 @@ class TraceProcessor():
         first_paint_time=first_paint_time,
         dom_content_loaded_time=dom_content_loaded_time,
         load_time=load_time,
-        speed_index=speed_index
+        speed_index=speed_index,
+        run_group=run_group
       )
 
+      if (len(frame_timing)):
+        action_detail.populate(**frame_timing)
+
+      if action.type == 'Response':
+        action_detail.populate(**input_latency['summary'])
+
+      action_detail.populate(**self.get_long_tasks(long_task_tracker,
+          time_range))
+
+      memory = self.get_memory_usage(process, time_range)
+      if (len(memory)):
+        action_detail.memory = memory
+
+      jank = mainthread_jank[range_index]
+      if jank != None:
+        action_detail.big_jank_thread_time = (
+            jank.sum_big_top_slices_thread_time)
+        action_detail.biggest_jank_thread_time = (
+            jank.biggest_top_slice_thread_time)
+
       # If there's any extended info for this ActionDetail, append it now.
       if (len(action_details_extended_info)):
         action_detail.extended_info = action_details_extended_info
 
-      # Add this action to the list of things to be saved
+      # JavaScript blame is stored packed and pre-sorted rather than as one
+      # extended info entry per domain.
+      if (len(javascript_blame)):
+        action_detail.javascript_blame = BlamePacker.pack(javascript_blame,
+            domain_ids)
+
+      # Add this action to the list of things to be saved, and hand off a
+      # batch to the datastore so it's written while the next ranges are
+      # being analyzed.
       to_save.append(action_detail)
+      batch.append(action_detail)
+
+      if (len(batch) >= PUT_BATCH_SIZE):
+        self.flush_action_details(batch)
+        batch = []
+
+    # Step 3: Store any remaining ActionDetails, along with any new domains
+    # referenced by their blame. The writes are waited on once, when
+    # processing of the trace finishes.
+    self.flush_action_details(batch)
 
-    # Step 3: Store the ActionDetails
-    if (len(to_save) > 0):
-      ndb.put_multi(to_save)
+    if domain_ids.changed:
+      self.__pending_writes.append(domain_ids.dictionary.put_async())
+
+    # Runs posted with the same run group (say, the commit) are also folded
+    # into one aggregate per Action, so that the group can be read as a
+    # single record rather than one per run.
+    if run_group != None and len(to_save):
+      aggregates = RunGroup(run_group)
+      for action_detail in to_save:
+        aggregates.add(action_detail)
+
+      self.__pending_writes.extend(
+          ndb.put_multi_async(aggregates.aggregates.values()))
 
     return to_save
 
+  def get_mainthread_jank (self, process, time_ranges):
+
+    jank = [None] * len(time_ranges)
+    renderer_thread = self.get_thread_by_name(process, 'CrRendererMain')
+    if renderer_thread == None:
+      return jank
+
+    # Only console ranges carry the thread times needed to compare them with
+    # the main thread's tasks; whole-trace Load ranges are left out.
+    indexes = [
+      i for i, r in enumerate(time_ranges)
+      if (isinstance(r, async_slice_module.AsyncSlice) and
+          r.has_thread_timestamps and r.name)
+    ]
+    records = [
+      tir_module.TimelineInteractionRecord(time_ranges[i].name,
+          time_ranges[i].start, time_ranges[i].end, time_ranges[i])
+      for i in indexes
+    ]
+
+    try:
+      stats = mainthread_jank_stats.ComputeMainthreadJankStatsForRecords(
+          renderer_thread, records)
+    except tir_module.NoThreadTimeDataException, e:
+      return jank
+
+    for i, stat in zip(indexes, stats):
+      jank[i] = stat
+
+    return jank
+
+  def get_input_latency (self, latency_index, time_range):
+
+    input_latency = {
+      'summary': {},
+      'by_type': {}
+    }
+
+    try:
+      event_latencies = rendering_stats.ComputeEventLatencies(
+          latency_index.GetLatencyEvents(
+              bounds_module.Bounds.CreateFromEvent(time_range)))
+    except ValueError, e:
+      # LatencyInfo without a begin component can't be timed.
+      return input_latency
+
+    if len(event_latencies) == 0:
+      return input_latency
+
+    latencies = [latency for _, latency in event_latencies]
+    input_latency['summary'] = {
+      'input_latency_p50': statistics.Percentile(latencies, 50),
+      'input_latency_p95': statistics.Percentile(latencies, 95),
+      'input_latency_max': max(latencies)
+    }
+
+    latencies_by_type = {}
+    for name, latency in event_latencies:
+      latencies_by_type.setdefault(name, []).append(latency)
+
+    by_type = input_latency['by_type']
+    by_type['Input latency (p50)'] = {}
+    by_type['Input latency (p95)'] = {}
+    by_type['Input latency (max)'] = {}
+    for name, type_latencies in latencies_by_type.iteritems():
+      by_type['Input latency (p50)'][name] = (
+          statistics.Percentile(type_latencies, 50))
+      by_type['Input latency (p95)'][name] = (
+          statistics.Percentile(type_latencies, 95))
+      by_type['Input latency (max)'][name] = max(type_latencies)
+
+    return input_latency
+
+  def get_long_tasks (self, long_task_tracker, time_range):
+
+    return {
+      'long_task_count': len(long_task_tracker.tasks),
+      'total_blocking_time': long_task_tracker.get_total_blocking_time(),
+      'long_tasks': [
+        ActionDetailLongTask(
+          start=(t.slice.start - time_range.start),
+          duration=t.slice.duration,
+          category=t.get_dominant_category()
+        )
+        for t in long_task_tracker.get_longest_tasks()
+      ]
+    }
+
+  def get_memory_usage (self, process, time_range):
+
+    # The model keeps its dumps in chronological order, and only decodes the
+    # allocators of those that are looked at.
+    global_dumps = process.parent.GetGlobalMemoryDumpsInRange(
+        time_range.start, time_range.start + time_range.duration)
+    sizes = {}
+
+    for global_dump in global_dumps:
+      for dump in global_dump.IterProcessMemoryDumps():
+        if dump.process is not process:
+          continue
+
+        for allocator, size in dump.GetAllocatorSizes().iteritems():
+          if allocator in MEMORY_ALLOCATORS:
+            sizes.setdefault(allocator, []).append(size)
+
+    return [
+      ActionDetailMemory(
+        allocator=allocator,
+        peak=max(sizes[allocator]),
+        final=sizes[allocator][-1]
+      )
+      for allocator in MEMORY_ALLOCATORS
+      if allocator in sizes
+    ]
+
+  def get_rendering_stats (self, process, time_ranges):
+
+    timeline_ranges = [bounds_module.Bounds.CreateFromEvent(r)
+        for r in time_ranges]
+
+    try:
+      return rendering_stats.RenderingStats(process, None, None,
+          timeline_ranges)
+    except ValueError, e:
+      # Traces with multi-frame render stats can't be timed per frame.
+      return None
+
+  def get_frame_timing (self, frame_stats, range_index):
+
+    if frame_stats == None:
+      return {}
+
+    frame_times = frame_stats.frame_times[range_index]
+    if len(frame_times) == 0:
+      return {}
+
+    janky_frames = len([t for t in frame_times if t >= JANKY_FRAME_TIME])
+
+    return {
+      'frame_times': frame_times,
+      'frame_time_p50': statistics.Percentile(frame_times, 50),
+      'frame_time_p95': statistics.Percentile(frame_times, 95),
+      'frame_time_p99': statistics.Percentile(frame_times, 99),
+      'percentage_janky_frames': (
+          100.0 * janky_frames / len(frame_times)),
+      'frame_time_discrepancy': statistics.TimestampsDiscrepancy(
+          frame_stats.frame_timestamps[range_index])
+    }
+
+  def get_gpu_frame_timing (self, gpu_timeline, time_range):
+
+    timeline_data = gpu_timeline.GetTimelineData(time_range.start,
+        time_range.start + time_range.duration)
+    gpu_frame_timing = {}
+
+    # The GL time of each frame on the GPU thread's CPU, and on the GPU
+    # itself if the trace has device timings.
+    for source, prefix in (('cpu', 'gl_cpu_frame_time'),
+                           ('gpu', 'gl_gpu_frame_time')):
+      frame_times = timeline_data.get(('total', source), [])
+      if len(frame_times) == 0:
+        continue
+
+      gpu_frame_timing[prefix + '_p50'] = statistics.Percentile(
+          frame_times, 50)
+      gpu_frame_timing[prefix + '_p95'] = statistics.Percentile(
+          frame_times, 95)
+
+    return gpu_frame_timing
+
+  def get_critical_path_durations (self, flow_graph, time_range):
+
+    durations = {}
+    for s in flow_graph.GetCriticalPathToEvent(time_range):
+      thread_name = s.parent_thread.name
+      if thread_name not in durations:
+        durations[thread_name] = 0
+
+      durations[thread_name] += s.duration
+
+    return durations
+
+  def get_sampled_javascript (self, profiles, time_range):
+
+    call_tree = cpu_profile.GetCallTree(profiles, time_range.start,
+        time_range.start + time_range.duration)
+
+    if call_tree == None:
+      return {}
+
+    # Only frames of web scripts count, which leaves out native frames and
+    # V8's (program), (idle) and (garbage collector) nodes.
+    def get_function_key (function):
+      if not re.search('^http', function.url):
+        return None
+
+      return '%s (%s)' % (function.name, function.url)
+
+    def get_domain_key (function):
+      if not re.search('^http', function.url):
+        return None
+
+      return urlparse(function.url).netloc
+
+    function_self, function_total = call_tree.GetTimes(get_function_key)
+    domain_self, domain_total = call_tree.GetTimes(get_domain_key)
+
+    sampled_javascript = {
+      'Sampled JavaScript functions (self)': self.get_top_n(function_self),
+      'Sampled JavaScript functions (total)': self.get_top_n(function_total),
+      'Sampled JavaScript domains (self)': self.get_top_n(domain_self),
+      'Sampled JavaScript domains (total)': self.get_top_n(domain_total)
+    }
+
+    return dict((extended_type, times) for extended_type, times
+        in sampled_javascript.iteritems() if len(times))
+
+  def get_top_n (self, times, top_n=PROFILE_TOP_N):
+
+    times.pop(None, None)
+    ranked = sorted(times.iteritems(), key=lambda entry: entry[1],
+        reverse=True)
+
+    return dict(ranked[:top_n])
+
   def get_best_duration_for_slice (self, slice):
 
     duration = 0
@@ -604,15 +1147,3 @@ class TraceProcessor():
       duration = slice.duration
 
     return duration
-
-
-  def get_immediate_child_slice_durations (self, slice):
-
-    duration = 0
-    for s in slice.sub_slices:
-      if (s.thread_duration != None):
-        duration += s.thread_duration
-      elif (s.duration != None):
-        duration += s.duration
-
-    return duration
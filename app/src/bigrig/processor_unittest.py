@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import unittest
+from StringIO import StringIO
+from datetime import datetime
+
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from models import Action
+from models import ActionDetail
+from models import Project
+from models import Trace
+from processor import TraceProcessor
+from telemetry.timeline import trace_data as trace_data_module
+
+def metadata (pid, tid, name, args):
+  return {'name': name, 'pid': pid, 'tid': tid, 'ts': 0, 'ph': 'M',
+          'cat': '__metadata', 'args': args}
+
+def complete (pid, tid, cat, name, ts, dur, args={}):
+  return {'name': name, 'pid': pid, 'tid': tid, 'ts': ts, 'dur': dur,
+          'tts': ts, 'tdur': dur, 'ph': 'X', 'cat': cat, 'args': args}
+
+def async (pid, tid, cat, name, ph, ts, id, args={}):
+  return {'name': name, 'pid': pid, 'tid': tid, 'ts': ts, 'tts': ts,
+          'ph': ph, 'cat': cat, 'id': id, 'args': args}
+
+def flow (pid, tid, ph, ts, id):
+  event = {'name': 'PostTask', 'pid': pid, 'tid': tid, 'ts': ts,
+           'ph': ph, 'cat': 'disabled-by-default-toplevel.flow', 'id': id,
+           'args': {}}
+  if ph == 'f':
+    event['bp'] = 'e'
+  return event
+
+# A page with a 'Tap' range, whose input reaches the renderer from the
+# browser, and a 'Scroll' range drawn by the GPU process. A fourth process,
+# with nothing BigRig reads, and a category BigRig doesn't read are trimmed.
+TRACE_EVENTS = [
+  metadata(1, 11, 'thread_name', {'name': 'CrBrowserMain'}),
+  metadata(2, 21, 'process_labels', {'labels': 'Test page'}),
+  metadata(2, 21, 'thread_name', {'name': 'CrRendererMain'}),
+  metadata(2, 22, 'thread_name', {'name': 'Compositor'}),
+  metadata(3, 31, 'thread_name', {'name': 'CrGpuMain'}),
+  metadata(4, 41, 'thread_name', {'name': 'CrUtilityMain'}),
+
+  # Browser: the input, and the task posting it to the renderer.
+  complete(1, 11, 'toplevel', 'MessageLoop::RunTask', 1000, 500),
+  flow(1, 11, 's', 1200, 7),
+  async(1, 11, 'benchmark,latencyInfo', 'InputLatency::MouseDown', 'S',
+      1100, '0x10'),
+  async(1, 11, 'benchmark,latencyInfo', 'InputLatency::MouseDown', 'F',
+      2500, '0x10', {'data': {
+        'INPUT_EVENT_LATENCY_ORIGINAL_COMPONENT': {'time': 1100},
+        'INPUT_EVENT_GPU_SWAP_BUFFER_COMPONENT': {'time': 2400}
+      }}),
+
+  # Renderer: the two ranges, and the work done during them.
+  async(2, 21, 'blink.console', 'Tap', 'S', 1000, '0x1'),
+  complete(2, 21, 'devtools.timeline', 'FunctionCall', 1200, 800),
+  complete(2, 21, 'devtools.timeline', 'Layout', 2100, 300),
+  complete(2, 21, 'toplevel', 'MessageLoop::RunTask', 2800, 400),
+  flow(2, 21, 'f', 2850, 7),
+  async(2, 21, 'blink.console', 'Tap', 'F', 3000, '0x1'),
+  async(2, 21, 'blink.console', 'Scroll', 'S', 4000, '0x2'),
+  complete(2, 21, 'devtools.timeline', 'Paint', 4500, 500),
+  complete(2, 21, 'devtools.timeline', 'UpdateLayerTree', 6000, 200),
+  async(2, 21, 'blink.console', 'Scroll', 'F', 8000, '0x2'),
+  complete(2, 22, 'cc', 'DrawFrame', 4100, 50),
+  complete(2, 22, 'cc', 'DrawFrame', 5300, 50),
+  complete(2, 22, 'cc', 'DrawFrame', 7600, 50),
+  complete(2, 21, 'unread', 'Unread', 6500, 100),
+
+  # GPU: the GL work of the frames drawn during 'Scroll'.
+  complete(3, 31, 'disabled-by-default-gpu.service', 'RenderCompositor-1',
+      4200, 1000, {'gl_category': 'gpu_toplevel'}),
+  complete(3, 31, 'disabled-by-default-gpu.service', 'SwapBuffer',
+      5250, 50),
+  complete(3, 31, 'disabled-by-default-gpu.service', 'RenderCompositor-1',
+      5400, 2000, {'gl_category': 'gpu_toplevel'}),
+  complete(3, 31, 'disabled-by-default-gpu.service', 'SwapBuffer',
+      7500, 50),
+
+  complete(4, 41, 'toplevel', 'MessageLoop::RunTask', 1000, 500)
+]
+
+class TraceProcessorTest(unittest.TestCase):
+
+  def setUp (self):
+    self.testbed = testbed.Testbed()
+    self.testbed.activate()
+    self.testbed.init_datastore_v3_stub()
+    self.testbed.init_memcache_stub()
+    ndb.get_context().clear_cache()
+
+  def tearDown (self):
+    self.testbed.deactivate()
+
+  def create_project (self, secret):
+    project = Project(name='Test', owner='owner@example.com', secret=secret)
+    project.put()
+
+    # 'Tap' is created on import, as a Response action.
+    Action(parent=project.key, name='Scroll', type='Animation',
+        label='Scroll', x_axis=0, y_axis=0, y_axis_max='duration').put()
+
+    return project
+
+  def process (self, project, filename, trace_file):
+    trace_info = Trace(filename=filename, date=datetime(2015, 1, 1),
+        delete_trace_after_import=False, trim_trace_after_import=True)
+    extended_info = {
+      'labels': [],
+      'secret': project.secret,
+      'gpu-timeline': 'true'
+    }
+
+    processor = TraceProcessor()
+    processor.process_files(project, [(filename, trace_file)], trace_info,
+        extended_info)
+
+    action_details = ActionDetail.query(ancestor=project.key).fetch()
+    return processor.trimmed_trace, sorted(
+        [a.to_dict() for a in action_details], key=lambda a: a['date'])
+
+  def testTrimmedTraceReprocessesToTheSameActionDetails (self):
+    trimmed_trace, action_details = self.process(
+        self.create_project('full'), 'trace.json',
+        StringIO(json.dumps(TRACE_EVENTS)))
+
+    trimmed_trace_file = StringIO()
+    trimmed_trace.Serialize(trimmed_trace_file, gzip_result=True)
+    trimmed_trace_file.seek(0)
+    _, trimmed_action_details = self.process(
+        self.create_project('trimmed'), 'trace.json.gz', trimmed_trace_file)
+
+    # Only the unread process and category were trimmed.
+    trimmed_events = trimmed_trace.GetEventsFor(
+        trace_data_module.CHROME_TRACE_PART)
+    self.assertEqual(len(TRACE_EVENTS) - 3, len(trimmed_events))
+
+    # The stages reading the browser and GPU processes had data to read.
+    self.assertEqual(2, len(action_details))
+    tap, scroll = action_details
+    self.assertEqual(1.3, tap['input_latency_max'])
+    self.assertIn('Critical path',
+        [extended['type'] for extended in tap['extended_info']])
+    self.assertNotEqual(None, scroll['gl_cpu_frame_time_p50'])
+
+    self.assertEqual(action_details, trimmed_action_details)
+
+if __name__ == '__main__':
+  unittest.main()
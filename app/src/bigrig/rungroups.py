@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from telemetry.util import statistics
+
+from models import ActionDetail
+from models import ActionDetailAggregate
+from models import ActionDetailStatistics
+
+# The ActionDetail metrics summarized across the runs of a group.
+AGGREGATED_METRICS = (
+  'duration',
+  'parse_html',
+  'javascript',
+  'styles',
+  'update_layer_tree',
+  'layout',
+  'paint',
+  'raster',
+  'composite',
+  'frames_per_second',
+  'first_paint_time',
+  'dom_content_loaded_time',
+  'load_time',
+  'speed_index',
+  'frame_time_p50',
+  'frame_time_p95',
+  'frame_time_p99',
+  'percentage_janky_frames',
+  'frame_time_discrepancy',
+  'gl_cpu_frame_time_p50',
+  'gl_cpu_frame_time_p95',
+  'gl_gpu_frame_time_p50',
+  'gl_gpu_frame_time_p95',
+  'input_latency_p50',
+  'input_latency_p95',
+  'input_latency_max',
+  'long_task_count',
+  'total_blocking_time',
+  'big_jank_thread_time',
+  'biggest_jank_thread_time'
+)
+
+class RunGroup():
+
+  """The aggregate of the runs of a group, for each of the Actions they hit.
+
+  Each ActionDetail is folded into its Action's aggregate as it's added: its
+  value for every metric is appended to those of the previous runs, and the
+  statistics are refreshed from them, so the aggregate is always current
+  without going back to the ActionDetails of earlier runs. Only deleting a
+  run has the aggregate rebuilt from the runs left.
+  """
+
+  def __init__ (self, run_group):
+    self.run_group = run_group
+    self.aggregates = {}
+
+  def get_aggregate (self, action_key):
+    if action_key not in self.aggregates:
+      aggregate = ActionDetailAggregate.get_by_id(self.run_group,
+          parent=action_key)
+
+      if aggregate == None:
+        aggregate = ActionDetailAggregate(id=self.run_group,
+            parent=action_key, run_group=self.run_group, run_count=0,
+            statistics=[])
+
+      self.aggregates[action_key] = aggregate
+
+    return self.aggregates[action_key]
+
+  def add (self, action_detail):
+    aggregate = self.get_aggregate(action_detail.key.parent())
+    statistics_by_metric = dict((s.metric, s) for s in aggregate.statistics)
+
+    for metric in AGGREGATED_METRICS:
+      value = getattr(action_detail, metric)
+
+      # Speed Index is -1 when none was posted.
+      if value == None or (metric == 'speed_index' and value < 0):
+        continue
+
+      metric_statistics = statistics_by_metric.get(metric)
+      if metric_statistics == None:
+        metric_statistics = ActionDetailStatistics(metric=metric, values=[])
+        aggregate.statistics.append(metric_statistics)
+
+      metric_statistics.values.append(float(value))
+      self.update_statistics(metric_statistics)
+
+    aggregate.run_count += 1
+
+    # The group is charted at the time of its first run.
+    if aggregate.date == None or action_detail.date < aggregate.date:
+      aggregate.date = action_detail.date
+
+  def rebuild (self, action_key):
+
+    # The group is folded again from the runs it has left, rather than the
+    # deleted run's values being taken out, as the group's date may have
+    # been that of the deleted run.
+    aggregate = ActionDetailAggregate(id=self.run_group, parent=action_key,
+        run_group=self.run_group, run_count=0, statistics=[])
+    self.aggregates[action_key] = aggregate
+
+    for action_detail in ActionDetail.query(ancestor=action_key).filter(
+        ActionDetail.run_group == self.run_group):
+      self.add(action_detail)
+
+    return aggregate
+
+  def update_statistics (self, metric_statistics):
+    values = metric_statistics.values
+
+    metric_statistics.median = statistics.Median(values)
+    metric_statistics.mean = statistics.ArithmeticMean(values)
+    metric_statistics.stdev = statistics.StandardDeviation(values)
+    metric_statistics.min = min(values)
+    metric_statistics.max = max(values)
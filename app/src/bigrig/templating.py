@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+import jinja2
+
+from google.appengine.api import memcache
+
+_environment = None
+_environment_lock = threading.Lock()
+
+def get_jinja_environment ():
+
+  """Returns the Jinja environment shared by all handlers.
+
+  It's created on first use rather than at import time, and compiled
+  templates are kept in memcache so that new instances don't have to
+  recompile them.
+  """
+
+  global _environment
+
+  if _environment != None:
+    return _environment
+
+  with _environment_lock:
+    if _environment == None:
+      _environment = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(
+            os.path.join(
+              os.path.dirname(__file__), '..'
+            )
+          ),
+        extensions=['jinja2.ext.autoescape'],
+        autoescape=True,
+        bytecode_cache=jinja2.MemcachedBytecodeCache(memcache.Client()))
+
+  return _environment
@@ -15,15 +15,13 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import site
 import re
 import base64
 import webapp2
-import jinja2
 import json
-from jinja2 import Environment, meta
+import urllib
 from random import randint
 
 from google.appengine.api import users
@@ -35,23 +33,19 @@ from google.appengine.ext.webapp import blobstore_handlers
 from google.appengine.ext import vendor
 vendor.add('thirdparty')
 
+from bigrig.blame import BlamePacker
+from bigrig.blame import DomainIds
 from bigrig.models import Project
 from bigrig.models import Action
 from bigrig.models import ActionDetail
+from bigrig.models import ActionDetailAggregate
 from bigrig.models import Log
 from bigrig.models import Trace
-from bigrig.processor import TraceProcessor
+from bigrig.models import RUN_GROUP_ID_PREFIX
+from bigrig.rungroups import RunGroup
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class RedirectHandler(webapp2.RequestHandler):
   def get(self):
 
@@ -107,7 +101,7 @@ class ActionSaveHandler(webapp2.RequestHandler):
       else:
         save_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -153,7 +147,7 @@ class ActionRenderOptionHandler(webapp2.RequestHandler):
       else:
         save_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -209,11 +203,23 @@ class ActionCreateHandler(webapp2.RequestHandler):
       else:
         save_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
 
+def release_blame(project_key, action_details):
+
+  # The domain ids of deleted blame can be handed to other domains, once no
+  # other blob references them.
+  domain_ids = DomainIds.for_project(project_key)
+
+  for action_detail in action_details:
+    BlamePacker.release(action_detail.javascript_blame, domain_ids)
+
+  if domain_ids.changed:
+    domain_ids.dictionary.put()
+
 class ActionDeleteHandler(webapp2.RequestHandler):
   def post(self):
 
@@ -255,12 +261,14 @@ class ActionDeleteHandler(webapp2.RequestHandler):
           ).iter(keys_only=True)
         )
 
+        release_blame(project_key,
+            ActionDetail.query(ancestor=action_detail_key))
         ndb.delete_multi(to_delete)
 
       else:
         delete_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": delete_message
     }))
@@ -292,17 +300,48 @@ class ActionDeleteDetailHandler(webapp2.RequestHandler):
 
       if UserManager.get_user_has_privilege_for_operation(project):
 
-        action_detail_key = ndb.Key(
+        action_key = ndb.Key(
           Project, int(project_key_string),
-          Action, int(action_key_string),
-          ActionDetail, int(action_detail_key_string)
+          Action, int(action_key_string)
         )
 
-        ndb.delete_multi([action_detail_key])
+        # Run groups are charted as a single point, which deletes the
+        # group's aggregate along with all of its runs.
+        if action_detail_key_string.startswith(RUN_GROUP_ID_PREFIX):
+          run_group = urllib.unquote(
+              action_detail_key_string[len(RUN_GROUP_ID_PREFIX):])
+
+          action_details = ActionDetail.query(ancestor=action_key).filter(
+              ActionDetail.run_group == run_group).fetch()
+
+          to_delete = [ndb.Key(ActionDetailAggregate, run_group,
+              parent=action_key)]
+          to_delete.extend([a.key for a in action_details])
+
+          release_blame(project_key, action_details)
+          ndb.delete_multi(to_delete)
+        else:
+          action_detail = ActionDetail.get_by_id(
+              int(action_detail_key_string), parent=action_key)
+
+          if action_detail != None:
+            release_blame(project_key, [action_detail])
+            action_detail.key.delete()
+
+            # A grouped run is also taken out of its group's statistics,
+            # and the group goes with its last run.
+            if action_detail.run_group != None:
+              aggregate = RunGroup(action_detail.run_group).rebuild(
+                  action_key)
+
+              if aggregate.run_count == 0:
+                aggregate.key.delete()
+              else:
+                aggregate.put()
       else:
         delete_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": delete_message
     }))
@@ -18,7 +18,6 @@
 import os
 import sys
 import webapp2
-import jinja2
 import codecs
 import re
 
@@ -27,18 +26,9 @@ vendor.add('thirdparty')
 
 import markdown
 
-from jinja2 import Environment, meta
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class HelpHandler(webapp2.RequestHandler):
 
   def get (self, url):
@@ -50,7 +40,7 @@ class HelpHandler(webapp2.RequestHandler):
     if (url == '' or os.path.isdir('help/%s' % url)):
       url += 'index.md'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/help/help.html')
+    template = get_jinja_environment().get_template('templates/help/help.html')
     help_file_path = 'help/%s' % re.sub('html$', 'md', url)
 
     if not os.path.exists(help_file_path):
@@ -15,19 +15,17 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import re
 import base64
 import webapp2
-import jinja2
 import json
 
 from datetime import datetime
 from datetime import timedelta
-from jinja2 import Environment, meta
 from random import randint
 
+from google.appengine.api import files
 from google.appengine.api import users
 from google.appengine.api import taskqueue
 from google.appengine.ext import blobstore
@@ -44,17 +42,90 @@ from bigrig.models import Log
 from bigrig.models import Trace
 from bigrig.models import Subscription
 from bigrig.models import SubscriptionMessage
-from bigrig.processor import TraceProcessor
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
+# The files API makes a call for every write, so the trimmed trace is handed
+# to it in chunks of this many bytes.
+BLOB_WRITE_CHUNK_SIZE = 512 * 1024
+
+def get_trace_files(trace):
+
+  # Every shard of the trace, as (filename, reader) pairs. The readers are
+  # only read from as each shard is processed.
+  trace_files = [(trace.filename, blobstore.BlobReader(trace.file_key))]
+  for filename, file_key in zip(trace.extra_filenames, trace.extra_file_keys):
+    trace_files.append((filename, blobstore.BlobReader(file_key)))
+
+  return trace_files
+
+class ChunkedBlobWriter():
+
+  """Gathers the many small writes of a trace being serialized into chunks,
+  and writes those to a blob file."""
+
+  def __init__(self, blob_file):
+    self.blob_file = blob_file
+    self.chunks = []
+    self.size = 0
+
+  def write(self, data):
+    self.chunks.append(data)
+    self.size += len(data)
+
+    if self.size >= BLOB_WRITE_CHUNK_SIZE:
+      self.flush()
+
+  def flush(self):
+    if self.size == 0:
+      return
+
+    self.blob_file.write(''.join(self.chunks))
+    self.chunks = []
+    self.size = 0
+
+def retain_trimmed_trace(trace, trimmed_trace):
+
+  # Blob writes and deletes aren't transactional, so this only runs once the
+  # import has committed. The trimmed trace is written to a new blob first,
+  # the Trace is pointed at it in a transaction of its own, and only then are
+  # the original blobs deleted. A failure at any step leaves the Trace
+  # pointing at blobs that exist. The trace is gzipped as it's written, so
+  # neither it nor its JSON are held in memory whole.
+  filename = re.sub('\.(json|json\.gz|zip|tar|tar\.gz|tgz)$', '',
+      trace.filename) + '.json.gz'
+  blob_file_name = files.blobstore.create(mime_type='application/x-gzip',
+      _blobinfo_uploaded_filename=filename)
+
+  with files.open(blob_file_name, 'a') as blob_file:
+    writer = ChunkedBlobWriter(blob_file)
+    trimmed_trace.Serialize(writer, gzip_result=True)
+    writer.flush()
+
+  files.finalize(blob_file_name)
+  blob_key = files.blobstore.get_blob_key(blob_file_name)
+
+  @ndb.transactional
+  def point_trace_at_trimmed_blob():
+    stored_trace = trace.key.get()
+    replaced_blob_keys = ([stored_trace.file_key] +
+        stored_trace.extra_file_keys)
+
+    stored_trace.file_key = blob_key
+    stored_trace.filename = filename
+    stored_trace.extra_file_keys = []
+    stored_trace.extra_filenames = []
+    stored_trace.put()
+
+    return replaced_blob_keys
+
+  try:
+    replaced_blob_keys = point_trace_at_trimmed_blob()
+  except Exception, e:
+    blobstore.delete(blob_key)
+    raise
+
+  blobstore.delete(replaced_blob_keys)
 
 class DebugHandler(webapp2.RequestHandler):
   def get(self):
@@ -92,8 +163,12 @@ class DebugHandler(webapp2.RequestHandler):
     data = '{"secret":"' + secret + '", "labels": [' + labels_list_stringified + ']}'
     data_json = json.loads(data)
 
-    blob_reader = blobstore.BlobReader(trace.file_key)
-    TraceProcessor().process(project, blob_reader.read(), trace, data_json)
+    # Only the ingestion path needs Telemetry, so it's imported on demand to
+    # keep it out of the upload handler's cold start.
+    from bigrig.processor import TraceProcessor
+
+    TraceProcessor().process_files(project, get_trace_files(trace), trace,
+        data_json)
 
 
 class TraceUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
@@ -102,7 +177,7 @@ class TraceUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
 
     self.response.headers.add_header('Access-Control-Allow-Origin', '*')
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
 
     project_secret = self.request.get('secret')
     project = Project.query().filter(Project.secret==project_secret).get()
@@ -124,9 +199,10 @@ class TraceUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
     # the method of accepting or denying posts.
     self.response.headers.add_header('Access-Control-Allow-Origin', '*')
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     data = self.request.get('data')
     delete_trace_after_import = True
+    trim_trace_after_import = False
     json_decode_error = False
     chunks_indicator = '=\r?\n'
 
@@ -160,6 +236,10 @@ class TraceUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
       delete_trace_after_import = (
           data_json['delete-trace-after-import'] == 'true')
 
+    if 'trim-trace-after-import' in data_json:
+      trim_trace_after_import = (
+          data_json['trim-trace-after-import'] == 'true')
+
     uploads = self.get_uploads()
 
     if (len(uploads) == 0):
@@ -168,15 +248,20 @@ class TraceUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
       }))
       return
 
+    # Several files can be uploaded at once, as shards of a single trace.
     upload = uploads[0]
     blob_info = blobstore.BlobInfo(upload.key())
+    extra_blob_infos = [blobstore.BlobInfo(u.key()) for u in uploads[1:]]
 
     trace = Trace(
       file_key=upload.key(),
       date=blob_info.creation,
       filename=blob_info.filename,
       processed=False,
-      delete_trace_after_import=delete_trace_after_import
+      delete_trace_after_import=delete_trace_after_import,
+      trim_trace_after_import=trim_trace_after_import,
+      extra_file_keys=[u.key() for u in uploads[1:]],
+      extra_filenames=[b.filename for b in extra_blob_infos]
     )
 
     project = Project.query().filter(Project.secret==project_secret).get()
@@ -236,21 +321,41 @@ class TraceWorker(webapp2.RequestHandler):
     if (trace == None):
       return
 
+    from bigrig.processor import TraceProcessor
+
     @ndb.transactional(xg=True)
     def process_trace(project, trace, data_json):
 
-      blob_reader = blobstore.BlobReader(trace.file_key)
-      action_details_imported = TraceProcessor().process(project,
-          blob_reader.read(), trace, data_json)
+      # A new processor for every attempt, so that a retried transaction
+      # doesn't reuse the Actions or writes of the one rolled back.
+      processor = TraceProcessor()
+      processor.process_files(project, get_trace_files(trace), trace,
+          data_json)
 
-      # Tidy up the trace file if needed.
+      # Tidy up the trace files if needed.
       if trace.delete_trace_after_import:
-        blobstore.delete(trace.file_key)
+        blobstore.delete([trace.file_key] + trace.extra_file_keys)
         trace.key.delete()
 
-      return action_details_imported
-
-    action_details_imported = process_trace(project, trace, data_json)
+      return processor.trimmed_trace
+
+    trimmed_trace = process_trace(project, trace, data_json)
+
+    # The retained trace is only replaced by its trimmed version once the
+    # import has committed. Failing the task from here on would have it
+    # retried, importing the trace a second time, so errors are only logged.
+    if trimmed_trace != None:
+      try:
+        retain_trimmed_trace(trace, trimmed_trace)
+      except Exception, e:
+        log = Log(
+          parent=project.key,
+          filename=trace.filename,
+          date=datetime.today(),
+          status='Error storing the trimmed trace.',
+          records_imported=0
+        )
+        log.put()
 
 
 app = webapp2.WSGIApplication([
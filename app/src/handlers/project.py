@@ -20,16 +20,16 @@ import sys
 import re
 import base64
 import webapp2
-import jinja2
 import json
 import itertools
+import urllib
 
-from jinja2 import Environment, meta
 from random import randint
 from sets import Set
 
 from google.appengine.api import users
 from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import blobstore
 from google.appengine.ext import ndb
 from google.appengine.ext.ndb import model
@@ -40,19 +40,89 @@ vendor.add('thirdparty')
 from bigrig.models import Project
 from bigrig.models import Action
 from bigrig.models import ActionDetail
+from bigrig.models import ActionDetailAggregate
+from bigrig.models import ActionDetailExtended
+from bigrig.models import RUN_GROUP_ID_PREFIX
 from bigrig.models import Log
 from bigrig.models import Trace
-from bigrig.processor import TraceProcessor
+from bigrig.blame import BlamePacker
+from bigrig.blame import DomainIds
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
+# The chart only plots the date and the numeric series below, so it's
+# served from a projection query rather than from whole ActionDetails. Each
+# projection has a matching composite index in index.yaml.
+CHART_PROPERTIES = [
+  'date',
+  'composite',
+  'duration',
+  'javascript',
+  'layout',
+  'paint',
+  'parse_html',
+  'raster',
+  'styles'
+]
+
+CHART_PROPERTIES_BY_ACTION_TYPE = {
+  'Load': ['dom_content_loaded_time', 'load_time', 'speed_index'],
+  'Response': [],
+  'Animation': ['frames_per_second']
+}
+
+def get_chart_projection (action_type):
+  return (CHART_PROPERTIES +
+      CHART_PROPERTIES_BY_ACTION_TYPE.get(action_type, []))
+
+# Runs posted with a run group are charted one point per group, at the median
+# of its runs, alongside the runs posted without one.
+RUN_GROUP_STATISTICS = ['median', 'mean', 'stdev', 'min', 'max']
+
+def get_run_group_chart_details (aggregates, action_type):
+
+  details = []
+  for aggregate in aggregates:
+    medians = dict((s.metric, s.median) for s in aggregate.statistics)
+    detail = ActionDetail(
+        id=RUN_GROUP_ID_PREFIX + urllib.quote(aggregate.run_group, safe=''),
+        date=aggregate.date)
+
+    for name in get_chart_projection(action_type):
+      if name not in medians:
+        continue
+
+      if name == 'speed_index':
+        setattr(detail, name, int(round(medians[name])))
+      else:
+        setattr(detail, name, medians[name])
+
+    details.append(detail)
+
+  return details
+
+# Project and Action lists are served a page at a time, with the rest
+# loaded incrementally by the page's script.
+LIST_PAGE_SIZE = 50
+
+def get_cursor (request):
+  cursor = request.get('cursor')
+  if (cursor == '' or cursor == None):
+    return None
+
+  try:
+    return Cursor(urlsafe=cursor)
+  except Exception, e:
+    return None
+
+def fetch_list_page (query, cursor):
+  items, next_cursor, more = query.fetch_page(LIST_PAGE_SIZE,
+      start_cursor=cursor)
+
+  if not more or next_cursor == None:
+    return items, None
+
+  return items, next_cursor.urlsafe()
 
 class RedirectHandler(webapp2.RequestHandler):
   def get(self):
@@ -78,34 +148,14 @@ class ProjectDeleteHandler(webapp2.RequestHandler):
       if UserManager.get_user_has_privilege_for_operation(project):
 
         project_key = ndb.Key(Project, project.key.integer_id())
-        actions = Action.query(ancestor=project_key)
-
-        # Start with the project
-        to_delete = [project.key]
-
-        # No find all its actions
-        for action in actions:
-
-          # Add those to the list
-          to_delete.append(action.key)
-
-          # Now get all the action details
-          action_detail_key = ndb.Key(
-            Project, project.key.integer_id(),
-            Action, action.key.integer_id()
-          )
-
-          action_details = ActionDetail.query(ancestor=action_detail_key)
-
-          for action_detail in action_details:
-            to_delete.append(action_detail.key)
 
-        ndb.delete_multi(to_delete)
+        # The project and everything stored under it, whatever its kind.
+        ndb.delete_multi(ndb.Query(ancestor=project_key).iter(keys_only=True))
 
       else:
         delete_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": delete_message
     }))
@@ -141,7 +191,7 @@ class ProjectEditHandler(webapp2.RequestHandler):
         else:
           save_message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -172,7 +222,7 @@ class ProjectCreateHandler(webapp2.RequestHandler):
 
       project.put()
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/project-create.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/project-create.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -184,9 +234,29 @@ class ProjectListHandler(webapp2.RequestHandler):
       self.redirect('/user-not-found')
       return
 
-    template = JINJA_ENVIRONMENT.get_template('templates/project/project.html')
+    cursor = get_cursor(self.request)
+    private_projects = []
+
+    # Admins see everything. Everyone else sees the public projects, plus
+    # their own private ones on the first page.
+    if UserManager.is_admin():
+      query = Project.query().order(Project.name)
+    else:
+      query = Project.query(Project.visible_to_owner_only == False).order(
+          Project.name)
+
+      if cursor == None:
+        private_projects = Project.query(
+            Project.owner == UserManager.get_email(),
+            Project.visible_to_owner_only == True).order(Project.name).fetch()
+
+    projects, next_cursor = fetch_list_page(query, cursor)
+
+    template = get_jinja_environment().get_template('templates/project/project.html')
     self.response.write(template.render({
-      'projects': Project.query(),
+      'projects': private_projects + projects,
+      'next_page_url': (
+          '/project/list?cursor=%s' % next_cursor if next_cursor else None),
       'sign_out_url': UserManager.get_signout_url(),
       'gravatar_url': UserManager.get_gravatar_url(),
       'user_email': UserManager.get_email(),
@@ -216,11 +286,18 @@ class ProjectActionListHandler(webapp2.RequestHandler):
 
     project_key = ndb.Key(Project, int(key))
     template_path = 'templates/project/action.html'
+    actions, next_cursor = fetch_list_page(
+        Action.query(ancestor=project_key).order(Action.name),
+        get_cursor(self.request))
+
     data = {
       'project_key': key,
       'project_secret': project.secret,
       'logs': Log.query(ancestor=project_key).order(-Log.date).fetch(5),
-      'actions': Action.query(ancestor=project_key).order(Action.name),
+      'actions': actions,
+      'next_page_url': (
+          '/project/%s/?cursor=%s' % (key, next_cursor)
+          if next_cursor else None),
       'action_upload_url': blobstore.create_upload_url('/action/import'),
       'sign_out_url': UserManager.get_signout_url(),
       'gravatar_url': UserManager.get_gravatar_url(),
@@ -234,7 +311,7 @@ class ProjectActionListHandler(webapp2.RequestHandler):
       }]
     }
 
-    template = JINJA_ENVIRONMENT.get_template(template_path)
+    template = get_jinja_environment().get_template(template_path)
     self.response.write(template.render(data))
 
 class ProjectActionDetailHandler(webapp2.RequestHandler):
@@ -271,13 +348,47 @@ class ProjectActionDetailHandler(webapp2.RequestHandler):
       self.redirect('/project/%s/' % project_key_string)
       return
 
-    template_path = 'templates/project/action-detail.html'
+    action_detail_query = ActionDetail.query(ancestor=action_detail_key)
 
     if (is_json):
-      template_path = 'templates/_endpoints/chart-data.json'
 
-    actions = ActionDetail.query(ancestor=action_detail_key).order(
-        -ActionDetail.date)
+      grouped_keys = set(action_detail_query.filter(
+          ActionDetail.run_group != None).iter(keys_only=True))
+
+      ungrouped = [
+        a for a in action_detail_query.order(-ActionDetail.date).iter(
+            projection=get_chart_projection(action.type))
+        if a.key not in grouped_keys
+      ]
+
+      run_groups = get_run_group_chart_details(
+          ActionDetailAggregate.query(ancestor=action_detail_key),
+          action.type)
+
+      actions = sorted(ungrouped + run_groups, key=lambda a: a.date,
+          reverse=True)
+
+      template = get_jinja_environment().get_template(
+          'templates/_endpoints/chart-data.json')
+      self.response.write(template.render({
+        'action_name': action.name,
+        'action_type': action.type,
+        'action_x_axis': action.x_axis,
+        'action_y_axis': action.y_axis,
+        'action_key': action_key_string,
+        'project_key': project_key_string,
+        'extended_info_url': '/project/%s/%s/' % (project_key_string,
+            action_key_string),
+        'actions': actions
+      }))
+      return
+
+    template_path = 'templates/project/action-detail.html'
+
+    # Speed Index is only usable if every record has one, so look for any
+    # record that doesn't rather than loading them all.
+    can_use_speed_index = action_detail_query.filter(
+        ActionDetail.speed_index < 0).get(keys_only=True) == None
 
     data = {
       'action_name': action.name,
@@ -290,8 +401,8 @@ class ProjectActionDetailHandler(webapp2.RequestHandler):
       'action_key': action_key_string,
       'project_key': project_key_string,
       'project_secret': project.secret,
-      'actions': actions,
-      'can_use_speed_index': all(a.speed_index > -1 for a in actions),
+      'last_action': action_detail_query.order(-ActionDetail.date).get(),
+      'can_use_speed_index': can_use_speed_index,
       'sign_out_url': UserManager.get_signout_url(),
       'gravatar_url': UserManager.get_gravatar_url(),
       'user_email': UserManager.get_email(),
@@ -308,11 +419,11 @@ class ProjectActionDetailHandler(webapp2.RequestHandler):
       }]
     }
 
-    def remap_extended_info(values):
+    def remap_extended_info(action_detail):
 
       remapped_values = {}
 
-      for v in values:
+      for v in (action_detail.extended_info or []):
 
         if v.type not in remapped_values:
           remapped_values[v.type] = []
@@ -333,7 +444,14 @@ class ProjectActionDetailHandler(webapp2.RequestHandler):
         # print v
         remapped_values[v.type].append(value)
 
-      if 'JavaScript' in remapped_values:
+      # Packed blame is already numeric and sorted, so only older records,
+      # which stored one string per domain, need sorting here.
+      if action_detail.javascript_blame:
+        remapped_values['JavaScript'] = BlamePacker.unpack(
+            action_detail.javascript_blame,
+            DomainIds.for_project(project.key))
+
+      elif 'JavaScript' in remapped_values:
         remapped_values['JavaScript'] = (
           sorted(remapped_values['JavaScript'],
                 key=lambda r: float(r['value']),
@@ -342,11 +460,99 @@ class ProjectActionDetailHandler(webapp2.RequestHandler):
 
       return remapped_values
 
-    JINJA_ENVIRONMENT.filters['remap_extended_info'] = remap_extended_info
-    template = JINJA_ENVIRONMENT.get_template(template_path)
+    # The extended info is remapped here rather than in a template filter,
+    # as the environment's filters are shared by every request, and the
+    # blame has to be decoded with this project's domains.
+    last_action = data['last_action']
+    if (last_action != None and
+        (last_action.extended_info or last_action.javascript_blame)):
+      data['extended_info'] = remap_extended_info(last_action)
+
+    template = get_jinja_environment().get_template(template_path)
     self.response.write(template.render(data))
 
+class ProjectActionDetailExtendedInfoHandler(webapp2.RequestHandler):
 
+  def get (self, project_key_string, action_key_string,
+      action_detail_key_string):
+
+    if UserManager.get_current_user() == None:
+      self.redirect('/user-not-found')
+      return
+
+    project = Project.get_by_id(int(project_key_string))
+
+    if (project == None or
+        not UserManager.get_user_has_privilege_for_operation(project)):
+      self.redirect('/')
+      return
+
+    action_detail = ndb.Key(
+      Project, int(project_key_string),
+      Action, int(action_key_string),
+      ActionDetail, int(action_detail_key_string)
+    ).get()
+
+    extended_info = []
+    if (action_detail != None):
+      extended_info.extend(action_detail.extended_info or [])
+
+      if action_detail.javascript_blame:
+        extended_info.extend(BlamePacker.unpack(
+            action_detail.javascript_blame,
+            DomainIds.for_project(project.key)))
+
+    template = get_jinja_environment().get_template(
+        'templates/_endpoints/extended-info.json')
+    self.response.write(template.render({
+      'action_detail_key': action_detail_key_string,
+      'extended_info': extended_info
+    }))
+
+class ProjectActionRunGroupExtendedInfoHandler(webapp2.RequestHandler):
+
+  def get (self, project_key_string, action_key_string, run_group_string):
+
+    if UserManager.get_current_user() == None:
+      self.redirect('/user-not-found')
+      return
+
+    project = Project.get_by_id(int(project_key_string))
+
+    if (project == None or
+        not UserManager.get_user_has_privilege_for_operation(project)):
+      self.redirect('/')
+      return
+
+    aggregate = ActionDetailAggregate.get_by_id(
+        urllib.unquote(run_group_string),
+        parent=ndb.Key(Project, int(project_key_string),
+            Action, int(action_key_string)))
+
+    # The statistics of every metric across the runs of the group stand in
+    # for the extended info of a single run.
+    extended_info = []
+    if (aggregate != None):
+      extended_info.append(ActionDetailExtended(
+        type='Runs',
+        name='count',
+        value=str(aggregate.run_count)
+      ))
+
+      for metric_statistics in aggregate.statistics:
+        for statistic in RUN_GROUP_STATISTICS:
+          extended_info.append(ActionDetailExtended(
+            type=metric_statistics.metric,
+            name=statistic,
+            value=str(getattr(metric_statistics, statistic))
+          ))
+
+    template = get_jinja_environment().get_template(
+        'templates/_endpoints/extended-info.json')
+    self.response.write(template.render({
+      'action_detail_key': RUN_GROUP_ID_PREFIX + run_group_string,
+      'extended_info': extended_info
+    }))
 
 app = webapp2.WSGIApplication([
     ('/', RedirectHandler),
@@ -355,5 +561,8 @@ app = webapp2.WSGIApplication([
     ('/project/delete', ProjectDeleteHandler),
     ('/project/edit', ProjectEditHandler),
     ('/project/(\d+)/?$', ProjectActionListHandler),
+    ('/project/(\d+)/(\d+)/(\d+)/extended', ProjectActionDetailExtendedInfoHandler),
+    ('/project/(\d+)/(\d+)/run-group/(.+)/extended',
+        ProjectActionRunGroupExtendedInfoHandler),
     ('/project/(\d+/\d+/.*)', ProjectActionDetailHandler)
 ], debug=True)
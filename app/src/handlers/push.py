@@ -15,16 +15,13 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import re
 import base64
 import webapp2
-import jinja2
 import json
 import itertools
 
-from jinja2 import Environment, meta
 from random import randint
 from sets import Set
 from datetime import datetime
@@ -42,19 +39,9 @@ from bigrig.models import Project
 from bigrig.models import Action
 from bigrig.models import Subscription
 from bigrig.models import SubscriptionMessage
-from bigrig.processor import TraceProcessor
 from bigrig.usermanager import UserManager
 from bigrig.pushmessage import PushMessage
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class PushHandler(webapp2.RequestHandler):
   def get(self):
 
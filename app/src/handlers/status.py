@@ -15,16 +15,13 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import re
 import base64
 import webapp2
-import jinja2
 import json
 import itertools
 
-from jinja2 import Environment, meta
 from random import randint
 from sets import Set
 
@@ -41,26 +38,17 @@ from bigrig.models import Project
 from bigrig.models import Action
 from bigrig.models import Subscription
 from bigrig.models import SubscriptionMessage
-from bigrig.processor import TraceProcessor
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
 import urllib
 from google.appengine.api import urlfetch
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class StatusHandler(webapp2.RequestHandler):
   def get(self):
 
     subscription_id_string = self.request.get('subscription-id')
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
 
     if subscription_id_string == '' or subscription_id_string is None:
       self.response.write('No subscription id')
@@ -15,16 +15,13 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import re
 import base64
 import webapp2
-import jinja2
 import json
 import itertools
 
-from jinja2 import Environment, meta
 from random import randint
 from sets import Set
 
@@ -40,18 +37,9 @@ vendor.add('thirdparty')
 from bigrig.models import Project
 from bigrig.models import Action
 from bigrig.models import Subscription
-from bigrig.processor import TraceProcessor
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class SubscriptionHandler(webapp2.RequestHandler):
   def post(self, url):
 
@@ -107,7 +95,7 @@ class SubscriptionHandler(webapp2.RequestHandler):
       else:
         message = 'Permission denied.'
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": message
     }))
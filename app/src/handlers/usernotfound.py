@@ -15,30 +15,17 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import webapp2
-import jinja2
 import codecs
 import re
 
 from google.appengine.ext import vendor
 vendor.add('thirdparty')
 
-import markdown
-
-from jinja2 import Environment, meta
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class UserNotFoundHandler(webapp2.RequestHandler):
 
   def get (self):
@@ -46,7 +33,7 @@ class UserNotFoundHandler(webapp2.RequestHandler):
     if UserManager.get_current_user() != None:
       self.redirect('/')
 
-    template = JINJA_ENVIRONMENT.get_template('templates/user-not-found.html')
+    template = get_jinja_environment().get_template('templates/user-not-found.html')
     self.response.write(template.render({
       'sign_out_url': UserManager.get_signout_url(),
       'user_email': UserManager.get_email(),
@@ -15,29 +15,18 @@
 # limitations under the License.
 #
 
-import os
 import sys
 import webapp2
-import jinja2
 import codecs
 import re
 
 from google.appengine.ext import ndb
 
-from jinja2 import Environment, meta
 from bigrig.models import Project
 from bigrig.models import User
+from bigrig.templating import get_jinja_environment
 from bigrig.usermanager import UserManager
 
-JINJA_ENVIRONMENT = jinja2.Environment(
-    loader=jinja2.FileSystemLoader(
-        os.path.join(
-          os.path.dirname(__file__), '..'
-        )
-      ),
-    extensions=['jinja2.ext.autoescape'],
-    autoescape=True)
-
 class UsersCreateHandler(webapp2.RequestHandler):
 
   def post (self):
@@ -57,7 +46,7 @@ class UsersCreateHandler(webapp2.RequestHandler):
       user = User(email=user_email)
       user.put()
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -94,7 +83,7 @@ class UsersDeleteHandler(webapp2.RequestHandler):
       user = UserManager.get_user_by_email_address(user_email)
       user.key.delete()
 
-    template = JINJA_ENVIRONMENT.get_template('templates/_endpoints/action-update.json')
+    template = get_jinja_environment().get_template('templates/_endpoints/action-update.json')
     self.response.write(template.render({
       "message": save_message
     }))
@@ -112,7 +101,7 @@ class UsersHandler(webapp2.RequestHandler):
       self.redirect('/')
       return
 
-    template = JINJA_ENVIRONMENT.get_template('templates/users/users.html')
+    template = get_jinja_environment().get_template('templates/users/users.html')
 
     def is_user_admin(user):
 
@@ -121,7 +110,7 @@ class UsersHandler(webapp2.RequestHandler):
 
       return remapped_values
 
-    JINJA_ENVIRONMENT.filters['is_user_admin'] = is_user_admin
+    get_jinja_environment().filters['is_user_admin'] = is_user_admin
 
     self.response.write(template.render({
       'users': User.query(),
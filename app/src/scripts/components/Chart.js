@@ -202,6 +202,7 @@ export default class Chart {
 
   setJavaScriptExecutionTime () {
 
+    this.javaScriptExecution = [];
     let currentDataset = this.data.details[this.selectedIndex];
 
     if (typeof currentDataset.extendedInfo == 'undefined')
@@ -209,8 +210,6 @@ export default class Chart {
 
     let extendedInfo = currentDataset.extendedInfo;
 
-    this.javaScriptExecution = [];
-
     for (var x = 0; x < extendedInfo.length; x++) {
       if (extendedInfo[x].type === 'JavaScript') {
         this.javaScriptExecution.push(extendedInfo[x]);
@@ -223,6 +222,53 @@ export default class Chart {
 
   }
 
+  loadExtendedInfo () {
+
+    // The chart data only carries the plotted values, so the extended info
+    // for a point is fetched (once) when that point is selected.
+    let index = this.selectedIndex;
+    let currentDataset = this.data.details[index];
+
+    if (!currentDataset)
+      return;
+
+    let onExtendedInfoAvailable = () => {
+
+      // Bail if the selection moved on while the request was in flight.
+      if (index !== this.selectedIndex)
+        return;
+
+      this.setWPTTestResultID();
+      this.setCommitURL();
+      this.setJavaScriptExecutionTime();
+
+      if (this.labelMode === this.constants.LABEL_RAW)
+        this.updateExtendedInfo();
+    };
+
+    this.wptTestResultID = null;
+    this.commitURL = null;
+    this.javaScriptExecution = [];
+
+    if (typeof currentDataset.extendedInfo !== 'undefined') {
+      onExtendedInfoAvailable();
+      return;
+    }
+
+    let xhr = new XMLHttpRequest();
+    xhr.addEventListener('load', () => {
+      if (xhr.status !== 200)
+        return;
+
+      currentDataset.extendedInfo = xhr.response.extendedInfo;
+      onExtendedInfoAvailable();
+    });
+    xhr.responseType = 'json';
+    xhr.open('get',
+        `${this.data.extendedInfoUrl}${currentDataset.id}/extended`);
+    xhr.send();
+  }
+
   onCommitButtonClick () {
 
     if (this.commitURL === null)
@@ -252,9 +298,7 @@ export default class Chart {
       return;
 
     this.selectedIndex = this.compareIndex;
-    this.setWPTTestResultID();
-    this.setCommitURL();
-    this.setJavaScriptExecutionTime();
+    this.loadExtendedInfo();
 
     // Update the delete button.
     this.deleteButton.dataset.actionDetailKey =
@@ -388,11 +432,7 @@ export default class Chart {
 
           this.selectedIndex = this.data.details.length - 1;
 
-          console.log(this.data.details[this.selectedIndex]);
-
-          this.setWPTTestResultID();
-          this.setCommitURL();
-          this.setJavaScriptExecutionTime();
+          this.loadExtendedInfo();
 
           this.xAxisButton.disabled = this.yAxisButton.disabled = false;
           this.xAxis = this.data.xAxis;
@@ -1335,6 +1375,11 @@ export default class Chart {
     this.detailsComposite.textContent =
         this.intlNumber.format(data.composite) + 'ms';
 
+    this.updateExtendedInfo();
+  }
+
+  updateExtendedInfo () {
+
     if (this.wptTestResultID)
       this.wptDetailsButton.classList.add('wpt-results-button--visible');
     else
@@ -0,0 +1,93 @@
+/**
+ * @license
+ * Copyright 2015 Google Inc. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *      http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import ToasterInstance from './Toaster';
+
+/**
+ * Appends the rows of the next page of a paginated list to the current one.
+ * Each page is the same server-rendered page with a cursor, so the rows are
+ * lifted out of the fetched document and the "Show more" button is swapped
+ * for the one on the new page (if any).
+ */
+export default class NextPageLoader {
+
+  constructor (tableSelector, onRowsAdded) {
+
+    this.tableSelector = tableSelector;
+    this.onRowsAdded = onRowsAdded || function () {};
+    this.onNextPageClick = this.onNextPageClick.bind(this);
+
+    this.initButton(document.querySelector('.next-page-button'));
+  }
+
+  initButton (button) {
+
+    this.button = button;
+
+    if (!this.button)
+      return;
+
+    this.button.addEventListener('click', this.onNextPageClick);
+  }
+
+  onNextPageClick () {
+
+    this.button.disabled = true;
+
+    let xhr = new XMLHttpRequest();
+    xhr.addEventListener('load', () => {
+
+      if (xhr.status !== 200 || !xhr.response) {
+        this.button.disabled = false;
+        ToasterInstance().then ( (toaster) => {
+          toaster.toast('Unable to load more items');
+        });
+        return;
+      }
+
+      let tbody = document.querySelector(`${this.tableSelector} tbody`);
+      let nextTbody =
+          xhr.response.querySelector(`${this.tableSelector} tbody`);
+      let rows = [];
+
+      while (nextTbody && nextTbody.firstElementChild) {
+        let row = document.importNode(nextTbody.firstElementChild, true);
+        nextTbody.removeChild(nextTbody.firstElementChild);
+        tbody.appendChild(row);
+        rows.push(row);
+      }
+
+      this.onRowsAdded(rows);
+
+      // Replace the button with the next page's, if there is one.
+      let container = this.button.parentElement;
+      let nextButton = xhr.response.querySelector('.next-page-button');
+
+      if (!nextButton) {
+        container.parentElement.removeChild(container);
+        this.button = null;
+        return;
+      }
+
+      this.button.dataset.nextPageUrl = nextButton.dataset.nextPageUrl;
+      this.button.disabled = false;
+    });
+    xhr.responseType = 'document';
+    xhr.open('get', this.button.dataset.nextPageUrl);
+    xhr.send();
+  }
+}
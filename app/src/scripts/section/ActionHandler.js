@@ -15,10 +15,15 @@
  * limitations under the License.
  */
 
+import NextPageLoader from '../helper/NextPageLoader';
+
 export default class ActionHandler {
 
   constructor () {
 
+    // Load further pages of actions on demand
+    new NextPageLoader('.actions-list');
+
     var actionSelector = document.getElementById('action-options-selector');
     var createAction = actionSelector.querySelector('[for="create-action"]');
     var noActions = document.querySelector('.no-actions-button');
@@ -16,6 +16,7 @@
  */
 
 import ToasterInstance from '../helper/Toaster';
+import NextPageLoader from '../helper/NextPageLoader';
 
 export default class ProjectHandler {
 
@@ -39,13 +40,21 @@ export default class ProjectHandler {
     this.initDeleteProject();
 
     // Copy a project's secret
-    this.initCopySecrets();
-
+    this.initCopySecrets(document);
+
+    // Load further pages of projects on demand
+    new NextPageLoader('.projects-list', (rows) => {
+      rows.forEach((row) => {
+        this.initCopySecrets(row);
+        this.initEditButtons(row);
+        this.initDeleteButtons(row);
+      });
+    });
   }
 
-  initCopySecrets () {
+  initCopySecrets (root) {
 
-    let copySecretButtons = document.querySelectorAll('.project-secret-copy');
+    let copySecretButtons = root.querySelectorAll('.project-secret-copy');
 
     for (let c = 0; c < copySecretButtons.length; c++) {
       copySecretButtons[c].addEventListener('click', this.onCopySecret);
@@ -85,8 +94,6 @@ export default class ProjectHandler {
 
   initEditProject () {
 
-    let editButtons = document.querySelectorAll('.project-edit');
-
     if (typeof window.DialogFinder === 'undefined')
       return;
 
@@ -101,7 +108,7 @@ export default class ProjectHandler {
       this.onConfirmEdit();
     });
 
-    let onEditClick = (evt) => {
+    this.onEditClick = (evt) => {
       if (!this.editProjectDialog)
         return;
 
@@ -126,15 +133,23 @@ export default class ProjectHandler {
       projectName.focus();
     };
 
+    this.initEditButtons(document);
+  }
+
+  initEditButtons (root) {
+
+    if (!this.onEditClick)
+      return;
+
+    let editButtons = root.querySelectorAll('.project-edit');
+
     for (let e = 0; e < editButtons.length; e++) {
-      editButtons[e].addEventListener('click', onEditClick)
+      editButtons[e].addEventListener('click', this.onEditClick)
     }
   }
 
   initDeleteProject () {
 
-    let deleteButtons = document.querySelectorAll('.project-delete');
-
     if (typeof window.DialogFinder === 'undefined')
       return;
 
@@ -149,7 +164,7 @@ export default class ProjectHandler {
       this.onConfirmDelete();
     });
 
-    let onDeleteClick = (evt) => {
+    this.onDeleteClick = (evt) => {
       if (!this.deleteProjectDialog)
         return;
 
@@ -160,8 +175,18 @@ export default class ProjectHandler {
       this.deleteProjectDialog.show(this.onConfirmDelete, this.onCancelDelete);
     };
 
+    this.initDeleteButtons(document);
+  }
+
+  initDeleteButtons (root) {
+
+    if (!this.onDeleteClick)
+      return;
+
+    let deleteButtons = root.querySelectorAll('.project-delete');
+
     for (let d = 0; d < deleteButtons.length; d++) {
-      deleteButtons[d].addEventListener('click', onDeleteClick)
+      deleteButtons[d].addEventListener('click', this.onDeleteClick)
     }
   }
 
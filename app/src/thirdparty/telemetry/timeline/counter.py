@@ -2,6 +2,10 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import array
+import bisect
+import operator
+
 import telemetry.timeline.event_container as event_container
 
 
@@ -52,15 +56,23 @@ class CounterSample(object):
 
 class Counter(event_container.TimelineEventContainer):
   """ Stores all the samples for a given counter.
+
+  Timestamps and samples are stored as dense arrays of doubles. The samples
+  of all series are interleaved, so sample i of series j is at
+  samples[i * num_series + j].
   """
   def __init__(self, parent, category, name):
     super(Counter, self).__init__(name, parent)
     self.category = category
     self.full_name = category + '.' + name
-    self.samples = []
-    self.timestamps = []
+    self.samples = array.array('d')
+    self.timestamps = array.array('d')
     self.series_names = []
-    self.totals = []
+    # Stacked totals, laid out like samples: totals[i * num_series + j] is
+    # the sum of series 0 to j at sample i.
+    self.totals = array.array('d')
+    # The sum of all series at each sample.
+    self.sample_totals = array.array('d')
     self.max_total = 0
 
   def IterChildContainers(self):
@@ -92,17 +104,105 @@ class Counter(event_container.TimelineEventContainer):
       raise ValueError(
           'Length of samples must be a multiple of length of timestamps.')
 
-    self.totals = []
+    self.timestamps = array.array('d', self.timestamps)
+    self.samples = array.array('d', self.samples)
+    self.totals = array.array('d')
+    self.sample_totals = array.array('d')
     self.max_total = 0
     if not len(self.samples):
       return
 
-    max_total = None
-    for i in xrange(self.num_samples):
-      total = 0
-      for j in xrange(self.num_series):
-        total += self.samples[i * self.num_series + j]
-        self.totals.append(total)
-      if max_total is None or total > max_total:
-        max_total = total
-    self.max_total = max_total
+    self._SortSamplesByTimestamp()
+
+    # Build the stacked totals one series at a time rather than one sample
+    # at a time, so that the additions happen in map() instead of a loop.
+    num_series = self.num_series
+    self.totals = array.array('d', self.samples)
+    running_total = self.samples[0::num_series]
+    for j in xrange(1, num_series):
+      running_total = array.array('d', map(
+          operator.add, running_total, self.samples[j::num_series]))
+      self.totals[j::num_series] = running_total
+    self.sample_totals = running_total
+    self.max_total = max(running_total)
+
+  def _SortSamplesByTimestamp(self):
+    timestamps = self.timestamps
+    if all(timestamps[i] <= timestamps[i + 1]
+           for i in xrange(len(timestamps) - 1)):
+      return
+
+    num_series = self.num_series
+    order = sorted(xrange(len(timestamps)), key=timestamps.__getitem__)
+    samples = array.array('d')
+    for i in order:
+      samples.extend(self.samples[i * num_series:(i + 1) * num_series])
+    self.timestamps = array.array('d', (timestamps[i] for i in order))
+    self.samples = samples
+
+  def AddBounds(self, bounds):
+    """Adds the first and last timestamps to bounds."""
+    if len(self.timestamps):
+      bounds.AddValue(min(self.timestamps))
+      bounds.AddValue(max(self.timestamps))
+
+  def ShiftTimestamps(self, shift_amount):
+    """Shifts all timestamps back by shift_amount."""
+    self.timestamps = array.array('d', (t - shift_amount
+                                        for t in self.timestamps))
+
+  def GetSampleIndexRange(self, start, end):
+    """Returns the (begin, end) indices of the samples within [start, end].
+
+    Only valid after FinalizeImport, which sorts the samples by timestamp.
+    """
+    return (bisect.bisect_left(self.timestamps, start),
+            bisect.bisect_right(self.timestamps, end))
+
+  def GetSamplesInRange(self, start, end):
+    """Returns the timestamps and interleaved samples within [start, end],
+    as arrays.
+    """
+    begin, end = self.GetSampleIndexRange(start, end)
+    num_series = self.num_series
+    return (self.timestamps[begin:end],
+            self.samples[begin * num_series:end * num_series])
+
+  def GetSeries(self, series_name):
+    """Returns the samples of one series as an array."""
+    j = self.series_names.index(series_name)
+    return self.samples[j::self.num_series]
+
+  def Resample(self, interval, start=None, end=None):
+    """Resamples the counter to a fixed interval.
+
+    A counter holds its value until the next sample, so each resampled point
+    takes the value of the last sample at or before it. Points before the
+    first sample are skipped.
+
+    Returns the resampled timestamps and interleaved samples, as arrays.
+    """
+    assert interval > 0
+    timestamps = array.array('d')
+    samples = array.array('d')
+    if not len(self.timestamps):
+      return timestamps, samples
+    if start == None:
+      start = self.timestamps[0]
+    if end == None:
+      end = self.timestamps[-1]
+
+    num_series = self.num_series
+    num_samples = self.num_samples
+    i = bisect.bisect_right(self.timestamps, start) - 1
+    timestamp = start
+    step = 0
+    while timestamp <= end:
+      while i + 1 < num_samples and self.timestamps[i + 1] <= timestamp:
+        i += 1
+      if i >= 0:
+        timestamps.append(timestamp)
+        samples.extend(self.samples[i * num_series:(i + 1) * num_series])
+      step += 1
+      timestamp = start + step * interval
+    return timestamps, samples
@@ -62,3 +62,40 @@ class CounterIterEventsInThisContainerTest(unittest.TestCase):
     self.assertEqual([222], [s.start for s in eventlist])
     self.assertEqual(['cat.name'], [s.name for s in eventlist])
     self.assertEqual([200], [s.value for s in eventlist])
+
+
+class CounterFinalizeImportTest(unittest.TestCase):
+
+  def setUp(self):
+    parent = FakeProcess()
+    self.counter = counter_module.Counter(parent, 'cat', 'name')
+    self.counter.series_names = ['a', 'b']
+    # Intentionally out of order.
+    self.counter.timestamps = [20, 0, 10, 30]
+    self.counter.samples = [5, 1,
+                            1, 2,
+                            3, 4,
+                            0, 0]
+    self.counter.FinalizeImport()
+
+  def testSamplesAreSortedByTimestamp(self):
+    self.assertEqual([0, 10, 20, 30], list(self.counter.timestamps))
+    self.assertEqual([1, 2, 3, 4, 5, 1, 0, 0], list(self.counter.samples))
+
+  def testTotals(self):
+    self.assertEqual([1, 3, 3, 7, 5, 6, 0, 0], list(self.counter.totals))
+    self.assertEqual([3, 7, 6, 0], list(self.counter.sample_totals))
+    self.assertEqual(7, self.counter.max_total)
+
+  def testGetSeries(self):
+    self.assertEqual([2, 4, 1, 0], list(self.counter.GetSeries('b')))
+
+  def testGetSamplesInRange(self):
+    timestamps, samples = self.counter.GetSamplesInRange(5, 20)
+    self.assertEqual([10, 20], list(timestamps))
+    self.assertEqual([3, 4, 5, 1], list(samples))
+
+  def testResample(self):
+    timestamps, samples = self.counter.Resample(15, start=-5)
+    self.assertEqual([10, 25], list(timestamps))
+    self.assertEqual([3, 4, 5, 1], list(samples))
@@ -0,0 +1,213 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""Sampled CPU profiles, aggregated into call trees over time ranges.
+
+Stacks are interned into a StackTable shared by the whole model: each
+distinct (parent node, function) pair is a single node, so a sample is just a
+timestamp and a node index. Aggregating a range first sums sample weights per
+node, and only then walks the (far fewer) distinct stacks, which keeps it fast
+at high sampling rates over long traces.
+"""
+
+import array
+import bisect
+import collections
+
+# Samples further apart than this (in ms) are assumed to have a gap between
+# them, rather than to have been spent entirely in the first stack.
+MAX_SAMPLE_INTERVAL = 10
+
+NO_PARENT = -1
+
+
+ProfileFunction = collections.namedtuple('ProfileFunction', ['name', 'url'])
+
+
+class StackTable(object):
+  """Interns functions and stack nodes.
+
+  Node i calls function node_functions[i] from node node_parents[i], which is
+  NO_PARENT for the outermost frame.
+  """
+  def __init__(self):
+    self.functions = []
+    self.node_parents = array.array('l')
+    self.node_functions = array.array('l')
+    self._function_ids = {}
+    self._node_ids = {}
+
+  def InternFunction(self, name, url):
+    key = (name, url)
+    function_id = self._function_ids.get(key)
+    if function_id == None:
+      function_id = len(self.functions)
+      self.functions.append(ProfileFunction(name, url))
+      self._function_ids[key] = function_id
+    return function_id
+
+  def InternNode(self, parent, function_id):
+    key = (parent, function_id)
+    node = self._node_ids.get(key)
+    if node == None:
+      node = len(self.node_parents)
+      self.node_parents.append(parent)
+      self.node_functions.append(function_id)
+      self._node_ids[key] = node
+    return node
+
+  def GetStack(self, node):
+    """Returns the functions of the stack ending at node, outermost first."""
+    stack = []
+    while node != NO_PARENT:
+      stack.append(self.functions[self.node_functions[node]])
+      node = self.node_parents[node]
+    stack.reverse()
+    return stack
+
+
+class ThreadProfile(object):
+  """The CPU samples taken on a thread, as parallel arrays of timestamps and
+  stack nodes."""
+  def __init__(self, stack_table):
+    self.stack_table = stack_table
+    self.timestamps = array.array('d')
+    self.nodes = array.array('l')
+
+  def AddSample(self, timestamp, node):
+    self.timestamps.append(timestamp)
+    self.nodes.append(node)
+
+  def FinalizeImport(self):
+    timestamps = self.timestamps
+    if all(timestamps[i] <= timestamps[i + 1]
+           for i in xrange(len(timestamps) - 1)):
+      return
+    order = sorted(xrange(len(timestamps)), key=timestamps.__getitem__)
+    self.timestamps = array.array('d', (timestamps[i] for i in order))
+    self.nodes = array.array('l', (self.nodes[i] for i in order))
+
+  def ShiftTimestamps(self, shift_amount):
+    self.timestamps = array.array(
+        'd', (t - shift_amount for t in self.timestamps))
+
+  def AddToCallTree(self, call_tree, start=None, end=None):
+    """Adds the samples taken between start and end to call_tree.
+
+    Each sample accounts for the time until the next one, up to
+    MAX_SAMPLE_INTERVAL. The last sample accounts for as long as the one
+    before it.
+    """
+    timestamps = self.timestamps
+    nodes = self.nodes
+    lo = 0 if start == None else bisect.bisect_left(timestamps, start)
+    hi = len(timestamps) if end == None else bisect.bisect_right(
+        timestamps, end)
+    weights = call_tree.weights_by_node
+    last = len(timestamps) - 1
+    for i in xrange(lo, hi):
+      if i < last:
+        weight = min(timestamps[i + 1] - timestamps[i], MAX_SAMPLE_INTERVAL)
+      elif i > 0:
+        weight = min(timestamps[i] - timestamps[i - 1], MAX_SAMPLE_INTERVAL)
+      else:
+        weight = 0
+      node = nodes[i]
+      weights[node] = weights.get(node, 0) + weight
+
+
+class CallTree(object):
+  """The time spent in each stack node of a StackTable."""
+  def __init__(self, stack_table):
+    self.stack_table = stack_table
+    self.weights_by_node = {}
+
+  @property
+  def total_time(self):
+    return sum(self.weights_by_node.itervalues())
+
+  def GetTimes(self, key=None):
+    """Returns (self_times, total_times), two dicts of the time spent in and
+    under the functions of the tree, grouped by key(function).
+
+    key defaults to the ProfileFunction itself; key=lambda f: f.url groups by
+    script instead. Recursive calls (or several functions of a group on the
+    same stack) only count once towards the total time.
+    """
+    functions = self.stack_table.functions
+    node_parents = self.stack_table.node_parents
+    node_functions = self.stack_table.node_functions
+    keys_by_function = {}
+
+    def GetKey(function_id):
+      if function_id not in keys_by_function:
+        f = functions[function_id]
+        keys_by_function[function_id] = key(f) if key != None else f
+      return keys_by_function[function_id]
+
+    self_times = collections.defaultdict(float)
+    total_times = collections.defaultdict(float)
+    for node, weight in self.weights_by_node.iteritems():
+      self_times[GetKey(node_functions[node])] += weight
+      seen = set()
+      while node != NO_PARENT:
+        k = GetKey(node_functions[node])
+        if k not in seen:
+          seen.add(k)
+          total_times[k] += weight
+        node = node_parents[node]
+    return dict(self_times), dict(total_times)
+
+
+def GetCallTree(profiles, start=None, end=None):
+  """Returns the CallTree of the samples of profiles between start and end,
+  or None if there are no profiles.
+
+  All profiles must share the same StackTable.
+  """
+  call_tree = None
+  for profile in profiles:
+    if call_tree == None:
+      call_tree = CallTree(profile.stack_table)
+    assert profile.stack_table is call_tree.stack_table
+    profile.AddToCallTree(call_tree, start, end)
+  return call_tree
+
+
+class FrameInterner(object):
+  """Interns the frames of a trace's own stack tree into a StackTable.
+
+  Traces describe stacks as frames with an id, a parent frame id and a
+  function. get_parent(frame) returns the parent id (None for an outermost
+  frame) and get_function(frame) a (name, url) tuple.
+  """
+  def __init__(self, stack_table, get_parent, get_function):
+    self._stack_table = stack_table
+    self._get_parent = get_parent
+    self._get_function = get_function
+    self._frames = {}
+    self._nodes = {}
+
+  def AddFrame(self, frame_id, frame):
+    self._frames[frame_id] = frame
+
+  def GetNode(self, frame_id):
+    """Returns the node of the stack ending at frame_id, or NO_PARENT if the
+    frame is unknown."""
+    # Walk out to the first frame with a node, then intern back in.
+    pending = []
+    pending_ids = set()
+    while frame_id != None and frame_id not in self._nodes:
+      frame = self._frames.get(frame_id)
+      if frame == None or frame_id in pending_ids:
+        break
+      pending.append((frame_id, frame))
+      pending_ids.add(frame_id)
+      frame_id = self._get_parent(frame)
+    node = self._nodes.get(frame_id, NO_PARENT)
+    for frame_id, frame in reversed(pending):
+      name, url = self._get_function(frame)
+      node = self._stack_table.InternNode(
+          node, self._stack_table.InternFunction(name, url))
+      self._nodes[frame_id] = node
+    return node
@@ -0,0 +1,119 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.timeline import cpu_profile
+from telemetry.timeline import model as model_module
+from telemetry.timeline import trace_data as trace_data_module
+
+
+def _Sample(tid, ts, sf):
+  return {'name': 'sample', 'cat': 'cpu', 'pid': 1, 'tid': tid, 'ts': ts,
+          'ph': 'P', 'sf': sf}
+
+
+class CpuProfileTest(unittest.TestCase):
+
+  def testStackTableInterning(self):
+    table = cpu_profile.StackTable()
+    f = table.InternFunction('f', 'http://a.com/a.js')
+    self.assertEqual(f, table.InternFunction('f', 'http://a.com/a.js'))
+    root = table.InternNode(cpu_profile.NO_PARENT, f)
+    child = table.InternNode(root, f)
+    self.assertEqual(child, table.InternNode(root, f))
+    self.assertEqual(2, len(table.node_parents))
+    self.assertEqual(['f', 'f'], [fn.name for fn in table.GetStack(child)])
+
+  def testCallTreeTimes(self):
+    table = cpu_profile.StackTable()
+    a = table.InternFunction('a', 'http://a.com/a.js')
+    b = table.InternFunction('b', 'http://b.com/b.js')
+    node_a = table.InternNode(cpu_profile.NO_PARENT, a)
+    node_ab = table.InternNode(node_a, b)
+    node_aba = table.InternNode(node_ab, a)
+
+    profile = cpu_profile.ThreadProfile(table)
+    for ts, node in ((0, node_a), (1, node_ab), (3, node_aba), (4, node_a)):
+      profile.AddSample(ts, node)
+    profile.FinalizeImport()
+
+    call_tree = cpu_profile.GetCallTree([profile])
+    self.assertEqual(5, call_tree.total_time)
+    self_times, total_times = call_tree.GetTimes(key=lambda f: f.name)
+    self.assertEqual({'a': 3, 'b': 2}, self_times)
+    # The recursive call to a only counts once.
+    self.assertEqual({'a': 5, 'b': 3}, total_times)
+
+    self_times, _ = cpu_profile.GetCallTree([profile], 1, 3).GetTimes(
+        key=lambda f: f.url)
+    self.assertEqual({'http://a.com/a.js': 1, 'http://b.com/b.js': 2},
+                     self_times)
+
+  def testSampleIntervalIsCapped(self):
+    table = cpu_profile.StackTable()
+    node = table.InternNode(cpu_profile.NO_PARENT,
+                            table.InternFunction('a', ''))
+    profile = cpu_profile.ThreadProfile(table)
+    for ts in (0, 1, 100):
+      profile.AddSample(ts, node)
+    self.assertEqual(1 + cpu_profile.MAX_SAMPLE_INTERVAL * 2,
+                     cpu_profile.GetCallTree([profile]).total_time)
+
+  def testImportSampledStacks(self):
+    trace = {
+      'traceEvents': [
+        _Sample(1, 1000, 2),
+        _Sample(1, 2000, 3),
+        _Sample(1, 4000, 2),
+        _Sample(2, 1000, 1),
+      ],
+      'stackFrames': {
+        '1': {'name': 'main', 'category': 'chrome'},
+        '2': {'name': 'f', 'category': 'http://a.com/a.js', 'parent': 1},
+        '3': {'name': 'g', 'category': 'http://a.com/a.js', 'parent': '2'},
+      },
+    }
+    m = model_module.TimelineModel(trace_data_module.TraceData(trace),
+                                   shift_world_to_zero=False)
+    threads = m.GetAllProcesses()[0].threads
+    self.assertEqual([1, 2, 4], list(threads[1].cpu_profile.timestamps))
+    self.assertEqual(1, len(threads[2].cpu_profile.nodes))
+    self.assertEqual(['main', 'f', 'g'], [f.name for f in m.stack_table.GetStack(
+        threads[1].cpu_profile.nodes[1])])
+
+    self_times, total_times = cpu_profile.GetCallTree(
+        [threads[1].cpu_profile]).GetTimes(key=lambda f: f.name)
+    self.assertEqual({'f': 3, 'g': 2}, self_times)
+    self.assertEqual({'main': 5, 'f': 5, 'g': 2}, total_times)
+
+  def testImportV8ProfileChunks(self):
+    def Node(node_id, name, parent=None):
+      node = {'id': node_id,
+              'callFrame': {'functionName': name, 'url': 'http://a.com'}}
+      if parent != None:
+        node['parent'] = parent
+      return node
+
+    trace = [
+      {'name': 'ProfileChunk', 'cat': 'v8', 'pid': 1, 'tid': 9, 'ts': 2000,
+       'ph': 'P', 'id': '0x1', 'args': {'data': {
+           'cpuProfile': {'nodes': [Node(1, '(root)'), Node(2, 'f', 1)],
+                          'samples': [2, 2]},
+           'timeDeltas': [100, 1000]}}},
+      {'name': 'Profile', 'cat': 'v8', 'pid': 1, 'tid': 1, 'ts': 1000,
+       'ph': 'P', 'id': '0x1', 'args': {'data': {'startTime': 1000}}},
+      {'name': 'ProfileChunk', 'cat': 'v8', 'pid': 1, 'tid': 9, 'ts': 3000,
+       'ph': 'P', 'id': '0x1', 'args': {'data': {
+           'cpuProfile': {'nodes': [Node(3, '', 2)], 'samples': [3]},
+           'timeDeltas': [2000]}}},
+    ]
+    m = model_module.TimelineModel(trace_data_module.TraceData(trace),
+                                   shift_world_to_zero=False)
+    threads = m.GetAllProcesses()[0].threads
+    self.assertEqual(None, threads[9].cpu_profile)
+    profile = threads[1].cpu_profile
+    self.assertEqual([1.1, 2.1, 4.1], list(profile.timestamps))
+    self.assertEqual(['(root)', 'f', '(anonymous)'],
+                     [f.name for f in m.stack_table.GetStack(profile.nodes[2])])
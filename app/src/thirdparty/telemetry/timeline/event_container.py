@@ -3,6 +3,7 @@
 # found in the LICENSE file.
 
 from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import event_query as event_query_module
 from telemetry.timeline import flow_event as flow_event_module
 from telemetry.timeline import slice as slice_module
 
@@ -48,6 +49,34 @@ class TimelineEventContainer(object):
     return
     yield # pylint: disable=W0101
 
+  def IterAsyncSlicesInThisContainer(self, name_predicate):
+    """Iterates the async slices in this container with a name matching
+    name_predicate.
+
+    Containers that build their async slices lazily should override this so
+    that only the slices matching name_predicate get built.
+    """
+    return self.IterEventsInThisContainer(
+        self.IsAsyncSlice, lambda e: name_predicate(e.name))
+
+  def IterEventsMatchingQueryInThisContainer(self, query):
+    """Iterates the events in this container matching an EventQuery.
+
+    Containers that can answer a query faster than by testing every event,
+    e.g. from sorted or name-indexed storage, should override this.
+    """
+    # Only threads hold events that belong to a thread.
+    if query.threads != None:
+      return iter(())
+    return self.IterEventsInThisContainer(query.MatchesKind, query.Matches)
+
+  def _IterContainers(self, recursive):
+    yield self
+    if not recursive:
+      return
+    for child in self.IterChildContainers():
+      for container in child._IterContainers(recursive):
+        yield container
 
   def IterAllEvents(self,
                     recursive=True,
@@ -64,29 +93,27 @@ class TimelineEventContainer(object):
     event_predicate is given actual events:
         event_predicate(thread.slices[7])
     """
-    if not recursive:
-      for e in self.IterEventsInThisContainer(
-          event_type_predicate, event_predicate):
-        yield e
-      return
-
-    # TODO(nduca): Write this as a proper iterator instead of one that creates a
-    # list and then iterates it.
-    containers = []
-    def GetContainersRecursive(container):
-      containers.append(container)
-      for container in container.IterChildContainers():
-        GetContainersRecursive(container)
-    GetContainersRecursive(self)
-
-    # Actually create the iterator.
-    for c in containers:
+    for c in self._IterContainers(recursive):
       for e in c.IterEventsInThisContainer(event_type_predicate,
                                            event_predicate):
         yield e
 
+  def IterEventsMatchingQuery(self, query, recursive=True):
+    """Iterates all events in this container matching an EventQuery."""
+    for c in self._IterContainers(recursive):
+      for e in c.IterEventsMatchingQueryInThisContainer(query):
+        yield e
+
+  def GetEventColumnsMatchingQuery(self, query, columns, recursive=True):
+    """Returns numeric attributes of the events matching an EventQuery as
+    a dict of column name to array('d'), see event_query.GetColumns.
+    """
+    return event_query_module.GetColumns(
+        self.IterEventsMatchingQuery(query, recursive), columns)
+
   # Helper functions for finding common kinds of events. Must always take an
-  # optinal recurisve parameter and be implemented in terms fo IterAllEvents.
+  # optinal recurisve parameter and be implemented in terms fo IterAllEvents,
+  # IterEventsMatchingQuery, or _IterAllAsyncSlicesWithName for async slices.
   def IterAllEventsOfName(self, name, recursive=True):
     return self.IterAllEvents(
       recursive=recursive,
@@ -99,34 +126,37 @@ class TimelineEventContainer(object):
       event_type_predicate=lambda t: t == slice_module.Slice)
 
   def IterAllSlicesInRange(self, start, end, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda s: s.start >= start and s.end <= end)
+    return self.IterEventsMatchingQuery(
+      event_query_module.EventQuery(
+        kinds=(slice_module.Slice,), start=start, end=end),
+      recursive=recursive)
 
   def IterAllSlicesOfName(self, name, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda e: e.name == name)
+    return self.IterEventsMatchingQuery(
+      event_query_module.EventQuery(
+        kinds=(slice_module.Slice,), names=(name,)),
+      recursive=recursive)
 
   def IterAllToplevelSlicesOfName(self, name, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda e: e.name == name and e.parent_slice == None)
+    return self.IterEventsMatchingQuery(
+      event_query_module.EventQuery(
+        kinds=(slice_module.Slice,), names=(name,), toplevel_only=True),
+      recursive=recursive)
 
   def IterAllAsyncSlicesOfName(self, name, recursive=True):
-    return self.IterAllEvents(
+    return self._IterAllAsyncSlicesWithName(
       recursive=recursive,
-      event_type_predicate=self.IsAsyncSlice,
-      event_predicate=lambda e: e.name == name)
+      name_predicate=lambda n: n == name)
 
   def IterAllAsyncSlicesStartsWithName(self, name, recursive=True):
-    return self.IterAllEvents(
+    return self._IterAllAsyncSlicesWithName(
       recursive=recursive,
-      event_type_predicate=self.IsAsyncSlice,
-      event_predicate=lambda e: e.name.startswith(name))
+      name_predicate=lambda n: n.startswith(name))
+
+  def _IterAllAsyncSlicesWithName(self, recursive, name_predicate):
+    for c in self._IterContainers(recursive):
+      for e in c.IterAsyncSlicesInThisContainer(name_predicate):
+        yield e
 
   def IterAllFlowEvents(self, recursive=True):
     return self.IterAllEvents(
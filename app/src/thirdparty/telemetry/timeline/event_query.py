@@ -0,0 +1,102 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""A declarative description of the events to find in a timeline.
+
+Unlike the predicates given to IterAllEvents, an EventQuery can be inspected
+by the containers it runs against, so that they can answer it from their own
+indexes (sorted slices, name-filtered async slices, ...) instead of testing
+every event.
+"""
+
+import array
+
+
+class EventQuery(object):
+  def __init__(self, kinds=None, names=None, name_prefix=None,
+               categories=None, start=None, end=None, contained=True,
+               toplevel_only=False, threads=None):
+    """Creates a query. Every criteria left to None matches everything.
+
+    Args:
+        kinds: Event classes to look for, e.g. (slice_module.Slice,).
+        names: Event names to look for.
+        name_prefix: Only events whose name starts with this.
+        categories: Event categories to look for.
+        start, end: The time window to look in, in milliseconds.
+        contained: If True, events must lie entirely within the window.
+            Otherwise they only need to start within it.
+        toplevel_only: Only events without a parent slice.
+        threads: Only events on these threads.
+    """
+    self.kinds = tuple(kinds) if kinds != None else None
+    self.names = frozenset(names) if names != None else None
+    self.name_prefix = name_prefix
+    self.categories = frozenset(categories) if categories != None else None
+    self.start = start
+    self.end = end
+    self.contained = contained
+    self.toplevel_only = toplevel_only
+    self.threads = frozenset(threads) if threads != None else None
+
+  @property
+  def has_name_filter(self):
+    return self.names != None or self.name_prefix != None
+
+  @property
+  def has_time_window(self):
+    return self.start != None or self.end != None
+
+  def MatchesKind(self, event_type):
+    return self.kinds == None or event_type in self.kinds
+
+  def MatchesName(self, name):
+    if self.names != None and name not in self.names:
+      return False
+    if self.name_prefix != None and not name.startswith(self.name_prefix):
+      return False
+    return True
+
+  def MatchesTime(self, event):
+    if self.start != None and event.start < self.start:
+      return False
+    if self.end != None:
+      if self.contained:
+        if event.end > self.end:
+          return False
+      elif event.start > self.end:
+        return False
+    return True
+
+  def Matches(self, event):
+    """Tests the non-kind criteria against an event.
+
+    The thread criteria is left to the containers, since only they know
+    which thread an event belongs to.
+    """
+    if self.has_name_filter and not self.MatchesName(event.name):
+      return False
+    if self.categories != None and event.category not in self.categories:
+      return False
+    if self.has_time_window and not self.MatchesTime(event):
+      return False
+    if (self.toplevel_only and
+        getattr(event, 'parent_slice', None) != None):
+      return False
+    return True
+
+
+def GetColumns(events, columns):
+  """Returns the given numeric attributes of events as columns.
+
+  Returns a dict mapping each name in columns to an array('d') of that
+  attribute for every event, in order. Missing values (None) are NaN.
+  """
+  nan = float('nan')
+  result = dict((column, array.array('d')) for column in columns)
+  appenders = [(column, result[column].append) for column in columns]
+  for event in events:
+    for column, append in appenders:
+      value = getattr(event, column)
+      append(nan if value == None else value)
+  return result
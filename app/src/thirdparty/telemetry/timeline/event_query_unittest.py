@@ -0,0 +1,72 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import math
+import unittest
+
+from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import event_query
+from telemetry.timeline import model as model_module
+from telemetry.timeline import slice as slice_module
+from telemetry.timeline import trace_data as trace_data_module
+
+
+class EventQueryTest(unittest.TestCase):
+
+  def setUp(self):
+    events = [
+      {'name': 'a', 'cat': 'foo', 'pid': 1, 'tid': 1, 'ts': 0, 'dur': 100,
+       'tts': 0, 'tdur': 50, 'ph': 'X', 'args': {}},
+      {'name': 'b', 'cat': 'bar', 'pid': 1, 'tid': 1, 'ts': 10, 'dur': 20,
+       'ph': 'X', 'args': {}},
+      {'name': 'bb', 'cat': 'bar', 'pid': 1, 'tid': 1, 'ts': 50, 'dur': 60,
+       'ph': 'X', 'args': {}},
+      {'name': 'b', 'cat': 'foo', 'pid': 1, 'tid': 2, 'ts': 40, 'dur': 10,
+       'ph': 'X', 'args': {}},
+      {'name': 'r', 'cat': 'blink.console', 'pid': 1, 'tid': 2, 'ts': 5,
+       'ph': 'S', 'id': 1, 'args': {}},
+      {'name': 'r', 'cat': 'blink.console', 'pid': 1, 'tid': 2, 'ts': 45,
+       'ph': 'F', 'id': 1, 'args': {}},
+    ]
+    self.model = model_module.TimelineModel(
+        trace_data_module.TraceData(events), shift_world_to_zero=False)
+    self.threads = self.model.GetAllProcesses()[0].threads
+
+  def _Names(self, query):
+    return sorted(e.name for e in self.model.IterEventsMatchingQuery(query))
+
+  def testNames(self):
+    self.assertEqual(['b', 'b'], self._Names(event_query.EventQuery(
+        kinds=(slice_module.Slice,), names=('b',))))
+    self.assertEqual(['b', 'b', 'bb'], self._Names(event_query.EventQuery(
+        kinds=(slice_module.Slice,), name_prefix='b')))
+
+  def testCategories(self):
+    self.assertEqual(['r', 'r'], self._Names(event_query.EventQuery(
+        categories=('blink.console',))))
+    self.assertEqual(['r'], self._Names(event_query.EventQuery(
+        kinds=(async_slice_module.AsyncSlice,), toplevel_only=True)))
+
+  def testTimeWindow(self):
+    self.assertEqual(['b', 'b'], self._Names(event_query.EventQuery(
+        kinds=(slice_module.Slice,), start=0.005, end=0.06)))
+    self.assertEqual(['b', 'b', 'bb'], self._Names(event_query.EventQuery(
+        kinds=(slice_module.Slice,), start=0.005, end=0.06, contained=False)))
+
+  def testToplevelOnly(self):
+    # 'bb' outlasts 'a', so it isn't nested in it.
+    self.assertEqual(['a', 'b', 'bb'], self._Names(event_query.EventQuery(
+        kinds=(slice_module.Slice,), toplevel_only=True)))
+
+  def testThreads(self):
+    self.assertEqual(['b', 'r', 'r'], self._Names(event_query.EventQuery(
+        threads=(self.threads[2],))))
+
+  def testColumns(self):
+    columns = self.threads[1].GetEventColumnsMatchingQuery(
+        event_query.EventQuery(kinds=(slice_module.Slice,), names=('a', 'b')),
+        ('start', 'thread_duration'))
+    self.assertEqual([0, 0.01], list(columns['start']))
+    self.assertEqual(0.05, columns['thread_duration'][0])
+    self.assertTrue(math.isnan(columns['thread_duration'][1]))
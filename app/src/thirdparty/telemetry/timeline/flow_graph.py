@@ -0,0 +1,136 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""Links flow events to the slices they connect, so that causality can be
+followed across threads without searching every slice.
+"""
+
+import collections
+
+
+def GetToplevelSlice(s):
+  while s.parent_slice != None:
+    s = s.parent_slice
+  return s
+
+
+class FlowGraph(object):
+  """A FlowGraph holds every flow of a model as the ordered list of its steps.
+
+  Each step is bound to the slice enclosing it on its thread (or, for a
+  finish step that doesn't bind to its enclosing slice, to the next slice
+  on the thread), turning a flow into a chain of edges from one slice to the
+  next. The binding happens on first query, once the model is finalized.
+  """
+  def __init__(self):
+    self._flows = []
+    self._flows_by_id = collections.defaultdict(list)
+
+    # Built on first query.
+    self._slice_by_step = None
+    self._incoming_edges_by_toplevel_slice = None
+
+  @property
+  def flows(self):
+    return self._flows
+
+  def AddFlow(self, event_id, steps):
+    """Adds a flow, given its steps in time order.
+
+    * event_id: The id shared by the flow events.
+    * steps: List of (flow_event, thread, bind_to_next_slice) tuples.
+    """
+    assert self._slice_by_step == None
+    flow = [flow_event for flow_event, _, _ in steps]
+    self._flows.append((event_id, steps))
+    self._flows_by_id[event_id].append(flow)
+
+  def GetFlowsById(self, event_id):
+    """Returns the flows using event_id, each as a list of FlowEvents."""
+    return self._flows_by_id.get(event_id, [])
+
+  def GetSliceForStep(self, flow_event):
+    """Returns the slice flow_event is bound to, or None."""
+    self._BuildIndex()
+    return self._slice_by_step.get(flow_event)
+
+  def GetIncomingEdges(self, s):
+    """Returns the (source slice, destination slice) edges of the flows
+    arriving in the toplevel slice enclosing s.
+    """
+    self._BuildIndex()
+    return self._incoming_edges_by_toplevel_slice.get(GetToplevelSlice(s), [])
+
+  def GetCriticalPathToEvent(self, event):
+    """Returns the critical path leading to the end of event.
+
+    Slices are looked up on the thread the event ended on, so this works for
+    slices as well as async slices such as blink.console ranges.
+    """
+    thread = getattr(event, 'end_thread', None)
+    if thread == None:
+      thread = getattr(event, 'parent_thread', None)
+    if thread == None:
+      return []
+    return self.GetCriticalPath(thread, event.end)
+
+  def GetCriticalPath(self, thread, timestamp):
+    """Returns the critical path of toplevel slices leading to timestamp on
+    thread, earliest first.
+
+    The path starts with the toplevel slice enclosing timestamp and walks
+    back along incoming flows. Of the flows arriving before the point reached
+    so far, the one whose source slice finished last is the one that was
+    waited on, and the walk continues from its toplevel slice.
+    """
+    self._BuildIndex()
+    s = thread.FindEnclosingSlice(timestamp)
+    if s == None:
+      return []
+
+    path = []
+    seen = set()
+    current = GetToplevelSlice(s)
+    limit = timestamp
+    while current != None and current not in seen:
+      seen.add(current)
+      path.append(current)
+
+      blocking = None
+      for source, destination in self._incoming_edges_by_toplevel_slice.get(
+          current, []):
+        if destination.start > limit:
+          continue
+        if blocking == None or source.end > blocking.end:
+          blocking = source
+      if blocking == None:
+        break
+      limit = blocking.end
+      current = GetToplevelSlice(blocking)
+
+    path.reverse()
+    return path
+
+  def _BuildIndex(self):
+    if self._slice_by_step != None:
+      return
+
+    self._slice_by_step = {}
+    self._incoming_edges_by_toplevel_slice = collections.defaultdict(list)
+    for _, steps in self._flows:
+      previous = None
+      for flow_event, thread, bind_to_next_slice in steps:
+        if bind_to_next_slice:
+          s = thread.FindNextSlice(flow_event.start)
+        else:
+          s = thread.FindEnclosingSlice(flow_event.start)
+        if s == None:
+          continue
+        self._slice_by_step[flow_event] = s
+
+        if previous != None:
+          toplevel = GetToplevelSlice(s)
+          if GetToplevelSlice(previous) != toplevel:
+            self._incoming_edges_by_toplevel_slice[toplevel].append(
+                (previous, s))
+        previous = s
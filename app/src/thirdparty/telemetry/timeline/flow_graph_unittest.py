@@ -0,0 +1,71 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+import telemetry.timeline.model as timeline_model
+from telemetry.timeline import trace_data as trace_data_module
+
+
+def _Slice(name, tid, ts, dur):
+  return {'name': name, 'cat': 'foo', 'pid': 1, 'tid': tid, 'ts': ts,
+          'dur': dur, 'ph': 'X', 'args': {}}
+
+
+def _Flow(phase, flow_id, tid, ts, bp=None):
+  event = {'name': 'flow', 'cat': 'foo', 'id': flow_id, 'pid': 1,
+           'tid': tid, 'ts': ts, 'ph': phase, 'args': {}}
+  if bp:
+    event['bp'] = bp
+  return event
+
+
+class FlowGraphTest(unittest.TestCase):
+
+  def _CreateModel(self):
+    # Input on thread 1 posts to thread 2, which posts to thread 3 where the
+    # frame is drawn. An unrelated flow from thread 1 also reaches thread 3,
+    # but finishes earlier.
+    events = [
+      _Slice('Input', 1, 0, 100),
+      _Slice('Handler', 1, 10, 50),
+      _Flow('s', 7, 1, 20),
+      _Flow('s', 8, 1, 30),
+      _Slice('Commit', 2, 200, 100),
+      _Flow('f', 7, 2, 200),
+      _Flow('s', 9, 2, 250),
+      _Slice('Other', 3, 110, 20),
+      _Flow('f', 8, 3, 110),
+      _Slice('DrawFrame', 3, 400, 50),
+      _Flow('t', 8, 3, 120),
+      _Flow('f', 8, 3, 410, bp='e'),
+      _Flow('f', 9, 3, 420, bp='e'),
+    ]
+    trace_data = trace_data_module.TraceData(events)
+    return timeline_model.TimelineModel(trace_data, shift_world_to_zero=False)
+
+  def testStepsAreBoundToSlices(self):
+    m = self._CreateModel()
+    flows = m.flow_graph.GetFlowsById(7)
+    self.assertEqual(1, len(flows))
+    self.assertEqual(2, len(flows[0]))
+    self.assertEqual('Handler', m.flow_graph.GetSliceForStep(flows[0][0]).name)
+    self.assertEqual('Commit', m.flow_graph.GetSliceForStep(flows[0][1]).name)
+
+  def testCriticalPathAcrossThreads(self):
+    m = self._CreateModel()
+    thread = m.GetAllProcesses()[0].threads[3]
+    path = m.flow_graph.GetCriticalPath(thread, 0.45)
+    self.assertEqual(['Input', 'Commit', 'DrawFrame'], [s.name for s in path])
+
+  def testCriticalPathToEvent(self):
+    m = self._CreateModel()
+    draw_frame = m.GetAllEventsOfName('DrawFrame')[0]
+    path = m.flow_graph.GetCriticalPathToEvent(draw_frame)
+    self.assertEqual(['Input', 'Commit', 'DrawFrame'], [s.name for s in path])
+
+  def testCriticalPathOutsideOfSlices(self):
+    m = self._CreateModel()
+    thread = m.GetAllProcesses()[0].threads[3]
+    self.assertEqual([], m.flow_graph.GetCriticalPath(thread, 0.3))
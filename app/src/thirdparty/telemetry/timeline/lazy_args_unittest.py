@@ -0,0 +1,83 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import copy
+import json
+import StringIO
+import unittest
+
+from telemetry.timeline import lazy_args
+from telemetry.timeline import model as model_module
+from telemetry.timeline import trace_data as trace_data_module
+
+
+_EVENTS = [
+  {'name': 'FunctionCall', 'cat': 'devtools.timeline', 'pid': 1, 'tid': 1,
+   'ts': 0, 'dur': 10, 'ph': 'X',
+   'args': {'data': {'scriptName': 'http://a.com/a.js',
+                     'stackTrace': [{'url': 'http://a.com'}] * 10}}},
+  {'name': 'Layout', 'cat': 'devtools.timeline', 'pid': 1, 'tid': 1,
+   'ts': 20, 'ph': 'B', 'args': {'beginData': {'dirtyObjects': 3}}},
+  {'name': 'Layout', 'cat': 'devtools.timeline', 'pid': 1, 'tid': 1,
+   'ts': 30, 'ph': 'E', 'args': {'endData': {'root': [1, 2, 3]}}},
+  {'name': 'thread_name', 'pid': 1, 'tid': 1, 'ph': 'M',
+   'args': {'name': 'CrRendererMain'}},
+  {'name': 'Empty', 'cat': 'foo', 'pid': 1, 'tid': 1, 'ts': 40, 'dur': 1,
+   'ph': 'X', 'args': {}},
+]
+
+
+class LazyArgsTest(unittest.TestCase):
+
+  def testLoadTraceJsonMatchesJsonLoads(self):
+    for raw in (_EVENTS, {'traceEvents': _EVENTS, 'metadata': {'a': [1]}}):
+      s = json.dumps(raw, indent=1)
+      self.assertEqual(json.loads(s), lazy_args.LoadTraceJson(s))
+
+  def testArgsAreKeptUndecoded(self):
+    events = lazy_args.LoadTraceJson(json.dumps(_EVENTS))
+    args = events[0]['args']
+    self.assertTrue(isinstance(args, lazy_args.LazyArgs))
+    self.assertFalse(args.is_decoded)
+    self.assertEqual('http://a.com/a.js', args['data']['scriptName'])
+    self.assertFalse(args.is_decoded)
+    self.assertEqual({}, events[4]['args'])
+
+  def testWritesPinTheDecodedArgs(self):
+    args = lazy_args.LoadTraceJson(json.dumps(_EVENTS))[1]['args']
+    copied = copy.deepcopy(args)
+    args['endData'] = 1
+    self.assertTrue(args.is_decoded)
+    args.cache.Clear()
+    self.assertEqual(1, args['endData'])
+    self.assertFalse('endData' in copied)
+
+  def testEachTraceHasItsOwnCache(self):
+    s = json.dumps(_EVENTS)
+    first = lazy_args.LoadTraceJson(s)[0]['args']
+    second = lazy_args.LoadTraceJson(s)[0]['args']
+    self.assertTrue(first.cache is not second.cache)
+    self.assertEqual(first, second)
+    first.cache.Clear()
+    self.assertEqual('http://a.com/a.js', second['data']['scriptName'])
+
+  def testMalformedInput(self):
+    for s in ('[{"args": {}', '[{"args" {}}]', '[1 2]', '{"a": 1} x'):
+      self.assertRaises(ValueError, lazy_args.LoadTraceJson, s)
+
+  def testModelWithLazyArgs(self):
+    data = trace_data_module.TraceData(json.dumps(_EVENTS), lazy_args=True)
+    m = model_module.TimelineModel(data)
+    thread = m.GetAllProcesses()[0].threads[1]
+    self.assertEqual('CrRendererMain', thread.name)
+    function_call, layout, _ = thread.all_slices
+    self.assertEqual('http://a.com/a.js',
+                     function_call.args['data']['scriptName'])
+    self.assertEqual({'beginData': {'dirtyObjects': 3},
+                      'endData': {'root': [1, 2, 3]}}, layout.args)
+
+    f = StringIO.StringIO()
+    data.Serialize(f)
+    self.assertEqual(json.loads(json.dumps(_EVENTS[0])),
+                     json.loads(f.getvalue())['traceEvents'][0])
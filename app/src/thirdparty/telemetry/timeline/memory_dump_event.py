@@ -91,6 +91,34 @@ ROOT_CATEGORY = MmapCategory('/', None, [
 ])
 
 
+class MappedFileClassifier(object):
+  """Classifies mapped files into MmapCategory paths, memoizing the result.
+
+  The same mapped files recur in every memory dump of a trace, so the
+  importer shares a single classifier between all the dumps of a model.
+  """
+  def __init__(self, root_category=ROOT_CATEGORY):
+    self._root_category = root_category
+    self._paths_by_mapped_file = {}
+
+  def GetCategoryPaths(self, mapped_file):
+    """Return the paths of all categories matching a mapped file, from the
+    root down, e.g. ('/', '/Android', '/Android/Ashmem').
+    """
+    paths = self._paths_by_mapped_file.get(mapped_file)
+    if paths is None:
+      paths = []
+      path = ''
+      category = self._root_category
+      while category:
+        path = posixpath.join(path, category.name)
+        paths.append(path)
+        category = category.GetMatchingChild(mapped_file)
+      paths = tuple(paths)
+      self._paths_by_mapped_file[mapped_file] = paths
+    return paths
+
+
 # Map long descriptive attribute names, as understood by MemoryBucket.GetValue,
 # to the short keys used by events in raw json traces.
 BUCKET_ATTRS = {
@@ -114,6 +142,12 @@ MMAPS_METRICS = {
   'mmaps_native_heap': ('/Native heap.proportional_resident', True)}
 
 
+def ParseRegionByteStats(byte_stats):
+  """Decode the hex byte stats of a vm_region, keyed by long names."""
+  return {dst_key: int(byte_stats.get(src_key, '0'), 16)
+          for dst_key, src_key in BUCKET_ATTRS.iteritems()}
+
+
 class MemoryBucket(object):
   """Simple object to hold and aggregate memory values."""
   def __init__(self):
@@ -126,8 +160,11 @@ class MemoryBucket(object):
     return '%s[%s]' % (type(self).__name__, values)
 
   def AddRegion(self, byte_stats):
-    for dst_key, src_key in BUCKET_ATTRS.iteritems():
-      self._bucket[dst_key] += int(byte_stats.get(src_key, '0'), 16)
+    self.AddValues(ParseRegionByteStats(byte_stats))
+
+  def AddValues(self, values):
+    for key, value in values.iteritems():
+      self._bucket[key] += value
 
   def GetValue(self, name):
     return self._bucket[name]
@@ -146,7 +183,7 @@ class ProcessMemoryDumpEvent(timeline_event.TimelineEvent):
     has_mmaps: True if the memory dump has mmaps information. If False then
         GetStatsSummary will report all zeros.
   """
-  def __init__(self, process, event):
+  def __init__(self, process, event, mapped_file_classifier=None):
     assert event['ph'] == 'v' and process.pid == event['pid']
 
     super(ProcessMemoryDumpEvent, self).__init__(
@@ -155,13 +192,49 @@ class ProcessMemoryDumpEvent(timeline_event.TimelineEvent):
     self.process = process
     self.dump_id = event['id']
 
+    # Decoding the allocators and classifying the vm_regions is expensive,
+    # and most dumps are never looked at, so both are deferred until the
+    # first query.
+    try:
+      dumps = event['args']['dumps']
+    except KeyError:
+      dumps = {}
+    self._allocators_dict = dumps.get('allocators', {})
     try:
-      allocators_dict = event['args']['dumps']['allocators']
+      self._vm_regions = dumps['process_mmaps']['vm_regions']
     except KeyError:
-      allocators_dict = {}
+      self._vm_regions = []
+    self.has_mmaps = bool(self._vm_regions)
+    if mapped_file_classifier is None:
+      mapped_file_classifier = MappedFileClassifier()
+    self._mapped_file_classifier = mapped_file_classifier
+    self._decoded_allocators = None
+    self._decoded_buckets = None
+
+  @property
+  def process_name(self):
+    return self.process.name
+
+  @property
+  def _allocators(self):
+    if self._decoded_allocators is None:
+      self._decoded_allocators = self._DecodeAllocators()
+      self._allocators_dict = None
+    return self._decoded_allocators
+
+  @property
+  def _buckets(self):
+    if self._decoded_buckets is None:
+      self._decoded_buckets = {}
+      for vm_region in self._vm_regions:
+        self._AddRegion(vm_region)
+      self._vm_regions = None
+    return self._decoded_buckets
+
+  def _DecodeAllocators(self):
     # populate keys that should always be present
-    self._allocators = {}
-    for allocator_name, size_values in allocators_dict.iteritems():
+    allocators = {}
+    for allocator_name, size_values in self._allocators_dict.iteritems():
       name_parts = allocator_name.split('/')
       # we want to skip allocated_objects, since they are already counted by
       # outer allocator names; but malloc is special, because the size of outer
@@ -169,37 +242,22 @@ class ProcessMemoryDumpEvent(timeline_event.TimelineEvent):
       if name_parts[-1] == 'allocated_objects' and name_parts[0] != 'malloc':
         continue
       allocator_name = name_parts[0]
-      allocator = self._allocators.setdefault(allocator_name, {})
+      allocator = allocators.setdefault(allocator_name, {})
       for size_key, size_value in size_values['attrs'].iteritems():
         allocator[size_key] = (allocator.get(size_key, 0)
                                + int(size_value['value'], 16))
     # we need to discount tracing from malloc size.
     try:
-      self._allocators['malloc']['size'] -= self._allocators['tracing']['size']
+      allocators['malloc']['size'] -= allocators['tracing']['size']
     except KeyError:
       pass # it's ok if any of those keys are not present
-
-    self._buckets = {}
-    try:
-      vm_regions = event['args']['dumps']['process_mmaps']['vm_regions']
-    except KeyError:
-      vm_regions = []
-    self.has_mmaps = bool(vm_regions)
-    for vm_region in vm_regions:
-      self._AddRegion(vm_region)
-
-  @property
-  def process_name(self):
-    return self.process.name
+    return allocators
 
   def _AddRegion(self, vm_region):
-    path = ''
-    category = ROOT_CATEGORY
-    while category:
-      path = posixpath.join(path, category.name)
-      self.GetMemoryBucket(path).AddRegion(vm_region['bs'])
-      mapped_file = vm_region['mf']
-      category = category.GetMatchingChild(mapped_file)
+    values = ParseRegionByteStats(vm_region['bs'])
+    for path in self._mapped_file_classifier.GetCategoryPaths(
+        vm_region['mf']):
+      self.GetMemoryBucket(path).AddValues(values)
 
   def __repr__(self):
     values = ['pid=%d' % self.pid]
@@ -236,10 +294,18 @@ class ProcessMemoryDumpEvent(timeline_event.TimelineEvent):
       value -= self._allocators['tracing'].get('resident_size', 0)
     return value
 
+  def GetAllocatorSizes(self):
+    """Get a dictionary with the size of each allocator of this process.
+
+    Unlike GetMemoryUsage, this doesn't need the memory maps to be classified.
+    """
+    return {name: allocator.get('size', 0)
+            for name, allocator in self._allocators.iteritems()}
+
   def GetMemoryUsage(self):
     """Get a dictionary with the memory usage of this process."""
-    usage = {'allocator_%s' % name: allocator.get('size', 0)
-             for name, allocator in self._allocators.iteritems()}
+    usage = {'allocator_%s' % name: size
+             for name, size in self.GetAllocatorSizes().iteritems()}
     if self.has_mmaps:
       usage.update((key, self.GetMemoryValue(*value))
                    for key, value in MMAPS_METRICS.iteritems())
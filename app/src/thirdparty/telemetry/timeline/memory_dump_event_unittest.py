@@ -70,6 +70,29 @@ class ProcessMemoryDumpEventUnitTest(unittest.TestCase):
                         memory_dump.GetMemoryBucket(path).GetValue(
                             'proportional_resident'))
 
+  def testProcessMemoryDump_decodesLazily(self):
+    memory_dump = TestProcessDumpEvent(
+        mmaps={'[heap] bar': {'pss': 4}},
+        allocators={'malloc': {'size': 8}})
+
+    self.assertTrue(memory_dump.has_mmaps)
+    self.assertIsNone(memory_dump._decoded_allocators) # pylint: disable=W0212
+    self.assertIsNone(memory_dump._decoded_buckets) # pylint: disable=W0212
+    self.assertEquals(4, memory_dump.GetMemoryValue(
+        '/Native heap.proportional_resident'))
+    self.assertEquals(8, memory_dump.GetMemoryUsage()['allocator_malloc'])
+
+
+class MappedFileClassifierUnitTest(unittest.TestCase):
+  def testGetCategoryPaths(self):
+    classifier = memory_dump_event.MappedFileClassifier()
+    paths = classifier.GetCategoryPaths('/dev/ashmem/dalvik-jit-code-cache')
+    self.assertEquals(('/', '/Android', '/Android/Java runtime',
+                       '/Android/Java runtime/Cache'), paths)
+    self.assertIs(paths, classifier.GetCategoryPaths(
+        '/dev/ashmem/dalvik-jit-code-cache'))
+    self.assertEquals(('/', '/Others'), classifier.GetCategoryPaths('foo'))
+
 
 class MemoryDumpEventUnitTest(unittest.TestCase):
   def testDumpEventsTiming(self):
@@ -7,11 +7,16 @@ trace_viewer project:
 https://code.google.com/p/trace-viewer/
 """
 
+import bisect
+import itertools
 from operator import attrgetter
 
 from telemetry.timeline import async_slice as async_slice_module
 from telemetry.timeline import bounds
+from telemetry.timeline import counter as counter_module
+from telemetry.timeline import cpu_profile as cpu_profile_module
 from telemetry.timeline import event_container
+from telemetry.timeline import flow_graph as flow_graph_module
 from telemetry.timeline import inspector_importer
 from telemetry.timeline import process as process_module
 from telemetry.timeline import slice as slice_module
@@ -48,6 +53,17 @@ def IsSliceOrAsyncSlice(t):
   return t == slice_module.Slice
 
 
+def IsBoundedByContainer(t):
+  """Async slices and counter samples are bounded and shifted in bulk by
+  the threads and counters holding them, rather than one event at a time.
+  """
+  return t == async_slice_module.AsyncSlice or t == counter_module.CounterSample
+
+
+def IsNotBoundedByContainer(t):
+  return not IsBoundedByContainer(t)
+
+
 class TimelineModel(event_container.TimelineEventContainer):
   def __init__(self, trace_data=None, shift_world_to_zero=True):
     """ Initializes a TimelineModel.
@@ -69,7 +85,10 @@ class TimelineModel(event_container.TimelineEventContainer):
     self.import_errors = []
     self.metadata = []
     self.flow_events = []
+    self.flow_graph = flow_graph_module.FlowGraph()
+    self.stack_table = cpu_profile_module.StackTable()
     self._global_memory_dumps = None
+    self._global_memory_dump_starts = None
     if trace_data is not None:
       self.ImportTraces(trace_data, shift_world_to_zero=shift_world_to_zero)
 
@@ -84,6 +103,21 @@ class TimelineModel(event_container.TimelineEventContainer):
     """Iterate over the memory dump events of this model."""
     return iter(self._global_memory_dumps or [])
 
+  def GetGlobalMemoryDumpsInRange(self, start, end):
+    """Returns the global memory dumps lying within start and end, in
+    chronological order."""
+    if not self._global_memory_dumps:
+      return []
+    # The starts are only looked up once the model is complete, so that they
+    # include the shift of the world to zero.
+    if self._global_memory_dump_starts is None:
+      self._global_memory_dump_starts = [
+          dump.start for dump in self._global_memory_dumps]
+    dumps = self._global_memory_dumps[
+        bisect.bisect_left(self._global_memory_dump_starts, start):
+        bisect.bisect_right(self._global_memory_dump_starts, end)]
+    return [dump for dump in dumps if dump.end <= end]
+
   def IterChildContainers(self):
     for process in self._processes.itervalues():
       yield process
@@ -190,25 +224,45 @@ class TimelineModel(event_container.TimelineEventContainer):
     if self._bounds.is_empty:
       return
     shift_amount = self._bounds.min
-    for event in self.IterAllEvents():
+    # Async slices are shifted by their threads, so that the ones which have
+    # not been built yet stay that way, and counters shift all their samples
+    # at once.
+    for event in self.IterAllEvents(
+        event_type_predicate=IsNotBoundedByContainer):
       event.start -= shift_amount
+    for thread in self.GetAllThreads():
+      thread.ShiftAsyncSlices(shift_amount)
+      if thread.cpu_profile != None:
+        thread.cpu_profile.ShiftTimestamps(shift_amount)
+    for counter in self._IterAllCounters():
+      counter.ShiftTimestamps(shift_amount)
 
   def UpdateBounds(self):
     self._bounds.Reset()
-    for event in self.IterAllEvents():
+    for event in self.IterAllEvents(
+        event_type_predicate=IsNotBoundedByContainer):
       self._bounds.AddValue(event.start)
       self._bounds.AddValue(event.end)
+    for counter in self._IterAllCounters():
+      counter.AddBounds(self._bounds)
 
     self._thread_time_bounds = {}
     for thread in self.GetAllThreads():
       self._thread_time_bounds[thread] = bounds.Bounds()
       for event in thread.IterEventsInThisContainer(
-          event_type_predicate=lambda t: True,
+          event_type_predicate=IsNotBoundedByContainer,
           event_predicate=lambda e: True):
         if event.thread_start != None:
           self._thread_time_bounds[thread].AddValue(event.thread_start)
         if event.thread_end != None:
           self._thread_time_bounds[thread].AddValue(event.thread_end)
+      thread.AddAsyncSliceBounds(self._bounds,
+                                 self._thread_time_bounds[thread])
+
+  def _IterAllCounters(self):
+    for process in self._processes.itervalues():
+      for counter in process.counters.itervalues():
+        yield counter
 
   def GetOrCreateProcess(self, pid):
     if pid not in self._processes:
@@ -227,37 +281,58 @@ class TimelineModel(event_container.TimelineEventContainer):
       timeline_marker_names = [timeline_marker_names]
     names = [x for x in timeline_marker_names if x is not None]
 
-    # Gather all events that match the names and sort them.
     events = []
-    name_set = set()
-    for name in names:
-      name_set.add(name)
-
-    def IsEventNeeded(event):
-      if event.parent_slice != None:
-        return
-      return event.name in name_set
-
-    events = list(self.IterAllEvents(
-      recursive=True,
-      event_type_predicate=IsSliceOrAsyncSlice,
-      event_predicate=IsEventNeeded))
+    for markers in self.FindTimelineMarkersByName(names).itervalues():
+      events.extend(markers)
     events.sort(key=attrgetter('start'))
 
     # Check if the number and order of events matches the provided names,
-    # and that the events don't overlap.
+    # and that the events don't overlap. Since the events are sorted by start,
+    # an event overlaps an earlier one iff it starts before the latest end
+    # seen so far.
     if len(events) != len(names):
       raise MarkerMismatchError()
+    latest_end = None
     for (i, event) in enumerate(events):
       if event.name != names[i]:
         raise MarkerMismatchError()
-    for i in xrange(0, len(events)):
-      for j in xrange(i+1, len(events)):
-        if events[j].start < events[i].start + events[i].duration:
-          raise MarkerOverlapError()
+      if latest_end != None and event.start < latest_end:
+        raise MarkerOverlapError()
+      if latest_end == None or event.end > latest_end:
+        latest_end = event.end
 
     return events
 
+  def FindTimelineMarkersByName(self, timeline_marker_names):
+    """Find the toplevel slices and async slices for many marker names at once.
+
+    All the names are resolved in a single pass over the slices, and only the
+    async slices with one of the names get built.
+
+    Returns a dict mapping each name that was found to its events, sorted by
+    start.
+    """
+    name_set = set(timeline_marker_names)
+
+    def IsToplevelMarker(event):
+      return event.parent_slice == None and event.name in name_set
+
+    markers_by_name = {}
+    for event in itertools.chain(
+        self.IterAllEvents(
+            recursive=True,
+            event_type_predicate=lambda t: t == slice_module.Slice,
+            event_predicate=IsToplevelMarker),
+        self._IterAllAsyncSlicesWithName(
+            recursive=True,
+            name_predicate=lambda name: name in name_set)):
+      if event.parent_slice == None:
+        markers_by_name.setdefault(event.name, []).append(event)
+
+    for markers in markers_by_name.itervalues():
+      markers.sort(key=attrgetter('start'))
+    return markers_by_name
+
   def GetRendererProcessFromTabId(self, tab_id):
     renderer_thread = self.GetRendererThreadFromTabId(tab_id)
     if renderer_thread:
@@ -22,3 +22,64 @@ class TimelineModelUnittest(unittest.TestCase):
     ])
     model = model_module.TimelineModel(builder.AsData())
     self.assertEquals(5, model.browser_process.pid)
+
+  def _CreateModelWithMarkers(self, markers):
+    events = []
+    for name, ts, dur in markers:
+      events.append({'name': name, 'args': {}, 'pid': 1, 'tid': 1, 'ts': ts,
+                     'cat': 'blink.console', 'ph': 'S', 'id': name})
+      events.append({'name': name, 'args': {}, 'pid': 1, 'tid': 1,
+                     'ts': ts + dur, 'cat': 'blink.console', 'ph': 'F',
+                     'id': name})
+    events.append({'name': 'a', 'args': {}, 'pid': 1, 'tid': 1, 'ts': 0,
+                   'dur': 100, 'cat': 'foo', 'ph': 'X'})
+    return model_module.TimelineModel(trace_data.TraceData(events),
+                                      shift_world_to_zero=False)
+
+  def testFindTimelineMarkersByName(self):
+    model = self._CreateModelWithMarkers(
+        [('B', 50, 10), ('A', 10, 10), ('C', 30, 10)])
+    markers = model.FindTimelineMarkersByName(['A', 'B', 'a', 'D'])
+    self.assertEquals(['A', 'B', 'a'], sorted(markers.iterkeys()))
+    self.assertAlmostEquals(0.01, markers['A'][0].start)
+    self.assertAlmostEquals(0.05, markers['B'][0].start)
+
+  def testFindTimelineMarkers(self):
+    model = self._CreateModelWithMarkers(
+        [('B', 50, 10), ('A', 10, 10), ('C', 30, 10)])
+    markers = model.FindTimelineMarkers(['A', 'C', 'B'])
+    self.assertEquals(['A', 'C', 'B'], [m.name for m in markers])
+    self.assertRaises(model_module.MarkerMismatchError,
+                      model.FindTimelineMarkers, ['A', 'B', 'C'])
+
+  def testFindTimelineMarkersOverlap(self):
+    model = self._CreateModelWithMarkers(
+        [('A', 10, 30), ('B', 20, 5), ('C', 30, 5)])
+    self.assertRaises(model_module.MarkerOverlapError,
+                      model.FindTimelineMarkers, ['A', 'B', 'C'])
+
+  def testGetGlobalMemoryDumpsInRange(self):
+    def Dump(dump_id, pid, ts, malloc_size):
+      return {'name': 'periodic_interval', 'cat': 'disabled-by-default-memory',
+              'ph': 'v', 'id': dump_id, 'pid': pid, 'tid': 1, 'ts': ts,
+              'args': {'dumps': {'allocators': {
+                  'malloc': {'attrs': {'size': {'value': hex(malloc_size)}}}
+              }}}}
+
+    events = [Dump('3', 1, 3000, 30), Dump('3', 2, 3500, 35),
+              Dump('1', 1, 1000, 10), Dump('1', 2, 1200, 12),
+              Dump('2', 1, 2000, 20), Dump('2', 2, 2100, 21)]
+    model = model_module.TimelineModel(trace_data.TraceData(events),
+                                       shift_world_to_zero=False)
+
+    self.assertEquals(['1', '2'], [d.dump_id for d in
+                                   model.GetGlobalMemoryDumpsInRange(1, 3)])
+    # The dump must end within the range too.
+    self.assertEquals(['2'], [d.dump_id for d in
+                              model.GetGlobalMemoryDumpsInRange(1.5, 3.4)])
+    self.assertEquals([], model.GetGlobalMemoryDumpsInRange(4, 5))
+
+    dump = model.GetGlobalMemoryDumpsInRange(3, 4)[0]
+    self.assertEquals({1: {'malloc': 30}, 2: {'malloc': 35}},
+                      dict((d.process.pid, d.GetAllocatorSizes())
+                           for d in dump.IterProcessMemoryDumps()))
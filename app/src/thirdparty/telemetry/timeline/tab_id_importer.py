@@ -36,28 +36,31 @@ class TabIdImporter(importer.TimelineImporter):
     # Since _CreateTabIdsToThreadsMap() relies on markers output on timeline
     # tracing data, it may not work in case we have trace events dropped due to
     # trace buffer overflow.
-    for process in self._model.GetAllProcesses():
-      if process.trace_buffer_did_overflow:
-        raise TraceBufferOverflowException(
-            'Trace buffer of process with pid=%d overflowed at timestamp %d. '
-            'Raw trace data:\n%s' %
-            (process.pid, process.trace_buffer_overflow_event.start,
-             repr(self._trace_data)))
+    # The message names every overflowed process, but doesn't include the raw
+    # trace data, which can be arbitrarily large.
+    overflows = [
+        'Trace buffer of process with pid=%d overflowed at timestamp %d.' %
+        (process.pid, process.trace_buffer_overflow_event.start)
+        for process in self._model.GetAllProcesses()
+        if process.trace_buffer_did_overflow]
+    if overflows:
+      raise TraceBufferOverflowException('\n'.join(overflows))
 
   def _CreateTabIdsToThreadsMap(self):
     tab_id_events = self._trace_data.GetEventsFor(
         trace_data_module.TAB_ID_PART)
 
+    # Resolve the markers of all tabs in one pass over the model.
+    markers_by_tab_id = self._model.FindTimelineMarkersByName(tab_id_events)
+
     for tab_id in tab_id_events:
-      try:
-        timeline_markers = self._model.FindTimelineMarkers(tab_id)
-      # If timeline_markers with name equals |tab_id| can't be found, it's
-      # non-fatal.
-      except Exception:
+      timeline_markers = markers_by_tab_id.get(tab_id, [])
+      # If a single timeline_marker with name equals |tab_id| can't be found,
+      # it's non-fatal.
+      if len(timeline_markers) != 1:
         logging.warning('Cannot find timeline marker for tab with id=%s' %
                         tab_id)
         continue
-      assert len(timeline_markers) == 1
       assert timeline_markers[0].start_thread == timeline_markers[0].end_thread
       self._model.AddMappingFromTabIdToRendererThread(
           tab_id, timeline_markers[0].start_thread)
@@ -2,6 +2,7 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 import telemetry.timeline.async_slice as async_slice_module
+import telemetry.timeline.bounds as bounds_module
 import telemetry.timeline.event_container as event_container
 import telemetry.timeline.flow_event as flow_event_module
 import telemetry.timeline.sample as sample_module
@@ -23,6 +24,18 @@ class Thread(event_container.TimelineEventContainer):
     self._toplevel_slices = []
     self._all_slices = []
 
+    # The cpu_profile.ThreadProfile of the samples taken on this thread, if
+    # the trace has any.
+    self.cpu_profile = None
+
+    # Async slices that have been paired by an importer but not built yet,
+    # as (names, build) tuples in the order they were closed. They are only
+    # built once somebody asks for them, see MaterializeAsyncSlices.
+    self._pending_async_slices = []
+    self._pending_async_bounds = bounds_module.Bounds()
+    self._pending_async_thread_bounds = bounds_module.Bounds()
+    self._pending_async_shift = 0
+
     # State only valid during import.
     self._open_slices = []
     self._newly_added_slices = []
@@ -41,6 +54,7 @@ class Thread(event_container.TimelineEventContainer):
 
   @property
   def async_slices(self):
+    self.MaterializeAsyncSlices()
     return self._async_slices
 
   @property
@@ -61,12 +75,9 @@ class Thread(event_container.TimelineEventContainer):
           yield s
 
     if event_type_predicate(async_slice_module.AsyncSlice):
-      for async_slice in self._async_slices:
-        if event_predicate(async_slice):
-          yield async_slice
-        for sub_slice in async_slice.IterEventsInThisContainerRecrusively():
-          if event_predicate(sub_slice):
-            yield sub_slice
+      self.MaterializeAsyncSlices()
+      for async_slice in self._IterAsyncSlices(event_predicate):
+        yield async_slice
 
     if event_type_predicate(flow_event_module.FlowEvent):
       for flow_event in self._flow_events:
@@ -78,6 +89,86 @@ class Thread(event_container.TimelineEventContainer):
         if event_predicate(sample):
           yield sample
 
+  def IterEventsMatchingQueryInThisContainer(self, query):
+    if query.threads != None and self not in query.threads:
+      return
+
+    if query.MatchesKind(slice_module.Slice):
+      for s in self._IterSlicesMatchingQuery(query):
+        yield s
+
+    if query.MatchesKind(async_slice_module.AsyncSlice):
+      # Only build the pending async slices the query can match.
+      name_predicate = None
+      if query.has_name_filter:
+        name_predicate = query.MatchesName
+      category_predicate = None
+      if query.categories != None:
+        category_predicate = query.categories.__contains__
+      self.MaterializeAsyncSlices(name_predicate, category_predicate)
+      for async_slice in self._IterAsyncSlices(query.Matches):
+        yield async_slice
+
+    if query.MatchesKind(flow_event_module.FlowEvent):
+      for flow_event in self._flow_events:
+        if query.Matches(flow_event):
+          yield flow_event
+
+    if query.MatchesKind(sample_module.Sample):
+      for sample in self._samples:
+        if query.Matches(sample):
+          yield sample
+
+  def _IterSlicesMatchingQuery(self, query):
+    for s in self._newly_added_slices:
+      if query.Matches(s):
+        yield s
+
+    if not query.has_time_window and not query.toplevel_only:
+      for s in self._all_slices:
+        if query.Matches(s):
+          yield s
+      return
+
+    # Toplevel slices are sorted by start and don't overlap, so the ones in
+    # the time window are found by bisection, and the sub slices of a slice
+    # outside of the window are never looked at. Results come in start order.
+    toplevel_slices = self._toplevel_slices
+    begin = 0
+    end = len(toplevel_slices)
+    if query.start != None:
+      begin = max(0, _BisectRightByStart(toplevel_slices, query.start) - 1)
+    if query.end != None:
+      end = _BisectRightByStart(toplevel_slices, query.end)
+
+    for i in xrange(begin, end):
+      if query.toplevel_only:
+        if query.Matches(toplevel_slices[i]):
+          yield toplevel_slices[i]
+        continue
+      stack = [toplevel_slices[i]]
+      while stack:
+        s = stack.pop()
+        if query.start != None and s.end < query.start:
+          continue
+        if query.end != None and s.start > query.end:
+          continue
+        if query.Matches(s):
+          yield s
+        stack.extend(reversed(s.sub_slices))
+
+  def IterAsyncSlicesInThisContainer(self, name_predicate):
+    self.MaterializeAsyncSlices(name_predicate)
+    return self._IterAsyncSlices(lambda e: name_predicate(e.name))
+
+  def _IterAsyncSlices(self, event_predicate):
+    for async_slice in self._async_slices:
+      if event_predicate(async_slice):
+        yield async_slice
+      for sub_slice in async_slice.IterEventsInThisContainerRecrusively():
+        if event_predicate(sub_slice):
+          yield sub_slice
+
   def AddSample(self, category, name, timestamp, args=None):
     if len(self._samples) and timestamp < self._samples[-1].start:
       raise ValueError(
@@ -89,6 +180,83 @@ class Thread(event_container.TimelineEventContainer):
   def AddAsyncSlice(self, async_slice):
     self._async_slices.append(async_slice)
 
+  def AddLazyAsyncSlice(self, category, names, start, end, thread_start,
+                        thread_end, build):
+    """Records an async slice that is only built when first needed.
+
+    * category: Category of the slice and of all its sub slices.
+    * names: Names of the slice and of all its sub slices.
+    * start, end: Bounds of the slice, in milliseconds.
+    * thread_start, thread_end: Thread clock bounds of the slice in
+                                milliseconds, or None.
+    * build: Callable taking no arguments that returns the AsyncSlice.
+    """
+    self._pending_async_slices.append((category, names, build))
+    self._pending_async_bounds.AddValue(start)
+    self._pending_async_bounds.AddValue(end)
+    if thread_start != None and thread_end != None:
+      self._pending_async_thread_bounds.AddValue(thread_start)
+      self._pending_async_thread_bounds.AddValue(thread_end)
+
+  def MaterializeAsyncSlices(self, name_predicate=None,
+                             category_predicate=None):
+    """Builds the pending async slices that have a slice or sub slice name
+    matching name_predicate and a category matching category_predicate.
+    A predicate that is None matches everything.
+    """
+    if not len(self._pending_async_slices):
+      return
+    if name_predicate == None and category_predicate == None:
+      to_build = self._pending_async_slices
+      self._pending_async_slices = []
+    else:
+      to_build = []
+      remaining = []
+      for pending in self._pending_async_slices:
+        category, names, _ = pending
+        if ((category_predicate == None or category_predicate(category)) and
+            (name_predicate == None or
+             any(name_predicate(name) for name in names))):
+          to_build.append(pending)
+        else:
+          remaining.append(pending)
+      self._pending_async_slices = remaining
+
+    shift_amount = self._pending_async_shift
+    for _, _, build in to_build:
+      async_slice = build()
+      if shift_amount:
+        async_slice.start -= shift_amount
+        for sub_slice in async_slice.IterEventsInThisContainerRecrusively():
+          sub_slice.start -= shift_amount
+      self._async_slices.append(async_slice)
+
+  def ShiftAsyncSlices(self, shift_amount):
+    """Shifts all async slices, built or pending, back by shift_amount."""
+    for async_slice in self._IterAsyncSlices(lambda e: True):
+      async_slice.start -= shift_amount
+    self._pending_async_shift += shift_amount
+
+  def AddAsyncSliceBounds(self, bounds, thread_time_bounds):
+    """Adds the bounds of all async slices, built or pending, to bounds
+    and their thread clock bounds to thread_time_bounds.
+    """
+    for async_slice in self._IterAsyncSlices(lambda e: True):
+      bounds.AddValue(async_slice.start)
+      bounds.AddValue(async_slice.end)
+      if async_slice.thread_start != None:
+        thread_time_bounds.AddValue(async_slice.thread_start)
+      if async_slice.thread_end != None:
+        thread_time_bounds.AddValue(async_slice.thread_end)
+
+    if not len(self._pending_async_slices):
+      return
+    bounds.AddValue(self._pending_async_bounds.min - self._pending_async_shift)
+    bounds.AddValue(self._pending_async_bounds.max - self._pending_async_shift)
+    if not self._pending_async_thread_bounds.is_empty:
+      thread_time_bounds.AddValue(self._pending_async_thread_bounds.min)
+      thread_time_bounds.AddValue(self._pending_async_thread_bounds.max)
+
   def AddFlowEvent(self, flow_event):
     self._flow_events.append(flow_event)
 
@@ -173,6 +341,33 @@ class Thread(event_container.TimelineEventContainer):
           assert s.thread_duration >= 0
     self._open_slices = []
 
+  def FindEnclosingSlice(self, timestamp):
+    """Returns the deepest slice containing timestamp, or None.
+
+    Relies on the toplevel slices, and the sub slices of each slice, being
+    sorted by start and not overlapping, as they are after FinalizeImport.
+    """
+    enclosing = None
+    slices = self._toplevel_slices
+    while len(slices):
+      i = _BisectRightByStart(slices, timestamp) - 1
+      if i < 0 or slices[i].end < timestamp:
+        break
+      enclosing = slices[i]
+      slices = enclosing.sub_slices
+    return enclosing
+
+  def FindNextSlice(self, timestamp):
+    """Returns the first toplevel slice starting at or after timestamp, or
+    None.
+    """
+    i = _BisectRightByStart(self._toplevel_slices, timestamp)
+    if i > 0 and self._toplevel_slices[i - 1].start == timestamp:
+      return self._toplevel_slices[i - 1]
+    if i < len(self._toplevel_slices):
+      return self._toplevel_slices[i]
+    return None
+
   def IsTimestampValidForBeginOrEnd(self, timestamp):
     if not len(self._open_slices):
       return True
@@ -259,3 +454,16 @@ class Thread(event_container.TimelineEventContainer):
       root.AddSubSlice(child)
       return True
     return False
+
+
+def _BisectRightByStart(slices, timestamp):
+  """Returns the index of the first slice starting after timestamp."""
+  lo = 0
+  hi = len(slices)
+  while lo < hi:
+    mid = (lo + hi) // 2
+    if timestamp < slices[mid].start:
+      hi = mid
+    else:
+      lo = mid + 1
+  return lo
@@ -2,16 +2,28 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import gzip
+import heapq
+import itertools
 import json
 
+from telemetry.timeline import lazy_args as lazy_args_module
+
 class NonSerializableTraceData(Exception):
   """Raised when raw trace data cannot be serialized to TraceData."""
   pass
 
 
+def _SkipLazyArgs(obj):
+  # LazyArgs hold JSON text that was already parsed once.
+  if isinstance(obj, lazy_args_module.LazyArgs):
+    return {}
+  raise TypeError('%r is not JSON serializable' % obj)
+
+
 def _ValidateRawData(raw):
   try:
-    json.dumps(raw)
+    json.dumps(raw, default=_SkipLazyArgs)
   except TypeError as e:
     raise NonSerializableTraceData('TraceData is not serilizable: %s' % e)
   except ValueError as e:
@@ -52,6 +64,82 @@ def _HasEventsFor(part, raw):
   return len(raw[part.raw_field_name]) > 0
 
 
+def _GetClockSyncTimestamps(events):
+  """Returns the timestamp of each clock_sync marker of events by sync id."""
+  timestamps = {}
+  for event in events:
+    if event.get('name') != 'clock_sync' or 'ts' not in event:
+      continue
+    sync_id = (event.get('args') or {}).get('sync_id')
+    if sync_id != None:
+      timestamps.setdefault(sync_id, event['ts'])
+  return timestamps
+
+
+def GetClockOffsets(shards):
+  """Returns the offset to add to the timestamps of each list of events in
+  shards to bring it to the clock of the first one.
+
+  Agents recording the same session issue clock_sync markers with a shared
+  sync_id. A shard is aligned to any shard already aligned that it shares a
+  marker with, so alignment carries across agents that never synced with the
+  first one directly. Shards without a shared marker are left as they are.
+  """
+  sync_timestamps = [_GetClockSyncTimestamps(events) for events in shards]
+  offsets = [None] * len(shards)
+  if len(shards):
+    offsets[0] = 0
+  aligned = True
+  while aligned:
+    aligned = False
+    for i, timestamps in enumerate(sync_timestamps):
+      if offsets[i] != None:
+        continue
+      for j, reference in enumerate(sync_timestamps):
+        if offsets[j] == None:
+          continue
+        shared = set(timestamps).intersection(reference)
+        if shared:
+          sync_id = min(shared)
+          offsets[i] = offsets[j] + reference[sync_id] - timestamps[sync_id]
+          aligned = True
+          break
+  return [offset if offset != None else 0 for offset in offsets]
+
+
+def AlignShards(shards):
+  """Shifts the timestamps of each list of events in shards, in place, by
+  its offset from GetClockOffsets."""
+  for events, offset in itertools.izip(shards, GetClockOffsets(shards)):
+    if not offset:
+      continue
+    for event in events:
+      if 'ts' in event:
+        event['ts'] += offset
+
+
+def _IterTimestampedEvents(events, shard_index):
+  """Yields (timestamp, shard_index, position, event) for each of events.
+  Events without a timestamp take that of the event before them."""
+  timestamp = float('-inf')
+  for position, event in enumerate(events):
+    timestamp = event.get('ts', timestamp)
+    yield timestamp, shard_index, position, event
+
+
+def MergeEvents(shards):
+  """Yields the events of shards merged in timestamp order.
+
+  The shards are walked side by side rather than concatenated and sorted.
+  Events keep their order relative to the other events of their shard, so
+  begin and end events stay paired even where a shard isn't strictly sorted.
+  """
+  merged = heapq.merge(*[_IterTimestampedEvents(events, i)
+                         for i, events in enumerate(shards)])
+  for _, _, _, event in merged:
+    yield event
+
+
 class TraceData(object):
   """Validates, parses, and serializes raw data.
 
@@ -66,10 +154,19 @@ class TraceData(object):
   3. A json-parseable array missing the final ']': assumed to be chrome trace
      data.
   """
-  def __init__(self, raw_data=None):
-    """Creates TraceData from the given data."""
+  def __init__(self, raw_data=None, lazy_args=False):
+    """Creates TraceData from the given data.
+
+    If lazy_args is set and raw_data is a string, the args of its events are
+    kept undecoded until they are used (see lazy_args.py).
+    """
     self._raw_data = {}
     self._events_are_safely_mutable = False
+
+    # Chrome events of traces built from shards, kept apart until they're
+    # needed as a single list (see IterEventsFor).
+    self._chrome_shards = None
+
     if not raw_data:
       return
     _ValidateRawData(raw_data)
@@ -79,7 +176,10 @@ class TraceData(object):
         if raw_data.endswith(','):
           raw_data = raw_data[:-1]
         raw_data += ']'
-      json_data = json.loads(raw_data)
+      if lazy_args:
+        json_data = lazy_args_module.LoadTraceJson(raw_data)
+      else:
+        json_data = json.loads(raw_data)
       # The parsed data isn't shared with anyone else, so we mark this value
       # as safely mutable.
       self._events_are_safely_mutable = True
@@ -95,10 +195,18 @@ class TraceData(object):
     else:
       raise Exception('Unrecognized data format.')
 
-  def _SetFromBuilder(self, d):
+  def _SetFromBuilder(self, d, chrome_shards=None):
     self._raw_data = d
+    self._chrome_shards = chrome_shards
     self._events_are_safely_mutable = True
 
+  def _MergeChromeShards(self):
+    if self._chrome_shards == None:
+      return
+    self._raw_data[CHROME_TRACE_PART.raw_field_name] = list(
+        MergeEvents(self._chrome_shards))
+    self._chrome_shards = None
+
   @property
   def events_are_safely_mutable(self):
     """Returns true if the events in this value are completely sealed.
@@ -116,7 +224,10 @@ class TraceData(object):
 
   @property
   def active_parts(self):
-    return {p for p in ALL_TRACE_PARTS if p.raw_field_name in self._raw_data}
+    parts = {p for p in ALL_TRACE_PARTS if p.raw_field_name in self._raw_data}
+    if self._chrome_shards != None:
+      parts.add(CHROME_TRACE_PART)
+    return parts
 
   @property
   def metadata_records(self):
@@ -130,21 +241,77 @@ class TraceData(object):
       }
 
   def HasEventsFor(self, part):
+    if part == CHROME_TRACE_PART and self._chrome_shards != None:
+      return any(len(events) for events in self._chrome_shards)
     return _HasEventsFor(part, self._raw_data)
 
   def GetEventsFor(self, part):
     if not self.HasEventsFor(part):
       return []
     assert isinstance(part, TraceDataPart)
+    if part == CHROME_TRACE_PART:
+      self._MergeChromeShards()
     return self._raw_data[part.raw_field_name]
 
+  def IterEventsFor(self, part):
+    """Iterates the events of part.
+
+    Unlike GetEventsFor, the Chrome events of a trace built from shards are
+    merged as they're iterated, so the merged events are never held in a
+    list of their own.
+    """
+    if part == CHROME_TRACE_PART and self._chrome_shards != None:
+      return MergeEvents(self._chrome_shards)
+    return iter(self.GetEventsFor(part))
+
   def Serialize(self, f, gzip_result=False):
     """Serializes the trace result to a file-like object.
 
-    Always writes in the trace container format.
+    Always writes in the trace container format. With gzip_result, the JSON
+    is compressed as it is written, so the uncompressed trace is never held
+    in memory.
     """
-    assert not gzip_result, 'Not implemented'
-    json.dump(self._raw_data, f)
+    self._MergeChromeShards()
+    if not gzip_result:
+      json.dump(self._raw_data, f, default=lazy_args_module.EncodeLazyArgs)
+      return
+
+    gzip_file = gzip.GzipFile(fileobj=f, mode='wb')
+    try:
+      json.dump(self._raw_data, gzip_file,
+                default=lazy_args_module.EncodeLazyArgs)
+    finally:
+      gzip_file.close()
+
+  def GetTrimmed(self, pids, category_prefixes=None):
+    """Returns TraceData with only the Chrome trace events of the processes
+    pids, and the trace's metadata.
+
+    If category_prefixes is given, only the events with a category starting
+    with one of them are kept, besides the metadata events (thread names,
+    process labels, ...) of the processes. Other parts are dropped.
+    """
+    pids = frozenset(pids)
+    if category_prefixes != None:
+      category_prefixes = tuple(category_prefixes)
+
+    def IsRetained(event):
+      if event.get('pid') not in pids:
+        return False
+      if category_prefixes == None or event.get('ph') == 'M':
+        return True
+      return any(category.startswith(category_prefixes)
+                 for category in event.get('cat', '').split(','))
+
+    part_field_names = {p.raw_field_name for p in ALL_TRACE_PARTS}
+    raw_data = dict((k, v) for k, v in self._raw_data.iteritems()
+                    if k not in part_field_names)
+    raw_data[CHROME_TRACE_PART.raw_field_name] = [
+        event for event in self.IterEventsFor(CHROME_TRACE_PART)
+        if IsRetained(event)]
+    trimmed = TraceData()
+    trimmed._raw_data = raw_data
+    return trimmed
 
 
 class TraceDataBuilder(object):
@@ -155,21 +322,30 @@ class TraceDataBuilder(object):
   """
   def __init__(self):
     self._raw_data = {}
+    self._chrome_shards = None
 
   def AsData(self):
     if self._raw_data == None:
       raise Exception('Can only AsData once')
 
+    chrome_shards = self._chrome_shards
+    if (chrome_shards != None and
+        CHROME_TRACE_PART.raw_field_name in self._raw_data):
+      chrome_shards.insert(
+          0, self._raw_data.pop(CHROME_TRACE_PART.raw_field_name))
+
     data = TraceData()
-    data._SetFromBuilder(self._raw_data)
+    data._SetFromBuilder(self._raw_data, chrome_shards)
     self._raw_data = None
+    self._chrome_shards = None
     return data
 
   def AddEventsTo(self, part, events):
     """Note: this won't work when called from multiple browsers.
 
     Each browser's trace_event_impl zeros its timestamps when it writes them
-    out and doesn't write a timebase that can be used to re-sync them.
+    out and doesn't write a timebase that can be used to re-sync them. Traces
+    that do carry clock_sync markers can be combined with AddShards.
     """
     assert isinstance(part, TraceDataPart)
     assert isinstance(events, list)
@@ -179,4 +355,39 @@ class TraceDataBuilder(object):
     self._raw_data.setdefault(part.raw_field_name, []).extend(events)
 
   def HasEventsFor(self, part):
+    if (part == CHROME_TRACE_PART and self._chrome_shards != None and
+        any(len(events) for events in self._chrome_shards)):
+      return True
     return _HasEventsFor(part, self._raw_data)
+
+  def AddShards(self, shards):
+    """Adds traces recorded separately, e.g. one per process, in any of the
+    raw formats TraceData accepts (already parsed).
+
+    Chrome trace events are merged by timestamp, with each shard's clock
+    aligned through its clock_sync markers. The shards are only merged as
+    the TraceData's events are iterated (see TraceData.IterEventsFor). Other
+    parts are appended in shard order, and metadata is taken from the first
+    shard that has it.
+    """
+    if self._raw_data == None:
+      raise Exception('Already called AsData() on this builder.')
+
+    shards = [{CHROME_TRACE_PART.raw_field_name: shard}
+              if isinstance(shard, list) else shard for shard in shards]
+    part_field_names = {p.raw_field_name for p in ALL_TRACE_PARTS}
+    for shard in shards:
+      for k, v in shard.iteritems():
+        if k == CHROME_TRACE_PART.raw_field_name:
+          continue
+        if k in part_field_names:
+          self._raw_data.setdefault(k, []).extend(v)
+        else:
+          self._raw_data.setdefault(k, v)
+
+    chrome_events = [shard.get(CHROME_TRACE_PART.raw_field_name, [])
+                     for shard in shards]
+    AlignShards(chrome_events)
+    if self._chrome_shards == None:
+      self._chrome_shards = []
+    self._chrome_shards.extend(chrome_events)
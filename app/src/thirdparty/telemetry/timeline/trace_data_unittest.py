@@ -3,6 +3,7 @@
 # found in the LICENSE file.
 
 import cStringIO
+import gzip
 import json
 import unittest
 
@@ -20,6 +21,37 @@ class TraceDataTest(unittest.TestCase):
 
     json.loads(d)
 
+  def testSerializeGzip(self):
+    ri = trace_data.TraceData({'traceEvents': [1, 2, 3]})
+    f = cStringIO.StringIO()
+    ri.Serialize(f, gzip_result=True)
+    f.seek(0)
+    self.assertEqual({'traceEvents': [1, 2, 3]},
+                     json.load(gzip.GzipFile(fileobj=f)))
+
+  def testGetTrimmed(self):
+    d = trace_data.TraceData({
+      'traceEvents': [
+        {'ph': 'M', 'pid': 1, 'name': 'process_labels'},
+        {'ph': 'X', 'pid': 1, 'cat': 'devtools.timeline', 'name': 'a'},
+        {'ph': 'X', 'pid': 1, 'cat': 'cc,devtools.timeline.frame', 'name': 'b'},
+        {'ph': 'X', 'pid': 1, 'cat': 'ipc', 'name': 'c'},
+        {'ph': 'X', 'pid': 2, 'cat': 'devtools.timeline', 'name': 'd'},
+        {'ph': 'M', 'pid': 2, 'name': 'process_labels'},
+      ],
+      'tabIds': ['tab-1'],
+      'stackFrames': {},
+    })
+    trimmed = d.GetTrimmed([1], ['devtools.timeline'])
+    self.assertEqual(
+        ['process_labels', 'a', 'b'],
+        [e['name'] for e in trimmed.GetEventsFor(trace_data.CHROME_TRACE_PART)])
+    self.assertFalse(trimmed.HasEventsFor(trace_data.TAB_ID_PART))
+    self.assertEqual(['stackFrames'],
+                     [r['name'] for r in trimmed.metadata_records])
+    self.assertEqual(
+        4, len(d.GetTrimmed([1]).GetEventsFor(trace_data.CHROME_TRACE_PART)))
+
   def testValidateWithNonPrimativeRaises(self):
     with self.assertRaises(trace_data.NonSerializableTraceData):
       trace_data.TraceData({'hello': TraceDataTest})
@@ -76,3 +108,41 @@ class TraceDataBuilderTest(unittest.TestCase):
     self.assertTrue(d.HasEventsFor(trace_data.TAB_ID_PART))
 
     self.assertRaises(Exception, builder.AsData)
+
+  def testAddShards(self):
+    def ClockSync(sync_id, ts):
+      return {'name': 'clock_sync', 'ph': 'c', 'ts': ts,
+              'args': {'sync_id': sync_id}}
+
+    browser = [ClockSync('a', 100),
+               {'name': 'x', 'ph': 'B', 'pid': 1, 'ts': 150},
+               {'name': 'x', 'ph': 'E', 'pid': 1, 'ts': 120}]
+    renderer = {'traceEvents': [{'name': 'thread_name', 'ph': 'M', 'pid': 2},
+                                {'name': 'y', 'ph': 'X', 'pid': 2, 'ts': 1030},
+                                ClockSync('a', 1000),
+                                ClockSync('b', 1050)],
+                'tabIds': ['tab-2'],
+                'metadata': {'shard': 'renderer'}}
+    gpu = {'traceEvents': [ClockSync('b', 10), {'ph': 'X', 'pid': 3, 'ts': 0}],
+           'metadata': {'shard': 'gpu'}}
+    self.assertEqual([0, -900, 140],
+                     trace_data.GetClockOffsets(
+                         [browser, renderer['traceEvents'], gpu['traceEvents']]))
+
+    builder = trace_data.TraceDataBuilder()
+    builder.AddShards([browser, renderer, gpu])
+    d = builder.AsData()
+    self.assertTrue(d.HasEventsFor(trace_data.CHROME_TRACE_PART))
+    # Each shard keeps its own order, even where it isn't sorted. Shards are
+    # only aligned once, however often they're merged.
+    expected = [('M', None), ('X', 130), ('B', 150), ('E', 120), ('X', 140)]
+    for _ in range(2):
+      events = d.IterEventsFor(trace_data.CHROME_TRACE_PART)
+      self.assertEqual(
+          expected, [(e['ph'], e.get('ts')) for e in events if e['ph'] != 'c'])
+    events = d.GetEventsFor(trace_data.CHROME_TRACE_PART)
+    self.assertEqual(
+        expected, [(e['ph'], e.get('ts')) for e in events if e['ph'] != 'c'])
+    self.assertEqual(['tab-2'], d.GetEventsFor(trace_data.TAB_ID_PART))
+    self.assertEqual([{'name': 'metadata', 'value': {'shard': 'renderer'}}],
+                     list(d.metadata_records))
@@ -9,13 +9,41 @@ https://code.google.com/p/trace-viewer/
 
 import collections
 import copy
+import functools
 
 import telemetry.timeline.async_slice as tracing_async_slice
+import telemetry.timeline.cpu_profile as cpu_profile_module
 import telemetry.timeline.flow_event as tracing_flow_event
 from telemetry.timeline import importer
 from telemetry.timeline import memory_dump_event
 from telemetry.timeline import trace_data as trace_data_module
 
+# Sample events carrying V8 CPU profiles, as opposed to single stacks.
+V8_PROFILE_EVENT_NAMES = ('Profile', 'ProfileChunk')
+
+
+def _GetStackFrameParent(frame):
+  parent = frame.get('parent')
+  return str(parent) if parent != None else None
+
+
+def _GetStackFrameFunction(frame):
+  return frame['name'], frame.get('category', '')
+
+
+def _GetV8NodeFunction(node):
+  call_frame = node.get('callFrame', {})
+  return (call_frame.get('functionName') or '(anonymous)',
+          call_frame.get('url', ''))
+
+
+class _V8Profile(object):
+  def __init__(self, stack_table, thread, time):
+    self.thread = thread
+    self.time = time
+    self.frames = cpu_profile_module.FrameInterner(
+        stack_table, lambda node: node.get('parent'), _GetV8NodeFunction)
+
 
 class TraceEventTimelineImporter(importer.TimelineImporter):
   def __init__(self, model, trace_data):
@@ -25,11 +53,23 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     self._trace_data = trace_data
 
     self._all_async_events = []
+    self._all_async_events_in_order = True
+    self._last_async_event_ts = None
     self._all_object_events = []
     self._all_flow_events = []
     self._all_memory_dumps_by_dump_id = collections.defaultdict(list)
+    self._mapped_file_classifier = memory_dump_event.MappedFileClassifier()
+    self._all_sampled_stacks = []
+    self._all_v8_profile_events = []
+
+    # Stacks of sample events are ids into the trace's stack frame tree.
+    self._stack_frames = {}
+    for record in trace_data.metadata_records:
+      if record['name'] == 'stackFrames':
+        self._stack_frames = record['value']
 
-    self._events = trace_data.GetEventsFor(trace_data_module.CHROME_TRACE_PART)
+    self._events = trace_data.IterEventsFor(
+        trace_data_module.CHROME_TRACE_PART)
 
   @staticmethod
   def GetSupportedPart():
@@ -49,9 +89,14 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     """
     thread = (self._GetOrCreateProcess(event['pid'])
         .GetOrCreateThread(event['tid']))
-    self._all_async_events.append({
-        'event': event,
-        'thread': thread})
+    # Traces are almost always written in time order, in which case there is
+    # no need to sort the async events before pairing them up.
+    ts = event['ts']
+    if self._last_async_event_ts != None and ts < self._last_async_event_ts:
+      self._all_async_events_in_order = False
+    else:
+      self._last_async_event_ts = ts
+    self._all_async_events.append((event, thread))
 
   def _ProcessCounterEvent(self, event):
     """Helper that creates and adds samples to a Counter object based on
@@ -176,6 +221,11 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
                      event['name'],
                      event['ts'] / 1000.0,
                      event.get('args'))
+    if 'sf' in event:
+      self._all_sampled_stacks.append(
+          (thread, event['ts'] / 1000.0, event['sf']))
+    elif event['name'] in V8_PROFILE_EVENT_NAMES:
+      self._all_v8_profile_events.append((event, thread))
 
   def _ProcessFlowEvent(self, event):
     thread = (self._GetOrCreateProcess(event['pid'])
@@ -186,7 +236,8 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
 
   def _ProcessMemoryDumpEvent(self, event):
     process = self._GetOrCreateProcess(event['pid'])
-    memory_dump = memory_dump_event.ProcessMemoryDumpEvent(process, event)
+    memory_dump = memory_dump_event.ProcessMemoryDumpEvent(
+        process, event, self._mapped_file_classifier)
     process.AddMemoryDumpEvent(memory_dump)
     self._all_memory_dumps_by_dump_id[memory_dump.dump_id].append(memory_dump)
 
@@ -242,18 +293,21 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     self._CreateExplicitObjects()
     self._CreateImplicitObjects()
     self._CreateMemoryDumps()
+    self._CreateCpuProfiles()
 
   def _CreateAsyncSlices(self):
     if len(self._all_async_events) == 0:
       return
 
-    self._all_async_events.sort(key=lambda x: x['event']['ts'])
+    if not self._all_async_events_in_order:
+      self._all_async_events.sort(key=lambda x: x[0]['ts'])
 
-    async_event_states_by_name_then_id = {}
+    # Open slices are keyed on (cat, name, id), each holding the list of
+    # (event, thread) steps seen so far.
+    open_steps_by_key = {}
+    names_seen = set()
 
-    all_async_events = self._all_async_events
-    for async_event_state in all_async_events:
-      event = async_event_state['event']
+    for event, thread in self._all_async_events:
       name = event.get('name', None)
       if name is None:
         self._model.import_errors.append(
@@ -268,87 +322,113 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
 
       # TODO(simonjam): Add a synchronous tick on the appropriate thread.
 
-      if event['ph'] == 'S' or event['ph'] == 'b':
-        if not name in async_event_states_by_name_then_id:
-          async_event_states_by_name_then_id[name] = {}
-        if event_id in async_event_states_by_name_then_id[name]:
+      key = (event.get('cat'), name, event_id)
+      phase = event['ph']
+      if phase == 'S' or phase == 'b':
+        names_seen.add(name)
+        if key in open_steps_by_key:
           self._model.import_errors.append(
               'At %d, a slice of the same id %s was already open.' % (
                   event['ts'], event_id))
           continue
 
-        async_event_states_by_name_then_id[name][event_id] = []
-        async_event_states_by_name_then_id[name][event_id].append(
-            async_event_state)
-      else:
-        if name not in async_event_states_by_name_then_id:
+        open_steps_by_key[key] = [(event, thread)]
+        continue
+
+      steps = open_steps_by_key.get(key)
+      if steps is None:
+        if name not in names_seen:
           self._model.import_errors.append(
               'At %d, no slice named %s was open.' % (event['ts'], name,))
-          continue
-        if event_id not in async_event_states_by_name_then_id[name]:
+        else:
           self._model.import_errors.append(
               'At %d, no slice named %s with id=%s was open.' % (
                   event['ts'], name, event_id))
-          continue
-        events = async_event_states_by_name_then_id[name][event_id]
-        events.append(async_event_state)
-
-        if event['ph'] == 'F' or event['ph'] == 'e':
-          # Create a slice from start to end.
-          async_slice = tracing_async_slice.AsyncSlice(
-              events[0]['event']['cat'],
-              name,
-              events[0]['event']['ts'] / 1000.0)
-
-          async_slice.duration = ((event['ts'] / 1000.0)
-              - (events[0]['event']['ts'] / 1000.0))
-
-          async_slice.start_thread = events[0]['thread']
-          async_slice.end_thread = async_event_state['thread']
-          if async_slice.start_thread == async_slice.end_thread:
-            if 'tts' in event and 'tts' in events[0]['event']:
-              async_slice.thread_start = events[0]['event']['tts'] / 1000.0
-              async_slice.thread_duration = ((event['tts'] / 1000.0)
-                  - (events[0]['event']['tts'] / 1000.0))
-          async_slice.id = event_id
-          async_slice.args = events[0]['event']['args']
-
-          # Create sub_slices for each step.
-          for j in xrange(1, len(events)):
-            sub_name = name
-            if events[j - 1]['event']['ph'] == 'T':
-              sub_name = name + ':' + events[j - 1]['event']['args']['step']
-            sub_slice = tracing_async_slice.AsyncSlice(
-                events[0]['event']['cat'],
-                sub_name,
-                events[j - 1]['event']['ts'] / 1000.0)
-            sub_slice.parent_slice = async_slice
-
-            sub_slice.duration = ((events[j]['event']['ts'] / 1000.0)
-                - (events[j - 1]['event']['ts'] / 1000.0))
-
-            sub_slice.start_thread = events[j - 1]['thread']
-            sub_slice.end_thread = events[j]['thread']
-            if sub_slice.start_thread == sub_slice.end_thread:
-              if 'tts' in events[j]['event'] and \
-                  'tts' in events[j - 1]['event']:
-                sub_slice.thread_duration = \
-                    ((events[j]['event']['tts'] / 1000.0)
-                        - (events[j - 1]['event']['tts'] / 1000.0))
-
-            sub_slice.id = event_id
-            sub_slice.args = events[j - 1]['event']['args']
-
-            async_slice.AddSubSlice(sub_slice)
-
-          # The args for the finish event go in the last sub_slice.
-          last_slice = async_slice.sub_slices[-1]
-          for arg_name, arg_value in event['args'].iteritems():
-            last_slice.args[arg_name] = arg_value
-
-          # Add |async_slice| to the start-thread's async_slices.
-          async_slice.start_thread.AddAsyncSlice(async_slice)
-          del async_event_states_by_name_then_id[name][event_id]
+        continue
+      steps.append((event, thread))
+
+      if phase == 'F' or phase == 'e':
+        del open_steps_by_key[key]
+        self._AddLazyAsyncSlice(name, event_id, steps)
+
+  def _AddLazyAsyncSlice(self, name, event_id, steps):
+    """Hands a closed async slice to its start thread, which only builds it
+    once somebody asks for async slices of its name.
+    """
+    start_event, start_thread = steps[0]
+    end_event, end_thread = steps[-1]
+    start = start_event['ts'] / 1000.0
+    end = end_event['ts'] / 1000.0
+
+    thread_start = None
+    thread_end = None
+    if (start_thread == end_thread and
+        'tts' in start_event and 'tts' in end_event):
+      thread_start = start_event['tts'] / 1000.0
+      thread_end = end_event['tts'] / 1000.0
+
+    names = [name]
+    for step_event, _ in steps[:-1]:
+      if step_event['ph'] == 'T':
+        names.append(name + ':' + step_event['args']['step'])
+
+    start_thread.AddLazyAsyncSlice(
+        start_event.get('cat'), names, start, end, thread_start, thread_end,
+        functools.partial(self._BuildAsyncSlice, name, event_id, steps))
+
+  @staticmethod
+  def _BuildAsyncSlice(name, event_id, steps):
+    timestamps = [step_event['ts'] / 1000.0 for step_event, _ in steps]
+    start_event, start_thread = steps[0]
+    end_event, end_thread = steps[-1]
+    category = start_event['cat']
+
+    # Create a slice from start to end.
+    async_slice = tracing_async_slice.AsyncSlice(
+        category, name, timestamps[0])
+    async_slice.duration = timestamps[-1] - timestamps[0]
+
+    async_slice.start_thread = start_thread
+    async_slice.end_thread = end_thread
+    if async_slice.start_thread == async_slice.end_thread:
+      if 'tts' in end_event and 'tts' in start_event:
+        async_slice.thread_start = start_event['tts'] / 1000.0
+        async_slice.thread_duration = ((end_event['tts'] / 1000.0)
+            - (start_event['tts'] / 1000.0))
+    async_slice.id = event_id
+    async_slice.args = start_event['args']
+
+    # Create sub_slices for each step.
+    for j in xrange(1, len(steps)):
+      prev_event, prev_thread = steps[j - 1]
+      next_event, next_thread = steps[j]
+      sub_name = name
+      if prev_event['ph'] == 'T':
+        sub_name = name + ':' + prev_event['args']['step']
+      sub_slice = tracing_async_slice.AsyncSlice(
+          category, sub_name, timestamps[j - 1])
+      sub_slice.parent_slice = async_slice
+
+      sub_slice.duration = timestamps[j] - timestamps[j - 1]
+
+      sub_slice.start_thread = prev_thread
+      sub_slice.end_thread = next_thread
+      if sub_slice.start_thread == sub_slice.end_thread:
+        if 'tts' in next_event and 'tts' in prev_event:
+          sub_slice.thread_duration = ((next_event['tts'] / 1000.0)
+              - (prev_event['tts'] / 1000.0))
+
+      sub_slice.id = event_id
+      sub_slice.args = prev_event['args']
+
+      async_slice.AddSubSlice(sub_slice)
+
+    # The args for the finish event go in the last sub_slice.
+    last_slice = async_slice.sub_slices[-1]
+    for arg_name, arg_value in end_event['args'].iteritems():
+      last_slice.args[arg_name] = arg_value
+
+    return async_slice
 
   def _CreateExplicitObjects(self):
     # TODO(tengs): Implement object instance parsing
@@ -365,6 +445,7 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     self._all_flow_events.sort(key=lambda x: x['event']['ts'])
 
     flow_id_to_event = {}
+    flow_id_to_steps = {}
     for data in self._all_flow_events:
       event = data['event']
       thread = data['thread']
@@ -392,6 +473,7 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
               'flow event.' % event['id'])
           continue
         flow_id_to_event[event['id']] = flow_event
+        flow_id_to_steps[event['id']] = [(flow_event, thread, False)]
       elif event['ph'] == 't' or event['ph'] == 'f':
         if not event['id'] in flow_id_to_event:
           self._model.import_errors.append(
@@ -401,17 +483,80 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
         flow_position = flow_id_to_event[event['id']]
         self._model.flow_events.append([flow_position, flow_event])
 
+        # Unless its binding point is its enclosing slice, a flow finish
+        # binds to the next slice on its thread.
+        bind_to_next_slice = event['ph'] == 'f' and event.get('bp') != 'e'
+        flow_id_to_steps[event['id']].append(
+            (flow_event, thread, bind_to_next_slice))
+
         if event['ph'] == 'f':
           del flow_id_to_event[event['id']]
+          self._model.flow_graph.AddFlow(event['id'],
+                                         flow_id_to_steps.pop(event['id']))
         else:
           # Make this event the next start event in this flow.
           flow_id_to_event[event['id']] = flow_event
 
+    # Flows that never finished still link the slices they went through.
+    for flow_id, steps in flow_id_to_steps.iteritems():
+      if len(steps) > 1:
+        self._model.flow_graph.AddFlow(flow_id, steps)
+
   def _CreateMemoryDumps(self):
     self._model.SetGlobalMemoryDumps(
         memory_dump_event.GlobalMemoryDump(events)
         for events in self._all_memory_dumps_by_dump_id.itervalues())
 
+  def _CreateCpuProfiles(self):
+    """Turns sampled stacks and V8 profile chunks into the CPU profiles of
+    their threads, sharing the model's StackTable."""
+    stack_table = self._model.stack_table
+    profiles = []
+
+    def AddSample(thread, timestamp, node):
+      if node == cpu_profile_module.NO_PARENT:
+        return
+      if thread.cpu_profile == None:
+        thread.cpu_profile = cpu_profile_module.ThreadProfile(stack_table)
+        profiles.append(thread.cpu_profile)
+      thread.cpu_profile.AddSample(timestamp, node)
+
+    if self._all_sampled_stacks:
+      frames = cpu_profile_module.FrameInterner(
+          stack_table, _GetStackFrameParent, _GetStackFrameFunction)
+      for frame_id, frame in self._stack_frames.iteritems():
+        frames.AddFrame(frame_id, frame)
+      for thread, timestamp, frame_id in self._all_sampled_stacks:
+        AddSample(thread, timestamp, frames.GetNode(str(frame_id)))
+
+    # A V8 profile starts with a Profile event on the profiled thread, and
+    # continues in chunks of new nodes, samples, and the time (in
+    # microseconds) between each sample.
+    v8_profiles = {}
+    self._all_v8_profile_events.sort(key=lambda x: x[0]['ts'])
+    for event, thread in self._all_v8_profile_events:
+      data = (event.get('args') or {}).get('data', {})
+      key = (event['pid'], event.get('id'))
+      if key not in v8_profiles:
+        v8_profiles[key] = _V8Profile(stack_table, thread, event['ts'])
+      profile = v8_profiles[key]
+      if event['name'] == 'Profile':
+        profile.thread = thread
+        profile.time = data.get('startTime', event['ts'])
+        continue
+
+      cpu_profile = data.get('cpuProfile', {})
+      for node in cpu_profile.get('nodes', []):
+        profile.frames.AddFrame(node['id'], node)
+      for node_id, time_delta in zip(cpu_profile.get('samples', []),
+                                     data.get('timeDeltas', [])):
+        profile.time += time_delta
+        AddSample(profile.thread, profile.time / 1000.0,
+                  profile.frames.GetNode(node_id))
+
+    for profile in profiles:
+      profile.FinalizeImport()
+
   def _SetBrowserProcess(self):
     for thread in self._model.GetAllThreads():
       if thread.name == 'CrBrowserMain':
@@ -4,7 +4,9 @@
 
 import unittest
 
+import telemetry.timeline.async_slice as tracing_async_slice
 import telemetry.timeline.counter as tracing_counter
+import telemetry.timeline.event_query as tracing_event_query
 import telemetry.timeline.model as timeline_model
 from telemetry.timeline import trace_data as trace_data_module
 
@@ -509,9 +511,9 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
     self.assertEqual(1, ctr.num_series)
 
     self.assertEqual(['value'], ctr.series_names)
-    self.assertEqual([0, 0.01, 0.02], ctr.timestamps)
-    self.assertEqual([0, 10, 0], ctr.samples)
-    self.assertEqual([0, 10, 0], ctr.totals)
+    self.assertEqual([0, 0.01, 0.02], list(ctr.timestamps))
+    self.assertEqual([0, 10, 0], list(ctr.samples))
+    self.assertEqual([0, 10, 0], list(ctr.totals))
     self.assertEqual(10, ctr.max_total)
 
   def testInstanceCounter(self):
@@ -543,24 +545,24 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
     self.assertEqual('foo', ctr.category)
     self.assertEqual(2, ctr.num_samples)
     self.assertEqual(1, ctr.num_series)
-    self.assertEqual([0, 0.01], ctr.timestamps)
-    self.assertEqual([0, 10], ctr.samples)
+    self.assertEqual([0, 0.01], list(ctr.timestamps))
+    self.assertEqual([0, 10], list(ctr.samples))
 
     ctr = m.GetAllProcesses()[0].counters['foo.ctr[1]']
     self.assertEqual('ctr[1]', ctr.name)
     self.assertEqual('foo', ctr.category)
     self.assertEqual(3, ctr.num_samples)
     self.assertEqual(1, ctr.num_series)
-    self.assertEqual([0.01, 0.015, 0.018], ctr.timestamps)
-    self.assertEqual([10, 20, 30], ctr.samples)
+    self.assertEqual([0.01, 0.015, 0.018], list(ctr.timestamps))
+    self.assertEqual([10, 20, 30], list(ctr.samples))
 
     ctr = m.GetAllProcesses()[0].counters['bar.ctr[2]']
     self.assertEqual('ctr[2]', ctr.name)
     self.assertEqual('bar', ctr.category)
     self.assertEqual(1, ctr.num_samples)
     self.assertEqual(1, ctr.num_series)
-    self.assertEqual([0.02], ctr.timestamps)
-    self.assertEqual([40], ctr.samples)
+    self.assertEqual([0.02], list(ctr.timestamps))
+    self.assertEqual([40], list(ctr.samples))
 
   def testMultiCounterUpdateBounds(self):
     ctr = tracing_counter.Counter(None, 'testBasicCounter',
@@ -584,7 +586,8 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
                        3, 3,
                        1, 8,
                        3, 3,
-                       3.1, 3.6], ctr.totals)
+                       3.1, 3.6], list(ctr.totals))
+    self.assertEqual([0, 1, 2, 3.1, 3, 8, 3, 3.6], list(ctr.sample_totals))
 
   def testMultiCounter(self):
     events = [
@@ -859,6 +862,84 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
     t = m.GetAllProcesses()[0].threads[53]
     self.assertTrue(t is not None)
 
+  def testAsyncSlicesPairedByCategory(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 524, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 530, 'cat': 'bar',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 548, 'cat': 'bar',
+       'tid': 53, 'ph': 'F', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 560, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 72}
+    ]
+
+    trace_data = trace_data_module.TraceData(events)
+    m = timeline_model.TimelineModel(trace_data)
+    t = m.GetAllProcesses()[0].threads[53]
+    self.assertEqual(0, len(m.import_errors))
+    self.assertEqual(2, len(t.async_slices))
+    self.assertEqual('bar', t.async_slices[0].category)
+    self.assertAlmostEqual((548 - 530) / 1000.0, t.async_slices[0].duration)
+    self.assertEqual('foo', t.async_slices[1].category)
+    self.assertAlmostEqual((560 - 524) / 1000.0, t.async_slices[1].duration)
+
+  def testAsyncSlicesBuiltOnlyForQueriedNames(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 524, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 530, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'b', 'args': {'step': 's1'}, 'pid': 52, 'ts': 540,
+       'cat': 'foo', 'tid': 53, 'ph': 'T', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 548, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 72},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 560, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 72}
+    ]
+
+    trace_data = trace_data_module.TraceData(events)
+    m = timeline_model.TimelineModel(trace_data)
+    t = m.GetAllProcesses()[0].threads[53]
+    self.assertEqual(0, m.bounds.min)
+    self.assertAlmostEqual((560 - 524) / 1000.0, m.bounds.max)
+
+    # Only 'b' is built to answer a query on one of its step names.
+    sub_slices = list(m.IterAllAsyncSlicesOfName('b:s1'))
+    self.assertEqual(1, len(sub_slices))
+    self.assertAlmostEqual((540 - 524) / 1000.0, sub_slices[0].start)
+    self.assertEqual(1, len(t._async_slices)) # pylint: disable=W0212
+
+    # The slice and its only sub slice share the name 'a'.
+    slices = list(m.IterAllAsyncSlicesOfName('a'))
+    self.assertEqual(2, len(slices))
+    self.assertEqual(0, slices[0].start)
+    self.assertEqual(slices[0], slices[1].parent_slice)
+    self.assertEqual(2, len(t.async_slices))
+
+  def testAsyncSlicesBuiltOnlyForQueriedCategories(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 524, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 530, 'cat': 'bar',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 548, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 72},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 560, 'cat': 'bar',
+       'tid': 53, 'ph': 'F', 'id': 72}
+    ]
+
+    trace_data = trace_data_module.TraceData(events)
+    m = timeline_model.TimelineModel(trace_data)
+    t = m.GetAllProcesses()[0].threads[53]
+
+    slices = list(t.IterEventsMatchingQuery(tracing_event_query.EventQuery(
+        kinds=(tracing_async_slice.AsyncSlice,), categories=('bar',))))
+    # Only 'b' is built: the slice and its only sub slice.
+    self.assertEqual(['b', 'b'], [s.name for s in slices])
+    self.assertEqual(1, len(t._async_slices)) # pylint: disable=W0212
+    self.assertEqual(2, len(t.async_slices))
+
   def testImportSamples(self):
     events = [
       {'name': 'a', 'args': {}, 'pid': 52, 'ts': 548, 'cat': 'test',
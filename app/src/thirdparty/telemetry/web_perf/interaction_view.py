@@ -0,0 +1,84 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""The events of a timeline model, partitioned by interaction record.
+
+Metrics that look up events by name, like the layout and blob metrics, used
+to search the model for the events inside the same interaction records. An
+InteractionView does the search once for all of them: each family of events
+is gathered from the model and sorted by start once, in an EventIndex shared
+by the views of every label, and then bisected into the ranges of the view's
+records. Metrics that read other structures of the model, like the rendering
+stats or memory dumps, still get it through AddResults.
+"""
+
+import bisect
+from operator import attrgetter
+
+from telemetry.timeline import event_query
+
+
+class EventIndex(object):
+  """The events of a model, gathered and sorted by start once per family."""
+
+  def __init__(self):
+    self._sorted_events = {}
+
+  def GetSortedEvents(self, event_container, names, kinds=None):
+    """Returns (events, starts) for the events of event_container with one of
+    names (and one of kinds, if given), sorted by start."""
+    key = (event_container, frozenset(names),
+           tuple(kinds) if kinds is not None else None)
+    if key not in self._sorted_events:
+      events = sorted(event_container.IterEventsMatchingQuery(
+          event_query.EventQuery(kinds=kinds, names=names)),
+          key=attrgetter('start'))
+      self._sorted_events[key] = (events, [e.start for e in events])
+    return self._sorted_events[key]
+
+
+class InteractionView(object):
+  """The interaction records of one label, along with the model's events
+  partitioned by those records.
+
+  An event is in a record if it starts during it, inclusively, like the
+  metrics that used to test each event against each record did.
+  """
+
+  def __init__(self, model, renderer_thread, interaction_records,
+               event_index=None):
+    self._model = model
+    self._renderer_thread = renderer_thread
+    self._interaction_records = interaction_records
+    self._event_index = event_index if event_index is not None else (
+        EventIndex())
+
+  @property
+  def model(self):
+    return self._model
+
+  @property
+  def renderer_thread(self):
+    return self._renderer_thread
+
+  @property
+  def interaction_records(self):
+    return self._interaction_records
+
+  def GetEventsInInteractions(self, event_container, names, kinds=None):
+    """Returns the events of event_container with one of names starting
+    during any of the interaction records, sorted by start.
+
+    Events in several overlapping records are only returned once.
+    """
+    events, starts = self._event_index.GetSortedEvents(
+        event_container, names, kinds)
+    result = []
+    next_index = 0
+    for r in sorted(self._interaction_records, key=attrgetter('start')):
+      lo = max(bisect.bisect_left(starts, r.start), next_index)
+      hi = bisect.bisect_right(starts, r.end)
+      if lo < hi:
+        result.extend(events[lo:hi])
+        next_index = hi
+    return result
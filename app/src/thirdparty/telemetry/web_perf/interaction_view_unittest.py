@@ -0,0 +1,53 @@
+# Copyright 2015 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.timeline import model as model_module
+from telemetry.timeline import slice as slice_module
+from telemetry.web_perf import interaction_view
+from telemetry.web_perf import timeline_interaction_record as tir_module
+
+
+class InteractionViewTest(unittest.TestCase):
+
+  def setUp(self):
+    self.model = model_module.TimelineModel()
+    renderer_process = self.model.GetOrCreateProcess(1)
+    self.renderer_thread = renderer_process.GetOrCreateThread(2)
+    other_thread = renderer_process.GetOrCreateThread(3)
+    for ts in (0, 10, 20, 30, 40):
+      self.renderer_thread.BeginSlice('cat', 'a', ts)
+      self.renderer_thread.EndSlice(ts + 5)
+      other_thread.BeginSlice('cat', 'a', ts + 1)
+      other_thread.EndSlice(ts + 2)
+    self.renderer_thread.BeginSlice('cat', 'b', 12)
+    self.renderer_thread.EndSlice(13)
+    self.model.FinalizeImport(shift_world_to_zero=False)
+
+  def _CreateView(self, ranges, event_index=None):
+    records = [tir_module.TimelineInteractionRecord('label', start, end)
+               for start, end in ranges]
+    return interaction_view.InteractionView(
+        self.model, self.renderer_thread, records, event_index)
+
+  def testGetEventsInInteractions(self):
+    # Overlapping, out of order records only return each event once.
+    view = self._CreateView([(30, 45), (10, 20), (11, 35)])
+    events = view.GetEventsInInteractions(
+        self.model, ('a',), kinds=(slice_module.Slice,))
+    self.assertEquals([10, 11, 20, 21, 30, 31, 40, 41],
+                      [e.start for e in events])
+
+  def testEventIndexIsShared(self):
+    event_index = interaction_view.EventIndex()
+    first = self._CreateView([(0, 10)], event_index)
+    second = self._CreateView([(20, 30)], event_index)
+    first_events = first.GetEventsInInteractions(self.renderer_thread, ('a',))
+    second_events = second.GetEventsInInteractions(self.renderer_thread, ('a',))
+    self.assertEquals([0, 10], [e.start for e in first_events])
+    self.assertEquals([20, 30], [e.start for e in second_events])
+    self.assertIs(
+        event_index.GetSortedEvents(self.renderer_thread, ('a',)),
+        event_index.GetSortedEvents(self.renderer_thread, ['a']))
@@ -2,6 +2,7 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+from telemetry.timeline import event_query
 from telemetry.value import list_of_scalar_values
 from telemetry.web_perf.metrics import timeline_based_metric
 
@@ -48,17 +49,29 @@ class BlobTimelineMetric(timeline_based_metric.TimelineBasedMetric):
 
     write_events = []
     read_events = []
-    for event in renderer_thread.parent.IterAllEvents(
-        event_predicate=self.IsWriteEvent):
+    for event in renderer_thread.parent.IterEventsMatchingQuery(
+        event_query.EventQuery(names=(WRITE_EVENT_NAME,))):
       write_events.append(event)
-    for event in browser_process.parent.IterAllEvents(
-        event_predicate=self.IsReadEvent):
+    for event in browser_process.parent.IterEventsMatchingQuery(
+        event_query.EventQuery(names=(READ_EVENT_NAME,))):
       read_events.append(event)
 
     # Only these private methods are tested for mocking simplicity.
     self._AddWriteResultsInternal(write_events, interactions, results)
     self._AddReadResultsInternal(read_events, interactions, results)
 
+  def AddResultsForInteractionView(self, view, results):
+    assert view.interaction_records
+
+    write_events = view.GetEventsInInteractions(
+        view.renderer_thread.parent, (WRITE_EVENT_NAME,))
+    read_events = view.GetEventsInInteractions(view.model, (READ_EVENT_NAME,))
+
+    self._AddWriteResultsInternal(write_events, view.interaction_records,
+                                  results)
+    self._AddReadResultsInternal(read_events, view.interaction_records,
+                                 results)
+
   def _AddWriteResultsInternal(self, events, interactions, results):
     writes = []
     for event in events:
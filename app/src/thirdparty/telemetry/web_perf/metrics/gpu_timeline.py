@@ -5,7 +5,9 @@ import collections
 import math
 import sys
 
-from telemetry.timeline import model as model_module
+from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import event_query
+from telemetry.timeline import slice as slice_module
 from telemetry.value import list_of_scalar_values
 from telemetry.value import scalar
 from telemetry.web_perf.metrics import timeline_based_metric
@@ -14,6 +16,12 @@ TOPLEVEL_GL_CATEGORY = 'gpu_toplevel'
 TOPLEVEL_SERVICE_CATEGORY = 'disabled-by-default-gpu.service'
 TOPLEVEL_DEVICE_CATEGORY = 'disabled-by-default-gpu.device'
 
+# Only the events of these categories are read by the timeline.
+GPU_EVENTS_QUERY = event_query.EventQuery(
+    kinds=(slice_module.Slice, async_slice_module.AsyncSlice),
+    categories=(TOPLEVEL_GL_CATEGORY, TOPLEVEL_SERVICE_CATEGORY,
+                TOPLEVEL_DEVICE_CATEGORY))
+
 SERVICE_FRAME_END_MARKER = (TOPLEVEL_SERVICE_CATEGORY, 'SwapBuffer')
 DEVICE_FRAME_END_MARKER = (TOPLEVEL_DEVICE_CATEGORY, 'SwapBuffer')
 
@@ -114,7 +122,105 @@ class GPUTimelineMetric(timeline_based_metric.TimelineBasedMetric):
 
   def _CalculateGPUTimelineData(self, model):
     """Uses the model and calculates the times for various values for each
-       frame. The return value will be a dictionary of the following format:
+       frame (see GPUTimeline.GetTimelineData)."""
+    return GetGPUTimeline(model).GetTimelineData()
+
+
+def GetGPUTimeline(model):
+  """Builds the GPUTimeline of a model from its GPU events alone, so that
+  the other async slices of the model are never built."""
+  gpu_timeline = GPUTimeline()
+  for event in model.IterEventsMatchingQuery(GPU_EVENTS_QUERY):
+    gpu_timeline.AddEvent(event)
+  return gpu_timeline
+
+
+class _FrameBucketer(object):
+  """Splits the toplevel GL events of one source into frames, each ending
+  with the first event starting after the end of a SwapBuffer marker."""
+
+  def __init__(self):
+    self._frames = []
+    self._frame_end = sys.maxint
+    self._events = []
+    self._tracked_events = collections.defaultdict(list)
+
+  def AddFrameEndMarker(self, event):
+    self._frame_end = event.end
+
+  def AddEvent(self, event, tracked_name):
+    # Check if frame has ended.
+    if event.start >= self._frame_end:
+      if self._events:
+        self._frames.append((self._events, self._tracked_events))
+      self._events = []
+      self._frame_end = sys.maxint
+      self._tracked_events = collections.defaultdict(list)
+
+    self._events.append(event)
+    if tracked_name:
+      self._tracked_events[tracked_name].append(event)
+
+  def GetFrames(self, start=None, end=None):
+    """Returns the (events, tracked events by name) of each frame lying
+    within start and end, including the frame still being added to."""
+    frames = self._frames
+    if self._events:
+      frames = frames + [(self._events, self._tracked_events)]
+    return [(events, tracked_events) for events, tracked_events in frames
+            if (start is None or events[0].start >= start) and
+               (end is None or events[-1].end <= end)]
+
+
+class GPUTimeline(object):
+  """Buckets the gpu.service and gpu.device work of a trace per frame.
+
+  Events are added one at a time, in the order the model iterates them, so
+  that the timeline can be built in the same pass over the model as other
+  analyses.
+  """
+
+  def __init__(self):
+    self._service_frames = _FrameBucketer()
+    self._device_frames = _FrameBucketer()
+    self._base_names = {}
+
+  def _GetBaseName(self, name):
+    """Returns name without its '-<id>' suffix.
+
+    The same few GL context names repeat for every frame, so they are only
+    parsed once.
+    """
+    base_name = self._base_names.get(name)
+    if base_name is None:
+      dash_index = name.rfind('-')
+      base_name = name[:dash_index] if dash_index != -1 else name
+      self._base_names[name] = base_name
+    return base_name
+
+  def AddEvent(self, event):
+    """Adds a slice or async slice of the model."""
+    if event.category == TOPLEVEL_SERVICE_CATEGORY:
+      frames = self._service_frames
+    elif event.category == TOPLEVEL_DEVICE_CATEGORY:
+      frames = self._device_frames
+    else:
+      return
+
+    # Look for frame end markers
+    if (event.category, event.name) in (SERVICE_FRAME_END_MARKER,
+                                        DEVICE_FRAME_END_MARKER):
+      frames.AddFrameEndMarker(event)
+
+    # Track all other toplevel gl category markers
+    elif event.args.get('gl_category', None) == TOPLEVEL_GL_CATEGORY:
+      frames.AddEvent(event, TRACKED_GL_CONTEXT_NAME.get(
+          self._GetBaseName(event.name), None))
+
+  def GetTimelineData(self, start=None, end=None):
+    """Calculates the times for various values for each frame lying within
+       start and end, or for all frames if they are None. The return value
+       will be a dictionary of the following format:
          {
            (EVENT_NAME1, SRC1_TYPE): [FRAME0_TIME, FRAME1_TIME...etc.],
            (EVENT_NAME2, SRC2_TYPE): [FRAME0_TIME, FRAME1_TIME...etc.],
@@ -133,92 +239,14 @@ class GPUTimelineMetric(timeline_based_metric.TimelineBasedMetric):
          gpu - For an event, the "gpu" source type signifies time spent on the
                gpu thread using the GPU. This uses the "gpu.device" markers.
     """
-    all_service_events = []
-    current_service_frame_end = sys.maxint
-    current_service_events = []
-
-    all_device_events = []
-    current_device_frame_end = sys.maxint
-    current_device_events = []
-
-    tracked_events = {}
-    tracked_events.update(
-        dict([((value, 'cpu'), [])
-              for value in TRACKED_GL_CONTEXT_NAME.itervalues()]))
-    tracked_events.update(
-        dict([((value, 'gpu'), [])
-              for value in TRACKED_GL_CONTEXT_NAME.itervalues()]))
-
-    # These will track traces within the current frame.
-    current_tracked_service_events = collections.defaultdict(list)
-    current_tracked_device_events = collections.defaultdict(list)
-
-    event_iter = model.IterAllEvents(
-        event_type_predicate=model_module.IsSliceOrAsyncSlice)
-    for event in event_iter:
-      # Look for frame end markers
-      if (event.category, event.name) == SERVICE_FRAME_END_MARKER:
-        current_service_frame_end = event.end
-      elif (event.category, event.name) == DEVICE_FRAME_END_MARKER:
-        current_device_frame_end = event.end
-
-      # Track all other toplevel gl category markers
-      elif event.args.get('gl_category', None) == TOPLEVEL_GL_CATEGORY:
-        base_name = event.name
-        dash_index = base_name.rfind('-')
-        if dash_index != -1:
-          base_name = base_name[:dash_index]
-        tracked_name = TRACKED_GL_CONTEXT_NAME.get(base_name, None)
-
-        if event.category == TOPLEVEL_SERVICE_CATEGORY:
-          # Check if frame has ended.
-          if event.start >= current_service_frame_end:
-            if current_service_events:
-              all_service_events.append(current_service_events)
-              for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-                tracked_events[(value, 'cpu')].append(
-                    current_tracked_service_events[value])
-            current_service_events = []
-            current_service_frame_end = sys.maxint
-            current_tracked_service_events.clear()
-
-          current_service_events.append(event)
-          if tracked_name:
-            current_tracked_service_events[tracked_name].append(event)
-
-        elif event.category == TOPLEVEL_DEVICE_CATEGORY:
-          # Check if frame has ended.
-          if event.start >= current_device_frame_end:
-            if current_device_events:
-              all_device_events.append(current_device_events)
-              for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-                tracked_events[(value, 'gpu')].append(
-                    current_tracked_device_events[value])
-            current_device_events = []
-            current_device_frame_end = sys.maxint
-            current_tracked_device_events.clear()
-
-          current_device_events.append(event)
-          if tracked_name:
-            current_tracked_device_events[tracked_name].append(event)
-
-    # Append Data for Last Frame.
-    if current_service_events:
-      all_service_events.append(current_service_events)
-      for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-        tracked_events[(value, 'cpu')].append(
-            current_tracked_service_events[value])
-    if current_device_events:
-      all_device_events.append(current_device_events)
-      for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-        tracked_events[(value, 'gpu')].append(
-            current_tracked_device_events[value])
+    service_frames = self._service_frames.GetFrames(start, end)
+    device_frames = self._device_frames.GetFrames(start, end)
 
     # Calculate Mean Frame Time for the CPU side.
     frame_times = []
-    if all_service_events:
-      prev_frame_end = all_service_events[0][0].start
-      for event_list in all_service_events:
+    if service_frames:
+      prev_frame_end = service_frames[0][0][0].start
+      for event_list, _ in service_frames:
         last_service_event_in_frame = event_list[-1]
         frame_times.append(last_service_event_in_frame.end - prev_frame_end)
         prev_frame_end = last_service_event_in_frame.end
@@ -229,17 +257,18 @@ class GPUTimelineMetric(timeline_based_metric.TimelineBasedMetric):
     gpu_frame_value = ('total', 'gpu')
     timeline_data = {}
     timeline_data[total_frame_value] = frame_times
-    timeline_data[cpu_frame_value] = _CPUFrameTimes(all_service_events)
+    timeline_data[cpu_frame_value] = _CPUFrameTimes(
+        [events for events, _ in service_frames])
     for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-      cpu_value = (value, 'cpu')
-      timeline_data[cpu_value] = _CPUFrameTimes(tracked_events[cpu_value])
+      timeline_data[(value, 'cpu')] = _CPUFrameTimes(
+          [tracked.get(value, []) for _, tracked in service_frames])
 
     # Add in GPU side traces if it was supported (IE. device traces exist).
-    if all_device_events:
-      timeline_data[gpu_frame_value] = _GPUFrameTimes(all_device_events)
+    if device_frames:
+      timeline_data[gpu_frame_value] = _GPUFrameTimes(
+          [events for events, _ in device_frames])
       for value in TRACKED_GL_CONTEXT_NAME.itervalues():
-        gpu_value = (value, 'gpu')
-        tracked_gpu_event = tracked_events[gpu_value]
-        timeline_data[gpu_value] = _GPUFrameTimes(tracked_gpu_event)
+        timeline_data[(value, 'gpu')] = _GPUFrameTimes(
+            [tracked.get(value, []) for _, tracked in device_frames])
 
     return timeline_data
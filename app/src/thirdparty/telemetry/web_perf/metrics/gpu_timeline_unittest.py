@@ -311,3 +311,27 @@ class GPUTimelineTest(unittest.TestCase):
       results.AssertHasPageSpecificScalarValue(
           gpu_timeline.TimelineName(result2_name, source_type, 'stddev'),
           'ms', 0)
+
+  def testTimelineDataInRange(self):
+    """Test that only the frames within a range are timed."""
+    model = model_module.TimelineModel()
+    test_thread = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    for start, duration in ((100, 10), (120, 20)):
+      for slice_item in _CreateGPUSlices(test_thread, 'RenderCompositor-1',
+                                         start, duration):
+        _AddSliceToThread(test_thread, slice_item)
+      for slice_item in _CreateFrameEndSlices(test_thread,
+                                              start + duration, 1):
+        _AddSliceToThread(test_thread, slice_item)
+    model.FinalizeImport()
+
+    timeline = gpu_timeline.GetGPUTimeline(model)
+
+    timeline_data = timeline.GetTimelineData()
+    self.assertEquals([10, 20], timeline_data[('total', 'cpu')])
+    self.assertEquals([10, 20], timeline_data[('render_compositor', 'gpu')])
+
+    timeline_data = timeline.GetTimelineData(115, 200)
+    self.assertEquals([20], timeline_data[('total', 'cpu')])
+    self.assertEquals([20], timeline_data[('total', 'gpu')])
+    self.assertEquals([0], timeline_data[('browser_compositor', 'cpu')])
@@ -2,6 +2,9 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import bisect
+
+from telemetry.timeline import slice as slice_module
 from telemetry.value import list_of_scalar_values
 from telemetry.web_perf.metrics import timeline_based_metric
 
@@ -21,15 +24,36 @@ class LayoutMetric(timeline_based_metric.TimelineBasedMetric):
 
   def AddResults(self, _model, renderer_thread, interactions, results):
     assert interactions
-    self._AddResultsInternal(renderer_thread.parent.IterAllSlices(),
-                             interactions, results)
+    self._AddResultsInternal(
+        renderer_thread.parent.IterAllSlicesOfName(self.EVENT_NAME),
+        interactions, results)
+
+  def AddResultsForInteractionView(self, view, results):
+    assert view.interaction_records
+    self._AddResultsInternal(
+        view.GetEventsInInteractions(view.renderer_thread.parent,
+                                     (self.EVENT_NAME,),
+                                     kinds=(slice_module.Slice,)),
+        view.interaction_records, results)
 
   def _AddResultsInternal(self, events, interactions, results):
+    # Merge the interactions into disjoint ranges sorted by start, so that
+    # whether an event starts during any of them is a single bisection.
+    range_starts = []
+    range_ends = []
+    for interaction in sorted(interactions, key=lambda i: i.start):
+      if range_ends and interaction.start <= range_ends[-1]:
+        range_ends[-1] = max(range_ends[-1], interaction.end)
+      else:
+        range_starts.append(interaction.start)
+        range_ends.append(interaction.end)
+
     layouts = []
     for event in events:
-      if (event.name == self.EVENT_NAME) and any(
-              interaction.start <= event.start <= interaction.end
-              for interaction in interactions):
+      if event.name != self.EVENT_NAME:
+        continue
+      i = bisect.bisect_right(range_starts, event.start) - 1
+      if i >= 0 and event.start <= range_ends[i]:
         layouts.append(event.end - event.start)
     if not layouts:
       return
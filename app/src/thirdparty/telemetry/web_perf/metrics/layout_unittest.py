@@ -62,3 +62,17 @@ class LayoutMetricUnitTest(unittest.TestCase):
     # The rest of the events are not layout events, so they are ignored.
     self.assertEqual({'layout': [3, 4, 7, 8]}, GetLayoutMetrics(
         events, interactions))
+
+  def testOverlappingInteractions(self):
+    events = [FakeLayoutEvent(5, 6),
+              FakeLayoutEvent(12, 14),
+              FakeLayoutEvent(25, 30),
+              FakeLayoutEvent(32, 33),
+              FakeLayoutEvent(2, 5)]
+    # Out of order, with the second one contained in the first.
+    interactions = [Interaction('interaction', 30, 40),
+                    Interaction('interaction', 10, 25),
+                    Interaction('interaction', 12, 20)]
+
+    self.assertEqual({'layout': [2, 5, 1]}, GetLayoutMetrics(
+        events, interactions))
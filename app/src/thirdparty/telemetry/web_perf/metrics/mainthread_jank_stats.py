@@ -2,6 +2,9 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+from operator import attrgetter
+
+from telemetry.web_perf import timeline_interaction_record as tir_module
 
 # A top level slice of a main thread can cause the webapp to behave
 # unresponsively if its thread duration is greater than or equals to
@@ -39,14 +42,78 @@ def _ComputeMainthreadJankStatsForRecord(renderer_thread, record):
       Note: thread duration of each slices is computed using overlapped range
       with (thread_start, thread_end).
   """
-  stat = _MainthreadJankStat()
-  for s in renderer_thread.toplevel_slices:
-    jank_thread_duration = record.GetOverlappedThreadTimeForSlice(s)
-    stat.biggest_top_slice_thread_time = max(
-        stat.biggest_top_slice_thread_time, jank_thread_duration)
-    if jank_thread_duration >= USER_PERCEIVABLE_DELAY_THRESHOLD_MS:
-      stat.sum_big_top_slices_thread_time += jank_thread_duration
-  return stat
+  return ComputeMainthreadJankStatsForRecords(renderer_thread, [record])[0]
+
+
+class _SortedSlices(object):
+  """Slices sorted by start in one time domain, thread time or wall-time."""
+
+  def __init__(self, slices, get_start, get_end):
+    self.slices = sorted(slices, key=get_start)
+    self.starts = [get_start(s) for s in self.slices]
+    self.longest_slice = max(
+        [get_end(s) - get_start(s) for s in self.slices] or [0])
+
+
+def ComputeMainthreadJankStatsForRecords(renderer_thread, records):
+  """Computes the mainthread jank stat of each of records.
+
+  Rather than computing the overlap of every top slice with every record,
+  records are swept in order of their start over the top slices sorted by
+  start, so only the slices near each record are looked at.
+
+  Returns:
+      A list with an instance of _MainthreadJankStat for each record (see
+      _ComputeMainthreadJankStatsForRecord).
+  """
+  stats = [_MainthreadJankStat() for _ in records]
+  if not records:
+    return stats
+  toplevel_slices = renderer_thread.toplevel_slices
+  for s in toplevel_slices:
+    if not s.has_thread_timestamps:
+      raise tir_module.NoThreadTimeDataException(
+          'slice does not contain thread time data')
+
+  # Records are compared with slices in thread time or in wall-time,
+  # depending on their thread, so each kind is swept separately.
+  ranges_by_domain = {True: [], False: []}
+  for index, record in enumerate(records):
+    start, end, in_thread_time = record.GetOverlapRangeForThread(
+        renderer_thread)
+    ranges_by_domain[in_thread_time].append((start, end, index))
+
+  for in_thread_time, ranges in ranges_by_domain.iteritems():
+    if not ranges:
+      continue
+    if in_thread_time:
+      sorted_slices = _SortedSlices(toplevel_slices,
+                                    attrgetter('thread_start'),
+                                    attrgetter('thread_end'))
+    else:
+      sorted_slices = _SortedSlices(toplevel_slices,
+                                    attrgetter('start'), attrgetter('end'))
+    slices = sorted_slices.slices
+    starts = sorted_slices.starts
+    first = 0
+    for start, end, index in sorted(ranges):
+      # Slices starting longer than the longest slice before this record
+      # can't reach into it, nor into any of the records after it.
+      while (first < len(slices) and
+             starts[first] < start - sorted_slices.longest_slice):
+        first += 1
+      record = records[index]
+      stat = stats[index]
+      i = first
+      while i < len(slices) and starts[i] <= end:
+        jank_thread_duration = record.GetOverlappedThreadTimeForSlice(
+            slices[i])
+        stat.biggest_top_slice_thread_time = max(
+            stat.biggest_top_slice_thread_time, jank_thread_duration)
+        if jank_thread_duration >= USER_PERCEIVABLE_DELAY_THRESHOLD_MS:
+          stat.sum_big_top_slices_thread_time += jank_thread_duration
+        i += 1
+  return stats
 
 
 class MainthreadJankStats(object):
@@ -81,9 +148,8 @@ class MainthreadJankStats(object):
     return self._biggest_jank_thread_time
 
   def _ComputeMainthreadJankStats(self):
-    for record in self._interaction_records:
-      record_jank_stat = _ComputeMainthreadJankStatsForRecord(
-          self._renderer_thread, record)
+    for record_jank_stat in ComputeMainthreadJankStatsForRecords(
+        self._renderer_thread, self._interaction_records):
       self._total_big_jank_thread_time += (
           record_jank_stat.sum_big_top_slices_thread_time)
       self._biggest_jank_thread_time = (
@@ -116,3 +116,41 @@ class MainthreadJankTests(unittest.TestCase):
     # Record 3: (220ms -> 400ms), (450ms -> 750ms)
     self.assertEquals(560, stats.total_big_jank_thread_time)
     self.assertEquals(300, stats.biggest_jank_thread_time)
+
+  def testComputeMainthreadJankStatsForRecords(self):
+    model = model_module.TimelineModel()
+    renderer_main = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    renderer_main.name = 'CrRendererMain'
+    other_thread = model.GetOrCreateProcess(1).GetOrCreateThread(3)
+
+    # Top slices every 100ms, each running for 60ms of thread time, with
+    # thread time running at half of wall-time.
+    for i in xrange(10):
+      renderer_main.BeginSlice('toplevel', 'MessageLoop::RunTask',
+                               i * 200, i * 100)
+      renderer_main.EndSlice(i * 200 + 120, i * 100 + 60)
+    model.FinalizeImport(shift_world_to_zero=False)
+
+    # Records out of order, one of them from another thread, in which case
+    # wall-time is used.
+    records = [
+        self.CreateTestRecord('record_1', 0, 10, 520, 1000, renderer_main),
+        self.CreateTestRecord('record_2', 0, 10, 0, 30, renderer_main),
+        self.CreateTestRecord('record_3', 400, 1000, 0, 300, other_thread),
+        self.CreateTestRecord('record_4', 0, 10, 2000, 3000, renderer_main),
+    ]
+    stats = mainthread_jank_stats.ComputeMainthreadJankStatsForRecords(
+        renderer_main, records)
+
+    # (520 -> 560), (600 -> 660), (700 -> 760), (800 -> 860), (900 -> 960)
+    self.assertEquals(60, stats[0].biggest_top_slice_thread_time)
+    self.assertEquals(240, stats[0].sum_big_top_slices_thread_time)
+    # (0 -> 30)
+    self.assertEquals(30, stats[1].biggest_top_slice_thread_time)
+    self.assertEquals(0, stats[1].sum_big_top_slices_thread_time)
+    # Slices 2 to 4 overlap for their whole 120ms of wall-time, with both
+    # the slices and the record scheduled half of the time.
+    self.assertEquals(30, stats[2].biggest_top_slice_thread_time)
+    self.assertEquals(0, stats[2].sum_big_top_slices_thread_time)
+    self.assertEquals(0, stats[3].biggest_top_slice_thread_time)
+
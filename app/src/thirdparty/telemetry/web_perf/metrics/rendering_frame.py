@@ -5,6 +5,7 @@
 from collections import defaultdict
 
 from telemetry.timeline import bounds
+from telemetry.timeline import event_query
 from telemetry.timeline import slice as slice_module
 
 
@@ -58,15 +59,23 @@ class RenderingFrame(object):
 
 def GetFrameEventsInsideRange(renderer_process, timeline_range):
   """Returns RenderingFrames for all relevant events in the timeline_range."""
+  return [frame for frame in GetFrameEvents(renderer_process)
+          if frame.bounds.Intersects(timeline_range)]
+
+
+def GetFrameEvents(renderer_process):
+  """Returns RenderingFrames for all relevant events, sorted by start."""
   # First filter all events from the renderer_process and turn them into a
   # dictonary of the form:
   #   {0: [send_begin_frame, begin_main_frame, begin_main_frame],
   #    1: [begin_main_frame, send_begin_frame],
   #    2: [send_begin_frame, begin_main_frame]}
   begin_frame_events_by_id = defaultdict(list)
-  for event in renderer_process.IterAllEvents(
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=RenderingFrame.IsEventUseful):
+  for event in renderer_process.IterEventsMatchingQuery(
+      event_query.EventQuery(
+          kinds=(slice_module.Slice,),
+          names=(RenderingFrame.send_begin_frame_event,
+                 RenderingFrame.begin_main_frame_event))):
     begin_frame_id = event.args.get('begin_frame_id', None)
     if begin_frame_id is None:
       raise NoBeginFrameIdException('Event is missing a begin_frame_id.')
@@ -76,9 +85,7 @@ def GetFrameEventsInsideRange(renderer_process, timeline_range):
   frames = []
   for events in begin_frame_events_by_id.values():
     try:
-      frame = RenderingFrame(events)
-      if frame.bounds.Intersects(timeline_range):
-        frames.append(frame)
+      frames.append(RenderingFrame(events))
     except MissingData:
       continue
   frames.sort(key=lambda frame: frame.bounds.min)
@@ -11,6 +11,7 @@ from telemetry.web_perf.metrics. \
     rendering_frame import GetFrameEventsInsideRange
 from telemetry.web_perf.metrics.rendering_frame import MissingData
 from telemetry.web_perf.metrics.rendering_frame import RenderingFrame
+from telemetry.web_perf.metrics import rendering_stats
 
 
 class RenderingFrameTestData(object):
@@ -161,3 +162,28 @@ class RenderingFrameUnitTest(unittest.TestCase):
 
     self.assertEquals(1, len(frame_events))
     self.assertEquals(10, frame_events[0].queueing_duration)
+
+  def testQueueingDurationsOfSeveralRanges(self):
+    """Test that frames reaching into a range from before it are included.
+
+                 |----A----|    |--B--|
+         Main:        [1]  [1]        [2]
+
+    Compositor:  [1]            [2]
+    """
+    d = RenderingFrameTestData()
+    d.AddSendEvent(ts=10)
+    d.AddBeginMainFrameEvent(ts=20)
+    d.AddBeginMainFrameEvent(ts=30)
+    d.AddSendEvent(ts=40)
+    d.AddBeginMainFrameEvent(ts=50)
+    d.FinalizeImport()
+
+    timeline_ranges = [GenerateTimelineRange(0, 15),
+                       GenerateTimelineRange(25, 35),
+                       GenerateTimelineRange(45, 100),
+                       GenerateTimelineRange(70, 100),
+                       timeline_bounds.Bounds()]
+    stats = rendering_stats.RenderingStats(
+        d.renderer_process, None, None, timeline_ranges)
+    self.assertEquals([[20], [20], [10], []], stats.frame_queueing_durations)
@@ -1,6 +1,7 @@
 # Copyright 2014 The Chromium Authors. All rights reserved.
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
+import bisect
 import itertools
 
 from operator import attrgetter
@@ -29,6 +30,11 @@ SCROLL_UPDATE_EVENT_NAME = 'Latency::ScrollUpdate'
 # Name for a gesture scroll update latency event.
 GESTURE_SCROLL_UPDATE_EVENT_NAME = 'InputLatency::GestureScrollUpdate'
 
+# Name for the compositor's frame events, which record one frame each without
+# any 'data'. They are used for frame timestamps when a trace has no
+# BenchmarkInstrumentation events, as DevTools traces don't.
+DRAW_FRAME_EVENT_NAME = 'DrawFrame'
+
 # These are keys used in the 'data' field dictionary located in
 # BenchmarkInstrumentation::ImplThreadRenderingStats.
 VISIBLE_CONTENT_DATA = 'visible_content_area'
@@ -51,18 +57,24 @@ def GetLatencyEvents(process, timeline_range):
 
   """
   latency_events = []
-  if not process:
-    return latency_events
-  for event in itertools.chain(
-      process.IterAllAsyncSlicesStartsWithName('InputLatency'),
-      process.IterAllAsyncSlicesStartsWithName('Latency')):
+  for event in _IterLatencySlices(process):
     if event.start >= timeline_range.min and event.end <= timeline_range.max:
-      for ss in event.sub_slices:
-        if 'data' in ss.args:
-          latency_events.append(ss)
+      latency_events.extend(_GetLatencyData(event))
   return latency_events
 
 
+def _IterLatencySlices(process):
+  if not process:
+    return iter([])
+  return itertools.chain(
+      process.IterAllAsyncSlicesStartsWithName('InputLatency'),
+      process.IterAllAsyncSlicesStartsWithName('Latency'))
+
+
+def _GetLatencyData(event):
+  return [ss for ss in event.sub_slices if 'data' in ss.args]
+
+
 def ComputeEventLatencies(input_events):
   """ Compute input event latencies.
 
@@ -131,7 +143,56 @@ def GetTimestampEventName(process):
     if 'data' in event.args and event.args['data']['frame_count'] == 1:
       return event_name
 
-  return 'BenchmarkInstrumentation::ImplThreadRenderingStats'
+  event_name = 'BenchmarkInstrumentation::ImplThreadRenderingStats'
+  if not HasRenderingStats(process):
+    for _ in process.IterAllSlicesOfName(DRAW_FRAME_EVENT_NAME):
+      return DRAW_FRAME_EVENT_NAME
+
+  return event_name
+
+
+class _SortedEvents(object):
+  """Events sorted by start, so that the ones of any range can be found by
+  bisecting instead of searching the whole timeline again."""
+  def __init__(self, events):
+    self.events = sorted(events, key=attrgetter('start'))
+    self._starts = [event.start for event in self.events]
+
+  def IterEventsInRange(self, timeline_range):
+    """Yields the events lying entirely within timeline_range, by start."""
+    lo = bisect.bisect_left(self._starts, timeline_range.min)
+    hi = bisect.bisect_right(self._starts, timeline_range.max)
+    for event in itertools.islice(self.events, lo, hi):
+      if event.end <= timeline_range.max:
+        yield event
+
+
+class LatencyEventIndex(object):
+  """The LatencyInfo trace events of a browser and a renderer process,
+  gathered and sorted once so that those of any range can be looked up
+  without scanning both processes again.
+
+  Plugin input event's latency slice is generated in renderer process, so
+  both processes are searched. Either may be None.
+  """
+  def __init__(self, browser_process, renderer_process):
+    self._latency_slices = _SortedEvents(itertools.chain(
+        _IterLatencySlices(browser_process),
+        _IterLatencySlices(renderer_process)))
+
+  def GetLatencyEvents(self, timeline_range):
+    """Like GetLatencyEvents, for the events of both processes."""
+    latency_events = []
+    for event in self._latency_slices.IterEventsInRange(timeline_range):
+      latency_events.extend(_GetLatencyData(event))
+    return latency_events
+
+
+def _GetFrameCount(event):
+  if event.name == DRAW_FRAME_EVENT_NAME:
+    return 1
+  return event.args['data']['frame_count']
+
 
 class RenderingStats(object):
   def __init__(self, renderer_process, browser_process, surface_flinger_process,
@@ -178,7 +239,7 @@ class RenderingStats(object):
     # Latency for a GestureScrollUpdate input event.
     self.gesture_scroll_update_latency = []
 
-    for timeline_range in timeline_ranges:
+    for _ in timeline_ranges:
       self.frame_timestamps.append([])
       self.frame_times.append([])
       self.approximated_pixel_percentages.append([])
@@ -187,16 +248,17 @@ class RenderingStats(object):
       self.scroll_update_latency.append([])
       self.gesture_scroll_update_latency.append([])
 
-      if timeline_range.is_empty:
-        continue
-      self._InitFrameTimestampsFromTimeline(
-          timestamp_process, timestamp_event_name, timeline_range)
-      self._InitImplThreadRenderingStatsFromTimeline(
-          renderer_process, timeline_range)
-      self._InitInputLatencyStatsFromTimeline(
-          browser_process, renderer_process, timeline_range)
-      self._InitFrameQueueingDurationsFromTimeline(
-          renderer_process, timeline_range)
+    # Each family of events is gathered once and then bisected into every
+    # range, so the timeline is searched the same number of times however
+    # many ranges there are.
+    self._InitFrameTimestampsFromTimeline(
+        timestamp_process, timestamp_event_name, timeline_ranges)
+    self._InitImplThreadRenderingStatsFromTimeline(
+        renderer_process, timeline_ranges)
+    self._InitInputLatencyStatsFromTimeline(
+        browser_process, renderer_process, timeline_ranges)
+    self._InitFrameQueueingDurationsFromTimeline(
+        renderer_process, timeline_ranges)
 
   def _GetRefreshPeriodFromSurfaceFlingerProcess(self, surface_flinger_process):
     for event in surface_flinger_process.IterAllEventsOfName('vsync_before'):
@@ -204,54 +266,63 @@ class RenderingStats(object):
       return
 
   def _InitInputLatencyStatsFromTimeline(
-      self, browser_process, renderer_process, timeline_range):
-    latency_events = GetLatencyEvents(browser_process, timeline_range)
-    # Plugin input event's latency slice is generated in renderer process.
-    latency_events.extend(GetLatencyEvents(renderer_process, timeline_range))
-    event_latencies = ComputeEventLatencies(latency_events)
-    # Don't include scroll updates in the overall input latency measurement,
-    # because scroll updates can take much more time to process than other
-    # input events and would therefore add noise to overall latency numbers.
-    self.input_event_latency[-1] = [
-        latency for name, latency in event_latencies
-        if name != SCROLL_UPDATE_EVENT_NAME]
-    self.scroll_update_latency[-1] = [
-        latency for name, latency in event_latencies
-        if name == SCROLL_UPDATE_EVENT_NAME]
-    self.gesture_scroll_update_latency[-1] = [
-        latency for name, latency in event_latencies
-        if name == GESTURE_SCROLL_UPDATE_EVENT_NAME]
-
-  def _GatherEvents(self, event_name, process, timeline_range):
-    events = []
-    for event in process.IterAllSlicesOfName(event_name):
-      if event.start >= timeline_range.min and event.end <= timeline_range.max:
-        if 'data' not in event.args:
-          continue
-        events.append(event)
-    events.sort(key=attrgetter('start'))
-    return events
-
-  def _AddFrameTimestamp(self, event):
-    frame_count = event.args['data']['frame_count']
+      self, browser_process, renderer_process, timeline_ranges):
+    latency_index = LatencyEventIndex(browser_process, renderer_process)
+    for range_index, timeline_range in enumerate(timeline_ranges):
+      if timeline_range.is_empty:
+        continue
+      event_latencies = ComputeEventLatencies(
+          latency_index.GetLatencyEvents(timeline_range))
+      # Don't include scroll updates in the overall input latency measurement,
+      # because scroll updates can take much more time to process than other
+      # input events and would therefore add noise to overall latency numbers.
+      self.input_event_latency[range_index] = [
+          latency for name, latency in event_latencies
+          if name != SCROLL_UPDATE_EVENT_NAME]
+      self.scroll_update_latency[range_index] = [
+          latency for name, latency in event_latencies
+          if name == SCROLL_UPDATE_EVENT_NAME]
+      self.gesture_scroll_update_latency[range_index] = [
+          latency for name, latency in event_latencies
+          if name == GESTURE_SCROLL_UPDATE_EVENT_NAME]
+
+  def _GatherEvents(self, event_name, process):
+    return _SortedEvents(
+        event for event in process.IterAllSlicesOfName(event_name)
+        if event.name == DRAW_FRAME_EVENT_NAME or 'data' in event.args)
+
+  def _AddFrameTimestamp(self, event, range_index):
+    frame_count = _GetFrameCount(event)
     if frame_count > 1:
       raise ValueError('trace contains multi-frame render stats')
     if frame_count == 1:
-      self.frame_timestamps[-1].append(
-          event.start)
-      if len(self.frame_timestamps[-1]) >= 2:
-        self.frame_times[-1].append(
-            self.frame_timestamps[-1][-1] - self.frame_timestamps[-1][-2])
+      frame_timestamps = self.frame_timestamps[range_index]
+      frame_timestamps.append(event.start)
+      if len(frame_timestamps) >= 2:
+        self.frame_times[range_index].append(
+            frame_timestamps[-1] - frame_timestamps[-2])
 
   def _InitFrameTimestampsFromTimeline(
-      self, process, timestamp_event_name, timeline_range):
-    for event in self._GatherEvents(
-        timestamp_event_name, process, timeline_range):
-      self._AddFrameTimestamp(event)
+      self, process, timestamp_event_name, timeline_ranges):
+    events = self._GatherEvents(timestamp_event_name, process)
+    for range_index, timeline_range in enumerate(timeline_ranges):
+      if timeline_range.is_empty:
+        continue
+      for event in events.IterEventsInRange(timeline_range):
+        self._AddFrameTimestamp(event, range_index)
 
-  def _InitImplThreadRenderingStatsFromTimeline(self, process, timeline_range):
+  def _InitImplThreadRenderingStatsFromTimeline(self, process,
+                                                timeline_ranges):
     event_name = 'BenchmarkInstrumentation::ImplThreadRenderingStats'
-    for event in self._GatherEvents(event_name, process, timeline_range):
+    events = self._GatherEvents(event_name, process)
+    for range_index, timeline_range in enumerate(timeline_ranges):
+      if timeline_range.is_empty:
+        continue
+      self._AddImplThreadRenderingStats(
+          events.IterEventsInRange(timeline_range), range_index)
+
+  def _AddImplThreadRenderingStats(self, events, range_index):
+    for event in events:
       data = event.args['data']
       if VISIBLE_CONTENT_DATA not in data:
         self.errors[APPROXIMATED_PIXEL_ERROR] = (
@@ -271,26 +342,41 @@ class RenderingStats(object):
           'a divide-by-zero')
         return
       if APPROXIMATED_VISIBLE_CONTENT_DATA in data:
-        self.approximated_pixel_percentages[-1].append(
+        self.approximated_pixel_percentages[range_index].append(
           round(float(data[APPROXIMATED_VISIBLE_CONTENT_DATA]) /
                 float(data[VISIBLE_CONTENT_DATA]) * 100.0, 3))
       else:
         self.errors[APPROXIMATED_PIXEL_ERROR] = (
           'approximated_pixel_percentages was not recorded')
       if CHECKERBOARDED_VISIBLE_CONTENT_DATA in data:
-        self.checkerboarded_pixel_percentages[-1].append(
+        self.checkerboarded_pixel_percentages[range_index].append(
           round(float(data[CHECKERBOARDED_VISIBLE_CONTENT_DATA]) /
                 float(data[VISIBLE_CONTENT_DATA]) * 100.0, 3))
       else:
         self.errors[CHECKERBOARDED_PIXEL_ERROR] = (
           'checkerboarded_pixel_percentages was not recorded')
 
-  def _InitFrameQueueingDurationsFromTimeline(self, process, timeline_range):
+  def _InitFrameQueueingDurationsFromTimeline(self, process, timeline_ranges):
+    timeline_ranges = [r for r in timeline_ranges if not r.is_empty]
+    if not timeline_ranges:
+      return
     try:
-      events = rendering_frame.GetFrameEventsInsideRange(process,
-                                                         timeline_range)
-      new_frame_queueing_durations = [e.queueing_duration for e in events]
-      self.frame_queueing_durations.append(new_frame_queueing_durations)
+      frames = rendering_frame.GetFrameEvents(process)
     except rendering_frame.NoBeginFrameIdException:
       self.errors['frame_queueing_durations'] = (
           'Current chrome version does not support the queueing delay metric.')
+      return
+
+    # Frames are sorted by their start. A frame starting more than the
+    # longest frame's duration before a range can't reach into it.
+    frame_starts = [frame.bounds.min for frame in frames]
+    longest_frame = max([frame.bounds.max - frame.bounds.min
+                         for frame in frames] or [0])
+    for timeline_range in timeline_ranges:
+      lo = bisect.bisect_left(frame_starts,
+                              timeline_range.min - longest_frame)
+      hi = bisect.bisect_right(frame_starts, timeline_range.max)
+      self.frame_queueing_durations.append([
+          frame.queueing_duration
+          for frame in itertools.islice(frames, lo, hi)
+          if frame.bounds.Intersects(timeline_range)])
@@ -388,6 +388,34 @@ class RenderingStatsUnitTest(unittest.TestCase):
         renderer, None, None, timeline_ranges)
     self.assertEquals(0, len(stats.frame_timestamps[1]))
 
+  def testDrawFrameTimestamps(self):
+    timeline = model.TimelineModel()
+    renderer = timeline.GetOrCreateProcess(pid=2)
+    renderer_main = renderer.GetOrCreateThread(tid=21)
+    renderer_compositor = renderer.GetOrCreateThread(tid=22)
+
+    # DrawFrame events without any BenchmarkInstrumentation events.
+    renderer_main.BeginSlice('webkit.console', 'ActionA', 0, '')
+    renderer_main.EndSlice(100)
+    for ts in (10, 26, 42, 58, 74):
+      renderer_compositor.BeginSlice('cc', 'DrawFrame', ts)
+      renderer_compositor.EndSlice(ts)
+    renderer.FinalizeImport()
+
+    self.assertEquals('DrawFrame',
+                      rendering_stats.GetTimestampEventName(renderer))
+    # Two overlapping ranges and an empty one.
+    timeline_ranges = [bounds.Bounds(), bounds.Bounds(), bounds.Bounds()]
+    timeline_ranges[0].AddValue(0)
+    timeline_ranges[0].AddValue(50)
+    timeline_ranges[1].AddValue(25)
+    timeline_ranges[1].AddValue(100)
+    stats = rendering_stats.RenderingStats(
+        renderer, None, None, timeline_ranges)
+    self.assertEquals([[10, 26, 42], [26, 42, 58, 74], []],
+                      stats.frame_timestamps)
+    self.assertEquals([[16, 16], [16, 16, 16], []], stats.frame_times)
+
   def testFromTimeline(self):
     timeline = model.TimelineModel()
 
@@ -522,6 +550,11 @@ class RenderingStatsUnitTest(unittest.TestCase):
           browser, timeline_range))
 
     self.assertEquals(latency_events, ref_latency.input_event)
+
+    latency_index = rendering_stats.LatencyEventIndex(browser, None)
+    self.assertEquals(latency_events, [
+        event for timeline_range in timeline_ranges
+        for event in latency_index.GetLatencyEvents(timeline_range)])
     event_latency_result = rendering_stats.ComputeEventLatencies(latency_events)
     self.assertEquals(event_latency_result,
                       ref_latency.input_event_latency)
@@ -50,6 +50,20 @@ class TimelineBasedMetric(object):
     """
     raise NotImplementedError()
 
+  def AddResultsForInteractionView(self, view, results):
+    """Computes and adds metrics for the interaction records of view.
+
+    Overrides can look up the events inside the records from the view, where
+    they are partitioned once for all metrics, rather than search the model
+    again. By default, this calls AddResults.
+
+    Args:
+      view: An instance of telemetry.web_perf.interaction_view.InteractionView.
+      results: An instance of page.PageTestResults.
+    """
+    self.AddResults(view.model, view.renderer_thread,
+                    view.interaction_records, results)
+
   def VerifyNonOverlappedRecords(self, interaction_records):
     """This raises exceptions if interaction_records contain overlapped ranges.
     """
@@ -2,9 +2,22 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 import copy
+from operator import attrgetter
 
 from telemetry.web_perf import timeline_interaction_record as tir_module
 
+GESTURE_MARKER_NAME = 'SyntheticGestureController::running'
+
+
+def GetGestureMarkers(timeline):
+  """ Returns the toplevel synthetic gesture markers of timeline, sorted by
+  start.
+  """
+  return sorted(
+    (ev for ev in timeline.IterAllAsyncSlicesOfName(GESTURE_MARKER_NAME)
+     if ev.parent_slice is None),
+    key=attrgetter('start'))
+
 
 def GetAdjustedInteractionIfContainGesture(timeline, interaction_record):
   """ Returns a new interaction record if interaction_record contains geture
@@ -17,21 +30,49 @@ def GetAdjustedInteractionIfContainGesture(timeline, interaction_record):
   the browser and renderer process submitting the trace events for the
   markers.
   """
+  return GetAdjustedInteractionsIfContainGesture(
+    timeline, [interaction_record])[0]
+
+
+def GetAdjustedInteractionsIfContainGesture(timeline, interaction_records,
+                                            gesture_markers=None):
+  """ Returns the result of GetAdjustedInteractionIfContainGesture for each of
+  interaction_records, in the same order.
+  The gesture markers (resolved from timeline if not given, sorted by start)
+  are merged with the records sorted by start in a single pass, rather than
+  searched for in the whole timeline once per record.
+  """
+  adjusted_records = [copy.copy(r) for r in interaction_records]
   # Only adjust the range for gestures.
-  if not interaction_record.label.startswith('Gesture_'):
-    return copy.copy(interaction_record)
-  gesture_events = [
-    ev for ev
-    in timeline.IterAllAsyncSlicesOfName('SyntheticGestureController::running')
-    if ev.parent_slice is None and
-    ev.start <= interaction_record.end and
-    ev.end >= interaction_record.start]
-  if len(gesture_events) == 0:
-    return copy.copy(interaction_record)
-  if len(gesture_events) > 1:
-    raise Exception('More than one possible synthetic gesture marker found in '
-                    'interaction_record %s.' % interaction_record.label)
-  return tir_module.TimelineInteractionRecord(
-    interaction_record.label, gesture_events[0].start,
-    gesture_events[0].end, gesture_events[0],
-    interaction_record._flags)  # pylint: disable=W0212
+  gesture_indices = [i for i, r in enumerate(interaction_records)
+                     if r.label.startswith('Gesture_')]
+  if not gesture_indices:
+    return adjusted_records
+  if gesture_markers is None:
+    gesture_markers = GetGestureMarkers(timeline)
+
+  gesture_indices.sort(key=lambda i: interaction_records[i].start)
+  # The markers that started before the current record ended, less those that
+  # ended before it started, which can't overlap any of the later records.
+  active_markers = []
+  next_marker = 0
+  for i in gesture_indices:
+    interaction_record = interaction_records[i]
+    while (next_marker < len(gesture_markers) and
+           gesture_markers[next_marker].start <= interaction_record.end):
+      active_markers.append(gesture_markers[next_marker])
+      next_marker += 1
+    active_markers = [ev for ev in active_markers
+                      if ev.end >= interaction_record.start]
+    gesture_events = [ev for ev in active_markers
+                      if ev.start <= interaction_record.end]
+    if len(gesture_events) == 0:
+      continue
+    if len(gesture_events) > 1:
+      raise Exception('More than one possible synthetic gesture marker found '
+                      'in interaction_record %s.' % interaction_record.label)
+    adjusted_records[i] = tir_module.TimelineInteractionRecord(
+      interaction_record.label, gesture_events[0].start,
+      gesture_events[0].end, gesture_events[0],
+      interaction_record._flags)  # pylint: disable=W0212
+  return adjusted_records
@@ -96,6 +96,42 @@ class SmoothGestureUtilTest(unittest.TestCase):
     self.assertEquals(adjusted_record_6.end, 25)
     self.assertTrue(adjusted_record_6 is not record_6)
 
+  def testGetAdjustedInteractionsIfContainGesture(self):
+    model = model_module.TimelineModel()
+    renderer_main = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    renderer_main.name = 'CrRendererMain'
+
+    #      [   X   ]         [   Y   ]     [     Z     ]
+    #    [ record_1 ]   [   record_2   ]       [ 3 ]
+    #                          [        record_4        ]
+    for start in (10, 40, 70):
+      renderer_main.AddAsyncSlice(async_slice.AsyncSlice(
+        'X', 'SyntheticGestureController::running', start, duration=20,
+        start_thread=renderer_main, end_thread=renderer_main))
+    model.FinalizeImport(shift_world_to_zero=False)
+
+    records = [
+      tir_module.TimelineInteractionRecord('Gesture_2', 35, 65),
+      tir_module.TimelineInteractionRecord('Gesture_1', 5, 32),
+      tir_module.TimelineInteractionRecord('Action_3', 75, 80),
+      tir_module.TimelineInteractionRecord('Gesture_3', 75, 80),
+    ]
+    adjusted_records = sg_util.GetAdjustedInteractionsIfContainGesture(
+      model, records)
+    self.assertEquals([(40, 60), (10, 30), (75, 80), (70, 90)],
+                      [(r.start, r.end) for r in adjusted_records])
+    for record, adjusted_record in zip(records, adjusted_records):
+      self.assertTrue(adjusted_record is not record)
+      self.assertEquals(
+        (adjusted_record.start, adjusted_record.end),
+        (sg_util.GetAdjustedInteractionIfContainGesture(model, record).start,
+         sg_util.GetAdjustedInteractionIfContainGesture(model, record).end))
+
+    record_4 = tir_module.TimelineInteractionRecord('Gesture_4', 55, 95)
+    self.assertRaises(
+      Exception, sg_util.GetAdjustedInteractionsIfContainGesture,
+      model, records + [record_4])
+
 
 class ScrollingPage(page_module.Page):
   def __init__(self, url, page_set, base_dir):
@@ -8,6 +8,7 @@ from telemetry.timeline import model as model_module
 from telemetry.timeline import tracing_category_filter
 from telemetry.timeline import tracing_options
 from telemetry.value import trace
+from telemetry.web_perf import interaction_view
 from telemetry.web_perf.metrics import blob_timeline
 from telemetry.web_perf.metrics import gpu_timeline
 from telemetry.web_perf.metrics import layout
@@ -72,26 +73,35 @@ class _TBMResultWrapper(ResultsWrapperInterface):
 
 
 def _GetRendererThreadsToInteractionRecordsMap(model):
-  threads_to_records_map = defaultdict(list)
-  interaction_labels_of_previous_threads = set()
+  threads_and_interactions = []
   for curr_thread in model.GetAllThreads():
     for event in curr_thread.async_slices:
       # TODO(nduca): Add support for page-load interaction record.
       if tir_module.IsTimelineInteractionRecord(event.name):
-        interaction = tir_module.TimelineInteractionRecord.FromAsyncEvent(event)
-        # Adjust the interaction record to match the synthetic gesture
-        # controller if needed.
-        interaction = (
-            smooth_gesture_util.GetAdjustedInteractionIfContainGesture(
-                model, interaction))
-        threads_to_records_map[curr_thread].append(interaction)
-        if interaction.label in interaction_labels_of_previous_threads:
-          raise InvalidInteractions(
-            'Interaction record label %s is duplicated on different '
-            'threads' % interaction.label)
-    if curr_thread in threads_to_records_map:
+        threads_and_interactions.append(
+            (curr_thread,
+             tir_module.TimelineInteractionRecord.FromAsyncEvent(event)))
+
+  # Adjust the interaction records to match the synthetic gesture controller
+  # if needed, all at once.
+  adjusted_interactions = (
+      smooth_gesture_util.GetAdjustedInteractionsIfContainGesture(
+          model, [interaction for _, interaction in threads_and_interactions]))
+
+  threads_to_records_map = defaultdict(list)
+  interaction_labels_of_previous_threads = set()
+  previous_thread = None
+  for (curr_thread, _), interaction in zip(threads_and_interactions,
+                                           adjusted_interactions):
+    if curr_thread is not previous_thread and previous_thread is not None:
       interaction_labels_of_previous_threads.update(
-        r.label for r in threads_to_records_map[curr_thread])
+        r.label for r in threads_to_records_map[previous_thread])
+    previous_thread = curr_thread
+    threads_to_records_map[curr_thread].append(interaction)
+    if interaction.label in interaction_labels_of_previous_threads:
+      raise InvalidInteractions(
+        'Interaction record label %s is duplicated on different '
+        'threads' % interaction.label)
 
   return threads_to_records_map
 
@@ -103,6 +113,9 @@ class _TimelineBasedMetrics(object):
     self._renderer_thread = renderer_thread
     self._interaction_records = interaction_records
     self._results_wrapper_class = results_wrapper_class
+    # Shared by the interaction views of all labels, so that each family of
+    # events is gathered from the model only once.
+    self._event_index = interaction_view.EventIndex()
 
   def AddResults(self, results):
     interactions_by_label = defaultdict(list)
@@ -121,9 +134,10 @@ class _TimelineBasedMetrics(object):
     if not interactions:
       return
 
+    view = interaction_view.InteractionView(
+        self._model, self._renderer_thread, interactions, self._event_index)
     for metric in _GetAllTimelineBasedMetrics():
-      metric.AddResults(self._model, self._renderer_thread,
-                        interactions, wrapped_results)
+      metric.AddResultsForInteractionView(view, wrapped_results)
 
 
 class Options(object):
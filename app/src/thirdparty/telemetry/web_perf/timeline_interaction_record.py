@@ -183,13 +183,7 @@ class TimelineInteractionRecord(object):
     Args:
       timeline_slice: An instance of telemetry.timeline.slice.Slice
     """
-    if not self._async_event:
-      raise ThreadTimeRangeOverlappedException(
-          'This record was not constructed from async event')
-    if not self._async_event.has_thread_timestamps:
-      raise NoThreadTimeDataException(
-          'This record\'s async_event does not contain thread time data. '
-          'Event data: %s' % repr(self._async_event))
+    self._CheckHasThreadTimestamps()
     if not timeline_slice.has_thread_timestamps:
       raise NoThreadTimeDataException(
           'slice does not contain thread time data')
@@ -201,6 +195,34 @@ class TimelineInteractionRecord(object):
       return self._GetOverlappedThreadTimeForSliceInDifferentThread(
           timeline_slice)
 
+  def GetOverlapRangeForThread(self, thread):
+    """Get the range that slices of thread must overlap for any of their
+    thread duration to overlap with this record.
+
+    Slices in the same thread as the record are compared in thread time, and
+    those in other threads in wall-time (see GetOverlappedThreadTimeForSlice).
+    Knowing the range lets callers sweep over slices sorted in that time
+    domain, rather than compute the overlap with every slice of the thread.
+
+    Returns:
+      A (start, end, in_thread_time) tuple, where in_thread_time tells whether
+      start and end are thread timestamps rather than wall-time ones.
+    """
+    self._CheckHasThreadTimestamps()
+    if thread == self._async_event.start_thread:
+      return (self._async_event.thread_start, self._async_event.thread_end,
+              True)
+    return self.start, self.end, False
+
+  def _CheckHasThreadTimestamps(self):
+    if not self._async_event:
+      raise ThreadTimeRangeOverlappedException(
+          'This record was not constructed from async event')
+    if not self._async_event.has_thread_timestamps:
+      raise NoThreadTimeDataException(
+          'This record\'s async_event does not contain thread time data. '
+          'Event data: %s' % repr(self._async_event))
+
   def _GetOverlappedThreadTimeForSliceInSameThread(self, timeline_slice):
     return timeline_bounds.Bounds.GetOverlap(
         timeline_slice.thread_start, timeline_slice.thread_end,